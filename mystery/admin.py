@@ -1,12 +1,113 @@
 from django.contrib import admin
-from mystery.models import Interest
+from django.db import connection
+from django.db.models import Q
+from mystery.models import ArchivedInterest, Interest, Meet, MeetMembership
+from mystery.routers import replica_reads
 
-class InterestAdmin(admin.ModelAdmin):
+# aggregate a column of a correlated subquery into one ', '-separated string
+STRING_AGG = {
+    'postgresql': "string_agg(%s, ', ')",
+    'sqlite': "group_concat(%s, ', ')",
+    'mysql': "group_concat(%s SEPARATOR ', ')",
+}
+
+
+def _names_subquery(model, field_name, column):
+    """
+    SQL for the ', '-joined ``column`` of the rows the M2M field
+    ``field_name`` of ``model`` points at.
+    """
+    qn = connection.ops.quote_name
+    field = model._meta.get_field(field_name)
+    through = qn(field.rel.through._meta.db_table)
+    related = field.rel.to._meta
+    return ('(SELECT %(agg)s FROM %(through)s '
+            'INNER JOIN %(related)s ON %(related)s.%(pk)s = %(through)s.%(to)s '
+            'WHERE %(through)s.%(from)s = %(interest)s.%(interest_pk)s)' % {
+                'agg': STRING_AGG[connection.vendor] % (
+                    '%s.%s' % (qn(related.db_table), qn(column))),
+                'through': through,
+                'related': qn(related.db_table),
+                'pk': qn(related.pk.column),
+                'to': qn(field.m2m_reverse_name()),
+                'from': qn(field.m2m_column_name()),
+                'interest': qn(model._meta.db_table),
+                'interest_pk': qn(model._meta.pk.column),
+            })
+
+
+def _with_names(queryset):
+    """
+    Add the location and department names of each interest to
+    ``queryset``, as aggregated subqueries where the database supports
+    them and prefetched otherwise.
+    """
+    if connection.vendor in STRING_AGG:
+        return queryset.extra(select={
+            'location_names': _names_subquery(
+                queryset.model, 'locations', 'name'),
+            'department_names': _names_subquery(
+                queryset.model, 'departments', 'title'),
+        })
+    return queryset.prefetch_related('locations', 'departments')
+
+
+class ReplicaChangelistMixin(object):
+    """ Read the changelist from the read replica, if there is one """
+
+    def changelist_view(self, request, extra_context=None):
+        view = super(ReplicaChangelistMixin, self).changelist_view
+        return replica_reads(view)(request, extra_context)
+
+
+class NameListsMixin(object):
+
+    def location_list(self, obj):
+        if hasattr(obj, 'location_names'):
+            return obj.location_names or ''
+        return ", ".join([location.name for location in obj.locations.all()])
+    location_list.short_description = 'Locations'
+
+    def dept_list(self, obj):
+        if hasattr(obj, 'department_names'):
+            return obj.department_names or ''
+        return ", ".join([dept.title for dept in obj.departments.all()])
+    dept_list.short_description = 'Departments'
+
+
+class InterestAdmin(ReplicaChangelistMixin, NameListsMixin,
+                    admin.ModelAdmin):
     list_display = ('owner', 'is_active', 'match_name', 'for_lunch',
-                    'for_coffee', 'video_chat', 'location_list', 'dept_list',
-                    'created', 'updated')
+                    'for_coffee', 'video_chat', 'for_group', 'location_list',
+                    'dept_list', 'created', 'updated')
     search_fields = ['owner__username', 'is_active', 'match__owner__username',
                      'locations__name', 'departments__title']
+    # derived from the other fields on save
+    exclude = ('meet_types', 'location_signature', 'department_signature')
+
+    def get_queryset(self, request):
+        return _with_names(super(InterestAdmin, self).get_queryset(request)
+                           .select_related('owner', 'match__owner'))
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search like the stock admin, but match the M2M fields through a
+        subquery of interest ids rather than joining them in, which would
+        repeat each interest once per location and department and need a
+        DISTINCT over the whole changelist.
+        """
+        m2m_names = ('locations', 'departments')
+        for term in search_term.split():
+            condition = Q()
+            for field in self.search_fields:
+                lookup = {'%s__icontains' % field: term}
+                if field.split('__')[0] in m2m_names:
+                    condition |= Q(pk__in=Interest.objects.filter(**lookup)
+                                   .values('pk'))
+                else:
+                    condition |= Q(**lookup)
+            queryset = queryset.filter(condition)
+        return queryset, False
 
     def match_name(self, obj):
         if obj.match:
@@ -15,12 +116,37 @@ class InterestAdmin(admin.ModelAdmin):
             return None
     match_name.short_description = 'Match'
 
-    def location_list(self, obj):
-        return ", ".join([location.name for location in obj.locations.all()])
-    location_list.short_description = 'Locations'
+admin.site.register(Interest, InterestAdmin)
 
-    def dept_list(self, obj):
-        return ", ".join([dept.title for dept in obj.departments.all()])
-    location_list.short_description = 'Departments'
 
-admin.site.register(Interest, InterestAdmin)
+class ArchivedInterestAdmin(ReplicaChangelistMixin, NameListsMixin,
+                            admin.ModelAdmin):
+    list_display = ('owner', 'match_owner', 'for_lunch', 'for_coffee',
+                    'video_chat', 'location_list', 'dept_list', 'created',
+                    'archived')
+    search_fields = ['owner__username', 'match_owner__username']
+    date_hierarchy = 'created'
+
+    def get_queryset(self, request):
+        return _with_names(
+            super(ArchivedInterestAdmin, self).get_queryset(request)
+            .select_related('owner', 'match_owner'))
+
+    def has_add_permission(self, request):
+        return False
+
+admin.site.register(ArchivedInterest, ArchivedInterestAdmin)
+
+
+class MeetMembershipInline(admin.TabularInline):
+    model = MeetMembership
+    raw_id_fields = ('user', 'interest')
+    extra = 0
+
+
+class MeetAdmin(admin.ModelAdmin):
+    list_display = ('__unicode__', 'for_what', 'location', 'created')
+    list_select_related = True
+    inlines = [MeetMembershipInline]
+
+admin.site.register(Meet, MeetAdmin)
@@ -0,0 +1,159 @@
+"""
+Moving closed interests out of the live table, and reading live and
+archived interests back together.
+
+Only the working set (open interests, and matched pairs not yet closed)
+needs to be in ``mystery_interest``; everything else slows the matching
+and admin queries down.  ``archive_closed`` copies closed interests and
+their M2M rows to ``ArchivedInterest`` in batches and deletes the
+originals.
+
+A matched pair is always archived together: deleting one side would
+cascade through the other's ``match`` foreign key, so pairs where either
+side is still active are left alone.
+"""
+import heapq
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mystery.models import ArchivedInterest, Interest
+from mystery.routers import replica_alias
+
+
+def _archivable_batch(batch_size, cutoff, skipped):
+    """
+    The ids of up to ``batch_size`` closed interests, plus their partners,
+    all of whom are closed too.  Ids that cannot be archived yet are added
+    to ``skipped`` and not looked at again.
+    """
+    closed = Interest.objects.filter(is_active=False) \
+        .filter(Q(match=None) | Q(match__is_active=False))
+    if cutoff is not None:
+        closed = closed.filter(updated__lt=cutoff)
+    if skipped:
+        closed = closed.exclude(id__in=skipped)
+    ids = set(closed.order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return ids
+
+    # bring in both sides of every pair, and anything else pointing at
+    # them, and leave out any group with an active member
+    rows = list(Interest.objects.filter(Q(id__in=ids) | Q(match__in=ids))
+                .values_list('id', 'match_id', 'is_active'))
+    partner_ids = set(match_id for _, match_id, _ in rows
+                      if match_id is not None)
+    rows.extend(Interest.objects.filter(id__in=partner_ids - ids)
+                .values_list('id', 'match_id', 'is_active'))
+
+    links = {}
+    active = set()
+    for interest_id, match_id, is_active in rows:
+        if is_active:
+            active.add(interest_id)
+        if match_id is not None:
+            links.setdefault(interest_id, set()).add(match_id)
+            links.setdefault(match_id, set()).add(interest_id)
+
+    archivable = set()
+    seen = set()
+    for interest_id in set(interest_id for interest_id, _, _ in rows):
+        if interest_id in seen:
+            continue
+        group = set()
+        pending = [interest_id]
+        while pending:
+            member = pending.pop()
+            if member not in group:
+                group.add(member)
+                pending.extend(links.get(member, ()))
+        seen |= group
+        if group & active:
+            skipped |= group & ids
+        else:
+            archivable |= group
+    return archivable
+
+
+def _archive(ids):
+    """
+    Copy the interests in ``ids`` and their M2M rows into the archive and
+    delete them.
+    """
+    interests = list(Interest.objects.filter(id__in=ids)
+                     .select_related('match'))
+    ArchivedInterest.objects.bulk_create([
+        ArchivedInterest(
+            original_id=interest.id,
+            owner_id=interest.owner_id,
+            match_original_id=interest.match_id,
+            match_owner_id=interest.match.owner_id if interest.match else None,
+            for_lunch=interest.for_lunch,
+            for_coffee=interest.for_coffee,
+            video_chat=interest.video_chat,
+            meet_types=interest.meet_types,
+            carried_over=interest.carried_over,
+            created=interest.created,
+            updated=interest.updated)
+        for interest in interests])
+    archived_ids = dict(ArchivedInterest.objects.filter(original_id__in=ids)
+                        .values_list('original_id', 'id'))
+
+    for field, column in (('locations', 'officelocation_id'),
+                          ('departments', 'orggroup_id')):
+        live = getattr(Interest, field).through
+        archive = getattr(ArchivedInterest, field).through
+        archive.objects.bulk_create([
+            archive(**{'archivedinterest_id': archived_ids[interest_id],
+                       column: value})
+            for interest_id, value in live.objects.filter(interest__in=ids)
+            .values_list('interest_id', column)])
+
+    # clear the pairs first so the delete does not go looking for cascades
+    Interest.objects.filter(Q(id__in=ids) | Q(match__in=ids)) \
+        .update(match=None)
+    Interest.objects.filter(id__in=ids).delete()
+    return len(interests)
+
+
+def archive_closed(batch_size=200, older_than=None, max_batches=None):
+    """
+    Archive closed interests ``batch_size`` at a time, each batch in its
+    own transaction.  ``older_than`` is a timedelta since the interest was
+    last updated.  Returns the number archived.
+    """
+    cutoff = timezone.now() - older_than if older_than else None
+    archived = 0
+    batches = 0
+    skipped = set()
+    while max_batches is None or batches < max_batches:
+        already_skipped = len(skipped)
+        with transaction.atomic():
+            ids = _archivable_batch(batch_size, cutoff, skipped)
+            if ids:
+                archived += _archive(ids)
+        if not ids and len(skipped) == already_skipped:
+            break
+        batches += 1
+    return archived
+
+
+def history(using=None, **filters):
+    """
+    Every interest matching ``filters``, live or archived, oldest first.
+    The filters must only use fields both models have, such as ``owner``
+    or ``created__gte``.  Both tables are read in created order and merged
+    as they are iterated.  Being for reporting, they are read from the
+    read replica if there is one, unless ``using`` names another database.
+    """
+    using = using or replica_alias() or DEFAULT_DB_ALIAS
+    live = Interest.objects.using(using).filter(**filters) \
+        .order_by('created', 'id')
+    archived = ArchivedInterest.objects.using(using).filter(**filters) \
+        .order_by('created', 'id')
+    merged = heapq.merge(
+        ((interest.created, 0, interest) for interest in live.iterator()),
+        ((interest.created, 1, interest) for interest in archived.iterator()))
+    for _, _, interest in merged:
+        yield interest
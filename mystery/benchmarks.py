@@ -0,0 +1,300 @@
+"""
+Helpers for benchmarking the matching path against a realistically sized
+interest table.
+
+Everything here writes synthetic rows, so callers normally wrap it in
+``rolled_back()`` to leave the database as they found it.
+"""
+import contextlib
+import datetime
+import random
+import time
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.models import OfficeLocation, OrgGroup, Person
+from mystery import scoring, views
+from mystery.admin import InterestAdmin
+from mystery.matching import match_pending
+from mystery.metrics import query_counter
+from mystery.models import Interest, SignatureBit
+from mystery.transfer import bulk_create_interests, set_created
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def rolled_back():
+    """
+    Run the body in a transaction that is always rolled back.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def ensure_catalogue(locations=10, departments=8):
+    """
+    Make sure there are at least ``locations`` offices and ``departments``
+    root org groups to spread synthetic interests over.  Returns the lists
+    of location and department ids.
+    """
+    location_ids = list(OfficeLocation.objects.exclude(id='Remote')
+                        .values_list('id', flat=True))
+    for i in range(len(location_ids), locations):
+        location = OfficeLocation.objects.create(
+            id='bench%d' % i, name='Bench office %d' % i,
+            street='1 Bench St', city='Benchton', state='DC', zip='20000')
+        location_ids.append(location.id)
+
+    dept_ids = list(OrgGroup.objects.filter(parent__isnull=True)
+                    .values_list('id', flat=True))
+    for i in range(len(dept_ids), departments):
+        dept_ids.append(OrgGroup.objects.create(title='Bench dept %d' % i).id)
+
+    return location_ids, dept_ids
+
+
+def create_users(count, prefix='bench'):
+    """
+    Bulk-create ``count`` users, each with the Person row the views expect,
+    and return their ids.
+    """
+    User = get_user_model()
+    start = User.objects.filter(username__startswith=prefix).count()
+    users = []
+    for i in range(start, start + count):
+        user = User(username='%s-%d' % (prefix, i))
+        user.set_unusable_password()
+        users.append(user)
+    User.objects.bulk_create(users)
+    ids = list(User.objects.filter(username__startswith=prefix)
+               .order_by('-id').values_list('id', flat=True)[:count])
+    # bulk_create sends no signals, so nothing else makes these
+    Person.objects.bulk_create([Person(user_id=user_id) for user_id in ids])
+    return ids
+
+
+def seed_interests(rows, open_fraction=0.02, users=500, max_locations=3,
+                   max_departments=None, chunk_size=1000, seed=0):
+    """
+    Bulk-insert ``rows`` synthetic interests, of which roughly
+    ``open_fraction`` are active and unmatched and the rest closed history.
+    ``created`` is spread over the past ``rows`` minutes, oldest first.
+    Returns the ids of the open interests.
+    """
+    rng = random.Random(seed)
+    location_ids, dept_ids = ensure_catalogue()
+    owner_ids = create_users(users)
+    max_departments = max_departments or len(dept_ids)
+    start = timezone.now() - datetime.timedelta(minutes=rows)
+    open_ids = []
+
+    location_bits = SignatureBit.bits_for(SignatureBit.LOCATION, location_ids)
+    dept_bits = SignatureBit.bits_for(SignatureBit.DEPARTMENT, dept_ids)
+
+    for offset in range(0, rows, chunk_size):
+        interests = []
+        links = []
+        for i in range(offset, min(rows, offset + chunk_size)):
+            meet_choice = rng.choice([Interest.CHOICE_LUNCH,
+                                      Interest.CHOICE_COFFEE,
+                                      Interest.CHOICE_VIDEO])
+            locations = rng.sample(location_ids,
+                                   rng.randint(1, max_locations))
+            departments = rng.sample(dept_ids,
+                                     rng.randint(1, max_departments))
+            interest = Interest(
+                owner_id=rng.choice(owner_ids),
+                is_active=rng.random() < open_fraction,
+                for_lunch=meet_choice == Interest.CHOICE_LUNCH,
+                for_coffee=meet_choice == Interest.CHOICE_COFFEE,
+                video_chat=meet_choice == Interest.CHOICE_VIDEO)
+            # bulk_create skips save() and initial_save(), which keep the
+            # derived columns in sync
+            interest.meet_types = interest.meet_types_mask()
+            interest.location_signature = SignatureBit.mask(
+                location_bits[unicode(key)] for key in locations)
+            interest.department_signature = SignatureBit.mask(
+                dept_bits[unicode(key)] for key in departments)
+            interests.append(interest)
+            links.append((locations, departments))
+
+        ids = bulk_create_interests(interests, links)
+        # a minute apart, so oldest-first plans are not timed on ties
+        created = [(interest_id, start + datetime.timedelta(minutes=i))
+                   for i, interest_id in enumerate(ids, offset)]
+        for at in range(0, len(created), 250):
+            set_created(created[at:at + 250])
+        open_ids.extend(interest_id for interest_id, interest
+                        in zip(ids, interests) if interest.is_active)
+
+    return open_ids
+
+
+def fanout(probe, repeat=5):
+    """
+    Compare the matching queries for ``probe`` with the old chained M2M
+    join, which returns one row per shared (location, department)
+    combination.  Returns ``(name, rows, median ms)`` tuples.
+    """
+    legacy = Interest.objects.filter(is_active=True, match=None) \
+        .exclude(owner=probe.owner_id) \
+        .filter(meet_types__in=Interest.overlapping_meet_types(
+            probe.meet_types)) \
+        .filter(locations__in=list(probe.locations.all())) \
+        .filter(departments__in=list(probe.departments.all()))
+    queries = [
+        ('chained join', legacy),
+        ('m2m subquery', probe._query_matching_interests(through_m2m=True)),
+        ('signatures', probe._query_matching_interests()),
+    ]
+    results = []
+    for name, queryset in queries:
+        ids = queryset.values_list('id', flat=True)
+        rows = len(list(ids))
+        median = time_call(lambda: list(ids.all()), repeat)[1]
+        results.append((name, rows, median))
+    return results
+
+
+def explain(queryset):
+    """
+    Return the database's query plan for ``queryset`` as a list of lines.
+    """
+    sql, params = queryset.query.sql_with_params()
+    prefix = {
+        'sqlite': 'EXPLAIN QUERY PLAN',
+        'postgresql': 'EXPLAIN ANALYZE',
+    }.get(connection.vendor, 'EXPLAIN')
+    cursor = connection.cursor()
+    cursor.execute('%s %s' % (prefix, sql), params)
+    return [' '.join(unicode(column) for column in row)
+            for row in cursor.fetchall()]
+
+
+def time_call(func, repeat=5):
+    """
+    Call ``func`` ``repeat`` times and return the fastest and median
+    wall-clock times in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.time()
+        func()
+        timings.append((time.time() - started) * 1000)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    # kilobytes on Linux, bytes on OS X
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(func, repeat=5):
+    """
+    Time ``func`` as time_call does, and count the queries of one call and
+    how far it pushed up the process's peak memory.
+    """
+    peak = _peak_rss_kb()
+    with query_counter() as queries:
+        func()
+    fastest, median = time_call(func, repeat)
+    return {
+        'fastest_ms': fastest,
+        'median_ms': median,
+        'queries': queries.count,
+        'peak_rss_growth': None if peak is None else _peak_rss_kb() - peak,
+    }
+
+
+def _get(view, user, path='/'):
+    """
+    Run ``view`` on a GET from ``user`` and render the response.
+    """
+    request = RequestFactory().get(path)
+    request.user = user
+    request.session = {}
+    response = view(request)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def run_suite(rows, repeat=5, open_fraction=1.0):
+    """
+    Seed ``rows`` interests, of which ``open_fraction`` are pending, and
+    measure sign-up, candidate lookup and scoring, the results page, the admin
+    changelist and batch matching against them.  Everything is rolled
+    back afterwards.  Returns a dict of results that serialises to JSON.
+    """
+    User = get_user_model()
+    results = {'rows': rows}
+    with rolled_back():
+        open_ids = seed_interests(rows, open_fraction=open_fraction)
+        results['pending'] = len(open_ids)
+        location_ids, dept_ids = ensure_catalogue()
+        user = User.objects.get(id=create_users(1, prefix='probe')[0])
+        staff = User.objects.create(username='bench-admin', is_staff=True,
+                                    is_superuser=True)
+
+        if open_ids:
+            probe = Interest.objects.get(id=open_ids[len(open_ids) // 2])
+            results['find_matching_interests'] = measure(
+                lambda: list(probe.find_matching_interests()
+                             [:Interest.MATCH_CLAIM_ATTEMPTS]), repeat)
+            weights = getattr(settings, 'MYSTERY_MATCH_WEIGHTS', None)
+            with override_settings(
+                    MYSTERY_MATCH_WEIGHTS=weights or scoring.DEFAULT_WEIGHTS):
+                results['best_candidates'] = measure(
+                    lambda: probe.best_candidates(
+                        Interest.MATCH_CLAIM_ATTEMPTS), repeat)
+
+        def sign_up():
+            with rolled_back():
+                interest = Interest(owner=user, for_coffee=True)
+                interest.initial_save(locations=location_ids[:2],
+                                      departments=dept_ids[:2])
+        # includes rolling the sign-up back, so each run sees the same pool
+        results['sign_up'] = measure(sign_up, repeat)
+
+        interest = Interest(owner=user, for_coffee=True)
+        interest.initial_save(locations=location_ids, departments=dept_ids)
+        results['results_page'] = measure(
+            lambda: _get(views.index, user), repeat)
+        results['results_page']['matched'] = interest.match_id is not None
+
+        interest_admin = InterestAdmin(Interest, admin.site)
+        results['admin_changelist'] = measure(
+            lambda: _get(interest_admin.changelist_view, staff), repeat)
+
+        # last, since it pairs up the pool
+        started = time.time()
+        pending, pairs = match_pending()
+        elapsed = time.time() - started
+        results['match_pending'] = {
+            'pending': pending,
+            'pairs': len(pairs),
+            'seconds': elapsed,
+            'pairs_per_second': len(pairs) / elapsed if elapsed else None,
+        }
+    return results
@@ -0,0 +1,120 @@
+"""
+Process-local cache of the office locations and root departments people
+pick from when they sign up, and of which department every org group is
+under.
+
+The catalogue changes a few times a year, but the sign-up form, the
+results page and the matching index all read it on most requests.  Each
+process keeps its own copy for ``MYSTERY_CATALOGUE_TTL`` seconds, and
+saving or deleting an office or org group drops it at once in the process
+that made the change.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from core.models import OfficeLocation, OrgGroup
+
+
+class Catalogue(object):
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._locations = None
+            self._departments = None
+            self._version = None
+            self._roots = None
+            self.loaded_at = None
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        ttl = getattr(settings, 'MYSTERY_CATALOGUE_TTL', 300)
+        return ttl is not None and time.time() - self.loaded_at > ttl
+
+    def _loaded(self):
+        with self._lock:
+            if self.is_stale():
+                self.misses += 1
+                self._load()
+            else:
+                self.hits += 1
+            return self._locations, self._departments, self._version
+
+    def _load(self):
+        locations = list(OfficeLocation.objects.exclude(id='Remote'))
+        departments = list(OrgGroup.objects.filter(parent__isnull=True))
+        digest = hashlib.md5()
+        for location in locations:
+            digest.update(repr((location.pk, location.name)))
+        digest.update('|')
+        for dept in departments:
+            digest.update(repr((dept.pk, dept.title)))
+        self._locations = locations
+        self._departments = departments
+        self._version = digest.hexdigest()[:12]
+        self._roots = None
+        self.loaded_at = time.time()
+
+    def locations(self):
+        """ The offices people can pick, everywhere but Remote """
+        return list(self._loaded()[0])
+
+    def departments(self):
+        """ The root org groups people can pick """
+        return list(self._loaded()[1])
+
+    def department_roots(self):
+        """
+        A dict from every org group id to the id of the root department it
+        is under.  Loaded with one query the first time it is asked for.
+        """
+        with self._lock:
+            self._loaded()
+            if self._roots is None:
+                parents = dict(OrgGroup.objects.values_list('id', 'parent'))
+                roots = {}
+                for group_id in parents:
+                    root, seen = group_id, set()
+                    while parents.get(root) is not None and root not in seen:
+                        seen.add(root)
+                        root = parents[root]
+                    roots[group_id] = root
+                self._roots = roots
+            return self._roots
+
+    @property
+    def version(self):
+        """
+        A short digest of the catalogue's contents, which changes whenever
+        an office or root department is added, removed or renamed.  The
+        same contents give the same version in every process.
+        """
+        return self._loaded()[2]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+catalogue = Catalogue()
+
+
+def _invalidate_catalogue(sender, **kwargs):
+    catalogue.invalidate()
+
+
+for _model in (OfficeLocation, OrgGroup):
+    post_save.connect(_invalidate_catalogue, sender=_model,
+                      dispatch_uid='mystery_catalogue_%s' % _model.__name__)
+    post_delete.connect(_invalidate_catalogue, sender=_model,
+                        dispatch_uid='mystery_catalogue_%s_delete' %
+                        _model.__name__)
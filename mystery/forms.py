@@ -1,4 +1,5 @@
 from django import forms
+from mystery.catalogue import catalogue
 from mystery.models import Interest
 from core.models import OfficeLocation, OrgGroup
 from django.forms.util import ErrorList
@@ -15,25 +16,33 @@ class InterestForm(forms.ModelForm):
     class Meta:
         model = Interest
         exclude = ('owner', 'is_active', 'match', 'created', 'updated',
-                   'for_lunch', 'for_coffee', 'video_chat')
+                   'for_lunch', 'for_coffee', 'video_chat', 'meet_types',
+                   'location_signature', 'department_signature',
+                   'carried_over')
 
     def __init__(self, *args, **kwargs):
         super(InterestForm, self).__init__(*args, **kwargs)
+        # the querysets are only run to validate a submission; the choices
+        # and initial departments come from the cached catalogue
         self.fields['locations'] = LocationModelMultipleChoiceField(
             widget=forms.CheckboxSelectMultiple,
             queryset=OfficeLocation.objects.exclude(id="Remote"),
             required=False)
+        self.fields['locations'].choices = [
+            (loc.pk, loc.name) for loc in catalogue.locations()]
+        departments = catalogue.departments()
         self.fields['departments'] = forms.ModelMultipleChoiceField(
             widget=forms.CheckboxSelectMultiple,
             queryset=OrgGroup.objects.filter(parent__isnull=True))
+        self.fields['departments'].choices = [
+            (dept.pk, unicode(dept)) for dept in departments]
         choices = ((Interest.CHOICE_LUNCH, 'Lunch'),
                    (Interest.CHOICE_COFFEE, 'Coffee'),
                    (Interest.CHOICE_VIDEO, 'Video Chat'))
         self.fields['meet_choice'] = forms.TypedChoiceField(
             choices=choices,
             widget=forms.RadioSelect)
-        self.fields['departments'].initial = self.fields[
-            'departments'].queryset.all()
+        self.fields['departments'].initial = [dept.pk for dept in departments]
 
     def is_valid(self):
         is_valid = super(InterestForm, self).is_valid()
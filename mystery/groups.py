@@ -0,0 +1,193 @@
+"""
+Group meets: people who opted into meeting in a small group are put into
+groups of ``MYSTERY_GROUP_SIZE`` (3 to 6, default 4) by the match_groups
+command.
+
+``GroupBuilder`` works in memory on the whole pending pool.  Interests are
+first bucketed by meet type and office (video chats share one bucket), so
+each bucket only holds people who could sit at the same table.  Buckets
+are then filled oldest first: each interest joins the first forming group
+in its bucket that it shares a department with and has no one else of its
+owner's in, or starts a new one.  A group is closed off once it is full;
+what is left of a bucket is kept as a smaller group if it has at least
+``MYSTERY_GROUP_MIN_SIZE`` (default 3) people, and otherwise released to
+be tried in the interests' other buckets.
+
+The work is linear in the size of the pool times the buckets per interest,
+so thousands of pending interests group in well under a second.
+"""
+from collections import namedtuple
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from mystery.index import load_open_entries
+from mystery.notifications import match_made
+from mystery.status import match_status
+
+
+logger = logging.getLogger(__name__)
+
+# a group ready to be written: its meet type bit, its office id (None for
+# video chats) and its interest ids
+Group = namedtuple('Group', ['meet_types', 'location_id', 'interest_ids'])
+
+
+def group_sizes():
+    """ ``(smallest, largest)`` group allowed by the settings """
+    largest = getattr(settings, 'MYSTERY_GROUP_SIZE', 4)
+    smallest = getattr(settings, 'MYSTERY_GROUP_MIN_SIZE', 3)
+    largest = max(3, min(largest, 6))
+    return max(3, min(smallest, largest)), largest
+
+
+class _Forming(object):
+
+    def __init__(self):
+        self.ids = []
+        self.owners = set()
+        self.departments = None
+
+    def accepts(self, entry):
+        return entry.owner_id not in self.owners and \
+            bool(self.departments & entry.departments)
+
+    def add(self, entry):
+        self.ids.append(entry.interest_id)
+        self.owners.add(entry.owner_id)
+        if self.departments is None:
+            self.departments = entry.departments
+        else:
+            self.departments = self.departments & entry.departments
+
+
+class GroupBuilder(object):
+    """
+    Groups ``IndexEntry`` tuples, given oldest first.
+    """
+
+    def __init__(self, entries, smallest=3, largest=4):
+        self.entries = list(entries)
+        self.smallest = smallest
+        self.largest = largest
+
+    def _buckets(self):
+        from mystery.models import Interest
+
+        buckets = {}
+        for entry in self.entries:
+            for bit in (Interest.MEET_LUNCH, Interest.MEET_COFFEE,
+                        Interest.MEET_VIDEO):
+                if not entry.meet_types & bit:
+                    continue
+                if bit == Interest.MEET_VIDEO:
+                    buckets.setdefault((bit, None), []).append(entry)
+                    continue
+                for location_id in entry.locations:
+                    buckets.setdefault((bit, location_id), []).append(entry)
+        return buckets
+
+    def run(self):
+        """ Returns a list of Groups """
+        buckets = self._buckets()
+        placed = set()
+        groups = []
+        # the most crowded buckets first, since they make whole groups
+        for key in sorted(buckets, key=lambda key: (-len(buckets[key]), key)):
+            forming = []
+            for entry in buckets[key]:
+                if entry.interest_id in placed or not entry.departments:
+                    continue
+                for group in forming:
+                    if group.accepts(entry):
+                        break
+                else:
+                    group = _Forming()
+                    forming.append(group)
+                group.add(entry)
+                placed.add(entry.interest_id)
+                if len(group.ids) == self.largest:
+                    groups.append(Group(key[0], key[1], group.ids))
+                    forming.remove(group)
+            for group in forming:
+                if len(group.ids) >= self.smallest:
+                    groups.append(Group(key[0], key[1], group.ids))
+                else:
+                    placed.difference_update(group.ids)
+        return groups
+
+
+def write_groups(groups, smallest=3, chunk_size=100):
+    """
+    Create a Meet and its memberships for each of ``groups``.
+
+    Each chunk of groups takes a row lock on its interests and leaves out
+    any that have since been closed or grouped; a group left smaller than
+    ``smallest`` is dropped.  Returns the groups written.
+    """
+    from mystery.models import Interest, Meet, MeetMembership
+
+    written = []
+    owner_of = {}
+    with transaction.atomic():
+        for start in range(0, len(groups), chunk_size):
+            chunk = groups[start:start + chunk_size]
+            ids = [interest_id for group in chunk
+                   for interest_id in group.interest_ids]
+            owners = dict(Interest.objects.select_for_update().filter(
+                pk__in=ids, is_active=True, match=None, for_group=True
+            ).exclude(
+                pk__in=MeetMembership.objects.filter(interest__in=ids)
+                .values('interest')
+            ).values_list('id', 'owner_id'))
+
+            chunk = [group._replace(interest_ids=[
+                interest_id for interest_id in group.interest_ids
+                if interest_id in owners]) for group in chunk]
+            chunk = [group for group in chunk
+                     if len(group.interest_ids) >= smallest]
+            if not chunk:
+                continue
+
+            last_id = Meet.objects.order_by('-id') \
+                .values_list('id', flat=True).first() or 0
+            Meet.objects.bulk_create([
+                Meet(meet_types=group.meet_types,
+                     location_id=group.location_id) for group in chunk])
+            # bulk_create does not hand back ids on every backend
+            meet_ids = list(Meet.objects.filter(id__gt=last_id)
+                            .order_by('id').values_list('id', flat=True))
+            if len(meet_ids) != len(chunk):
+                raise RuntimeError('Other meets were created during a bulk '
+                                   'insert')
+
+            MeetMembership.objects.bulk_create([
+                MeetMembership(meet_id=meet_id, interest_id=interest_id,
+                               user_id=owners[interest_id])
+                for meet_id, group in zip(meet_ids, chunk)
+                for interest_id in group.interest_ids])
+            written.extend(chunk)
+            owner_of.update(owners)
+    match_status.invalidate(interest_id for group in written
+                            for interest_id in group.interest_ids)
+    if written:
+        match_made.send(sender=Meet, interests=[
+            (interest_id, owner_of[interest_id])
+            for group in written for interest_id in group.interest_ids])
+    return written
+
+
+def match_groups(dry_run=False):
+    """
+    Group the whole pool of interests waiting for a group meet.  Returns
+    ``(pending, groups)``.
+    """
+    smallest, largest = group_sizes()
+    entries = load_open_entries(for_group=True)
+    groups = GroupBuilder(entries, smallest, largest).run()
+    if not dry_run:
+        groups = write_groups(groups, smallest)
+    logger.info('%d groups from %d pending interests', len(groups),
+                len(entries))
+    return len(entries), groups
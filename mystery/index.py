@@ -0,0 +1,258 @@
+"""
+In-memory matching index for open interests.
+
+Every open interest (``is_active=True``, ``match=None``) is given a slot
+number, and the index keeps one bitset of slots per meet type, location,
+department and owner.  Looking up the candidates for an interest is then a
+handful of integer ORs and ANDs instead of a multi-join SQL query.
+
+Slots are handed out in arrival order and the index is rebuilt oldest
+first, so walking the set bits of a candidate bitset from the lowest bit
+up yields candidates oldest-first.
+"""
+from collections import namedtuple
+import threading
+import time
+
+from django.conf import settings
+
+
+# meet_types is the Interest.meet_types bitmask
+IndexEntry = namedtuple('IndexEntry', ['interest_id', 'owner_id',
+                                       'meet_types', 'locations',
+                                       'departments', 'created'])
+
+
+def _iter_bits(bits):
+    """Yield the positions of the set bits in ``bits``, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _union(bitsets, keys):
+    bits = 0
+    for key in keys:
+        bits |= bitsets.get(key, 0)
+    return bits
+
+
+def load_open_entries(for_group=False):
+    """
+    Return an ``IndexEntry`` for every open interest, oldest first: those
+    waiting for a pair, or with ``for_group`` those waiting for a group.
+
+    Three queries regardless of pool size: the interests themselves and the
+    two M2M tables.
+    """
+    from mystery.models import Interest
+
+    rows = Interest.objects.filter(is_active=True, match=None,
+                                   for_group=for_group)
+    if for_group:
+        rows = rows.filter(membership=None)
+    ids = rows.values('id')
+    rows = rows.order_by('created', 'id') \
+        .values_list('id', 'owner_id', 'meet_types', 'created')
+
+    locations = {}
+    for interest_id, location_id in Interest.locations.through.objects \
+            .filter(interest__in=ids) \
+            .values_list('interest_id', 'officelocation_id'):
+        locations.setdefault(interest_id, set()).add(location_id)
+
+    departments = {}
+    for interest_id, dept_id in Interest.departments.through.objects \
+            .filter(interest__in=ids) \
+            .values_list('interest_id', 'orggroup_id'):
+        departments.setdefault(interest_id, set()).add(dept_id)
+
+    entries = []
+    for interest_id, owner_id, meet_types, created in rows:
+        entries.append(IndexEntry(
+            interest_id, owner_id, meet_types,
+            frozenset(locations.get(interest_id, ())),
+            frozenset(departments.get(interest_id, ())),
+            created))
+    return entries
+
+
+class MatchingIndex(object):
+    """
+    Bitset index over the pool of open interests.
+
+    The database stays the source of truth: callers are expected to
+    re-check whatever the index hands back, and stale entries are simply
+    discarded when that check fails.
+    """
+
+    # rebuild the bitsets once this many slots have been freed
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._slots = {}
+            self._entries = {}
+            self._next_slot = 0
+            self._meet_types = {}
+            self._locations = {}
+            self._departments = {}
+            self._owners = {}
+            self.built_at = None
+            self.catalogue_version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, interest_id):
+        return interest_id in self._slots
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'MYSTERY_MATCHING_INDEX', False)
+
+    def is_stale(self):
+        """
+        True if the index is due a rebuild, either because its TTL is up or
+        because offices or departments have changed since it was built:
+        deleting one drops M2M rows without any signal the index hears.
+        """
+        from mystery.catalogue import catalogue
+
+        if self.built_at is None:
+            return True
+        if self.catalogue_version != catalogue.version:
+            return True
+        ttl = getattr(settings, 'MYSTERY_MATCHING_INDEX_TTL', 60)
+        return ttl is not None and time.time() - self.built_at > ttl
+
+    def ensure_built(self):
+        if self.is_stale():
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Reload the pool of open interests from the database.
+        """
+        from mystery.catalogue import catalogue
+
+        version = catalogue.version
+        entries = load_open_entries()
+        with self._lock:
+            self._load(entries)
+            self.built_at = time.time()
+            self.catalogue_version = version
+
+    @classmethod
+    def from_entries(cls, entries):
+        index = cls()
+        index._load(entries)
+        return index
+
+    def _load(self, entries):
+        built_at, version = self.built_at, self.catalogue_version
+        self.clear()
+        self.built_at, self.catalogue_version = built_at, version
+        for entry in entries:
+            self._insert(entry)
+
+    def _insert(self, entry, slot=None):
+        if slot is None:
+            slot = self._next_slot
+            self._next_slot += 1
+        bit = 1 << slot
+        self._slots[entry.interest_id] = slot
+        self._entries[slot] = entry
+        for meet_type in _iter_bits(entry.meet_types):
+            self._meet_types[meet_type] = self._meet_types.get(meet_type, 0) | bit
+        for location in entry.locations:
+            self._locations[location] = self._locations.get(location, 0) | bit
+        for dept in entry.departments:
+            self._departments[dept] = self._departments.get(dept, 0) | bit
+        self._owners[entry.owner_id] = self._owners.get(entry.owner_id, 0) | bit
+
+    @staticmethod
+    def _clear_bit(bitsets, keys, bit):
+        for key in keys:
+            remaining = bitsets.get(key, 0) & ~bit
+            if remaining:
+                bitsets[key] = remaining
+            else:
+                bitsets.pop(key, None)
+
+    def entry_for(self, interest, locations=None, departments=None):
+        """
+        Build an index entry for ``interest``.  ``locations`` and
+        ``departments`` may be passed in to save the M2M lookups.
+        """
+        if locations is None:
+            locations = interest.locations.values_list('id', flat=True)
+        else:
+            locations = [getattr(loc, 'pk', loc) for loc in locations]
+        if departments is None:
+            departments = interest.departments.values_list('id', flat=True)
+        else:
+            departments = [getattr(dept, 'pk', dept) for dept in departments]
+        return IndexEntry(interest.pk, interest.owner_id,
+                          interest.meet_types_mask(),
+                          frozenset(locations), frozenset(departments),
+                          interest.created)
+
+    def add(self, entry):
+        """
+        Index ``entry``.  An interest already in the index keeps its slot,
+        so updating it does not lose its place in the queue.
+        """
+        with self._lock:
+            slot = self._slots.get(entry.interest_id)
+            if slot is not None:
+                self._remove(entry.interest_id)
+            self._insert(entry, slot)
+
+    def discard(self, interest_id):
+        with self._lock:
+            if interest_id in self._slots:
+                self._remove(interest_id)
+                if self._next_slot - len(self._entries) > self.COMPACT_THRESHOLD:
+                    self._load(sorted(self._entries.values(),
+                                      key=lambda e: (e.created, e.interest_id)))
+
+    def _remove(self, interest_id):
+        slot = self._slots.pop(interest_id)
+        entry = self._entries.pop(slot)
+        bit = 1 << slot
+        self._clear_bit(self._meet_types, _iter_bits(entry.meet_types), bit)
+        self._clear_bit(self._locations, entry.locations, bit)
+        self._clear_bit(self._departments, entry.departments, bit)
+        self._clear_bit(self._owners, [entry.owner_id], bit)
+
+    def candidate_ids(self, entry, limit=None, exclude_owners=()):
+        """
+        Return the ids of the open interests ``entry`` could be matched
+        with, oldest first, leaving out those owned by ``exclude_owners``.
+        Mirrors the rules of ``Interest.find_matching_interests``.
+        """
+        from mystery.models import Interest
+
+        with self._lock:
+            bits = _union(self._meet_types, _iter_bits(entry.meet_types))
+            if not entry.meet_types & Interest.MEET_VIDEO:
+                bits &= _union(self._locations, entry.locations)
+            bits &= _union(self._departments, entry.departments)
+            bits &= ~self._owners.get(entry.owner_id, 0)
+            bits &= ~_union(self._owners, exclude_owners)
+
+            ids = []
+            for slot in _iter_bits(bits):
+                ids.append(self._entries[slot].interest_id)
+                if limit is not None and len(ids) >= limit:
+                    break
+            return ids
+
+
+matching_index = MatchingIndex()
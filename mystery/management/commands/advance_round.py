@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from mystery.models import Round
+
+
+class Command(BaseCommand):
+    help = ('Start the next weekly round: close matches from before the '
+            'last round, expire interests that have waited too long and '
+            'carry the rest over.  Meant to be run from cron.')
+
+    def handle(self, *args, **options):
+        new_round = Round.advance()
+        self.stdout.write('Started %s: closed %d matched, expired %d, '
+                          'carried over %d' % (
+                              new_round, new_round.closed, new_round.expired,
+                              new_round.carried_over))
@@ -0,0 +1,42 @@
+from optparse import make_option
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from mystery.archive import archive_closed
+
+
+class Command(BaseCommand):
+    help = ('Move closed interests and their locations and departments to '
+            'the archive table, in batches.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=200,
+                    help='Number of interests moved per transaction.'),
+        make_option('--older-than',
+                    type='int',
+                    dest='older_than',
+                    default=0,
+                    help='Only archive interests closed at least this many '
+                         'days ago.'),
+        make_option('--max-batches',
+                    type='int',
+                    dest='max_batches',
+                    default=None,
+                    help='Stop after this many batches.'),
+    )
+
+    def handle(self, *args, **options):
+        started = time.time()
+        older_than = None
+        if options['older_than']:
+            older_than = datetime.timedelta(days=options['older_than'])
+        archived = archive_closed(batch_size=options['batch_size'],
+                                  older_than=older_than,
+                                  max_batches=options['max_batches'])
+        self.stdout.write('Archived %d interests in %.2fs' % (
+            archived, time.time() - started))
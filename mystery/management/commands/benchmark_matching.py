@@ -0,0 +1,73 @@
+from optparse import make_option
+import json
+import platform
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from mystery import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Measure sign-up, matching, the results page and the admin list '
+            'against synthetic pools of pending interests, and optionally '
+            'write the results as JSON for comparing commits.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--sizes',
+                    dest='sizes',
+                    default='1000,10000,100000',
+                    help='Comma-separated numbers of interests to seed.'),
+        make_option('--open-fraction',
+                    type='float',
+                    dest='open_fraction',
+                    default=1.0,
+                    help='Fraction of seeded interests left pending.'),
+        make_option('--repeat',
+                    type='int',
+                    dest='repeat',
+                    default=5,
+                    help='Number of timed runs per measurement.'),
+        make_option('--label',
+                    dest='label',
+                    default='',
+                    help='Recorded with the results, e.g. a commit id.'),
+        make_option('--output',
+                    dest='output',
+                    default=None,
+                    help='File to write the results to as JSON.'),
+    )
+
+    def handle(self, *args, **options):
+        report = {
+            'label': options['label'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'results': [],
+        }
+        for rows in [int(size) for size in options['sizes'].split(',')]:
+            results = benchmarks.run_suite(
+                rows, repeat=options['repeat'],
+                open_fraction=options['open_fraction'])
+            report['results'].append(results)
+            self._print(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(report, stream, indent=2, sort_keys=True)
+
+    def _print(self, results):
+        self.stdout.write('\n%d interests, %d pending' % (
+            results['rows'], results['pending']))
+        self.stdout.write('%-24s %10s %10s %8s' % (
+            '', 'fastest ms', 'median ms', 'queries'))
+        for name in ('find_matching_interests', 'best_candidates', 'sign_up',
+                     'results_page', 'admin_changelist'):
+            if name in results:
+                self.stdout.write('%-24s %10.2f %10.2f %8d' % (
+                    name, results[name]['fastest_ms'],
+                    results[name]['median_ms'], results[name]['queries']))
+        batch = results['match_pending']
+        self.stdout.write('match_pending: %d pairs from %d pending in '
+                          '%.2fs' % (batch['pairs'], batch['pending'],
+                                     batch['seconds']))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from mystery.pairs import rebuild_pair_history
+
+
+class Command(BaseCommand):
+    help = ('Record every pair of people matched in the live or archived '
+            'interests, so they are not matched again.')
+
+    def handle(self, *args, **options):
+        added = rebuild_pair_history()
+        self.stdout.write('Recorded %d new pairs' % added)
@@ -0,0 +1,90 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from mystery import benchmarks
+from mystery.models import Interest
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic interest history and show the query plans and '
+            'timings of the matching and index page queries.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--rows',
+                    type='int',
+                    dest='rows',
+                    default=100000,
+                    help='Number of synthetic interests to seed.'),
+        make_option('--open-fraction',
+                    type='float',
+                    dest='open_fraction',
+                    default=0.02,
+                    help='Fraction of seeded interests left open.'),
+        make_option('--repeat',
+                    type='int',
+                    dest='repeat',
+                    default=5,
+                    help='Number of timed runs per query.'),
+        make_option('--breadths',
+                    dest='breadths',
+                    default='1,2,4,8',
+                    help='Comma-separated numbers of locations and '
+                         'departments to probe for join fan-out.'),
+        make_option('--keep',
+                    action='store_true',
+                    dest='keep',
+                    default=False,
+                    help='Keep the seeded rows instead of rolling back.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['keep']:
+            self._run(options)
+        else:
+            with benchmarks.rolled_back():
+                self._run(options)
+
+    def _run(self, options):
+        open_ids = benchmarks.seed_interests(
+            options['rows'], open_fraction=options['open_fraction'])
+        self.stdout.write('Seeded %d interests, %d open' % (
+            options['rows'], len(open_ids)))
+        if not open_ids:
+            return
+
+        sample = Interest.objects.get(id=open_ids[len(open_ids) // 2])
+        queries = [
+            ('matching', sample._query_matching_interests()),
+            ('index page', Interest.objects.filter(
+                owner=sample.owner_id, is_active=True
+            ).order_by('-created')[:1]),
+        ]
+        for name, queryset in queries:
+            fastest, median = benchmarks.time_call(
+                lambda: list(queryset.all()), repeat=options['repeat'])
+            self.stdout.write('\n%s: fastest %.2fms, median %.2fms' % (
+                name, fastest, median))
+            for line in benchmarks.explain(queryset):
+                self.stdout.write('    %s' % line)
+
+        self._fanout(options)
+
+    def _fanout(self, options):
+        """
+        Row counts and timings of the candidate query as an interest picks
+        more locations and departments.
+        """
+        location_ids, dept_ids = benchmarks.ensure_catalogue()
+        owner_id = benchmarks.create_users(1, prefix='probe')[0]
+        self.stdout.write('\n%-8s %-14s %10s %10s' % (
+            'breadth', 'query', 'rows', 'median ms'))
+        for breadth in [int(b) for b in options['breadths'].split(',')]:
+            probe = Interest(owner_id=owner_id, for_coffee=True,
+                             is_active=False)
+            probe.initial_save(locations=location_ids[:breadth],
+                               departments=dept_ids[:breadth])
+            for name, rows, median in benchmarks.fanout(
+                    probe, repeat=options['repeat']):
+                self.stdout.write('%-8d %-14s %10d %10.2f' % (
+                    breadth, name, rows, median))
@@ -0,0 +1,52 @@
+from optparse import make_option
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mystery import transfer
+from mystery.models import Interest
+
+
+class Command(BaseCommand):
+    args = '[file]'
+    help = ('Stream every interest, or just the open ones, to a CSV or JSON '
+            'lines file in constant memory.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    dest='format',
+                    default=None,
+                    help='csv or jsonl; guessed from the file name if not '
+                         'given, jsonl on standard output.'),
+        make_option('--open',
+                    action='store_true',
+                    dest='open',
+                    default=False,
+                    help='Only export active, unmatched interests.'),
+        make_option('--chunk-size',
+                    type='int',
+                    dest='chunk_size',
+                    default=1000,
+                    help='Number of rows fetched from the database at once.'),
+    )
+
+    def handle(self, *args, **options):
+        path = args[0] if args else None
+        format = options['format'] or \
+            ('csv' if path and path.endswith('.csv') else 'jsonl')
+        queryset = Interest.objects.all()
+        if options['open']:
+            queryset = queryset.filter(is_active=True, match=None)
+
+        stream = open(path, 'wb') if path else sys.stdout
+        try:
+            # server-side cursors only live inside a transaction
+            with transaction.atomic():
+                count = transfer.write_rows(stream, transfer.export_rows(
+                    queryset, chunk_size=options['chunk_size']), format)
+        finally:
+            if path:
+                stream.close()
+        if path:
+            self.stdout.write('Exported %d interests' % count)
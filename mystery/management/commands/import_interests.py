@@ -0,0 +1,68 @@
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mystery import transfer
+from mystery.index import matching_index
+from mystery.matching import match_pending
+
+
+class Command(BaseCommand):
+    args = '<file>'
+    help = ('Bulk-load interests from a CSV or JSON lines file, then match '
+            'the pending pool once.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    dest='format',
+                    default=None,
+                    help='csv or jsonl; guessed from the file name if not '
+                         'given.'),
+        make_option('--chunk-size',
+                    type='int',
+                    dest='chunk_size',
+                    default=500,
+                    help='Number of rows inserted per bulk INSERT.'),
+        make_option('--strict',
+                    action='store_true',
+                    dest='strict',
+                    default=False,
+                    help='Stop and load nothing at the first invalid row, '
+                         'instead of skipping it.'),
+        make_option('--no-match',
+                    action='store_false',
+                    dest='match',
+                    default=True,
+                    help='Leave the imported interests unmatched.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the file to import.')
+        path = args[0]
+        format = options['format'] or \
+            ('csv' if path.endswith('.csv') else 'jsonl')
+
+        started = time.time()
+        with open(path, 'rb') as stream:
+            try:
+                with transaction.atomic():
+                    count, errors = transfer.import_interests(
+                        transfer.read_rows(stream, format),
+                        chunk_size=options['chunk_size'],
+                        strict=options['strict'])
+            except transfer.RowError as e:
+                raise CommandError(unicode(e))
+        for error in errors:
+            self.stderr.write('Skipped %s' % error)
+        self.stdout.write('Imported %d interests in %.2fs' % (
+            count, time.time() - started))
+
+        # the new open interests went in behind the index's back
+        matching_index.clear()
+        if options['match'] and count:
+            pending, pairs = match_pending()
+            self.stdout.write('Matched %d pairs from %d pending interests' % (
+                len(pairs), pending))
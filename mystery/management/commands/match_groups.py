@@ -0,0 +1,25 @@
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+
+from mystery.groups import match_groups
+
+
+class Command(BaseCommand):
+    help = 'Put everyone waiting for a group meet into groups in one pass.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run',
+                    action='store_true',
+                    dest='dry_run',
+                    default=False,
+                    help='Compute the groups without saving them.'),
+    )
+
+    def handle(self, *args, **options):
+        started = time.time()
+        pending, groups = match_groups(dry_run=options['dry_run'])
+        self.stdout.write('%s %d groups from %d pending interests in %.2fs' % (
+            'Would form' if options['dry_run'] else 'Formed',
+            len(groups), pending, time.time() - started))
@@ -0,0 +1,25 @@
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+
+from mystery.matching import match_pending
+
+
+class Command(BaseCommand):
+    help = 'Pair up every active, unmatched interest in one pass.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run',
+                    action='store_true',
+                    dest='dry_run',
+                    default=False,
+                    help='Compute the matching without saving it.'),
+    )
+
+    def handle(self, *args, **options):
+        started = time.time()
+        pending, pairs = match_pending(dry_run=options['dry_run'])
+        self.stdout.write('%s %d pairs from %d pending interests in %.2fs' % (
+            'Would match' if options['dry_run'] else 'Matched',
+            len(pairs), pending, time.time() - started))
@@ -0,0 +1,44 @@
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+
+from mystery.matching import requeue_stalled_jobs, run_match_jobs
+
+
+class Command(BaseCommand):
+    help = ('Run queued match jobs, for use with MYSTERY_ASYNC_MATCHING. '
+            'Several workers can run side by side.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--once',
+                    action='store_true',
+                    dest='once',
+                    default=False,
+                    help='Run the jobs queued now and exit.'),
+        make_option('--sleep',
+                    type='float',
+                    dest='sleep',
+                    default=2.0,
+                    help='Seconds to wait when the queue is empty.'),
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=100,
+                    help='Number of jobs to claim per pass.'),
+        make_option('--stall-timeout',
+                    type='int',
+                    dest='stall_timeout',
+                    default=300,
+                    help='Seconds after which a running job is requeued.'),
+    )
+
+    def handle(self, *args, **options):
+        while True:
+            requeue_stalled_jobs(options['stall_timeout'])
+            ran = run_match_jobs(limit=options['batch_size'])
+            if options['once']:
+                if ran < options['batch_size']:
+                    break
+            elif not ran:
+                time.sleep(options['sleep'])
@@ -0,0 +1,23 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from mystery.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = ('Email everyone matched since the last run, one message each, '
+            'over a single SMTP connection.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--limit',
+                    type='int',
+                    dest='limit',
+                    default=None,
+                    help='Email at most this many people.'),
+    )
+
+    def handle(self, *args, **options):
+        messages, notifications = send_digests(limit=options['limit'])
+        self.stdout.write('Sent %d emails covering %d matches' % (
+            messages, notifications))
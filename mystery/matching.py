@@ -0,0 +1,334 @@
+"""
+Batch matching of the whole pending pool.
+
+``Interest.add_match_if_exists`` pairs people greedily as they sign up, so
+two compatible interests that arrived in an unlucky order can sit unmatched
+all week.  The batch matcher loads every open interest once, pairs them in
+memory and writes all of the pairs back in one transaction.
+"""
+import datetime
+import logging
+
+from django.db import (IntegrityError, OperationalError, connection,
+                       transaction)
+from django.db.models import F
+from django.utils import timezone
+
+from mystery.index import MatchingIndex, load_open_entries, matching_index
+from mystery.notifications import match_made
+from mystery.pairs import PairHistoryCache
+from mystery.status import match_status
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchMatcher(object):
+    """
+    Pairs up a list of ``IndexEntry`` objects.
+
+    Interests are first paired greedily, oldest first, each with the oldest
+    compatible interest still free.  Every interest left over is then given
+    a chance to take a partner from an existing pair whose other half can be
+    re-paired with someone free (an augmenting path of length three), which
+    recovers the pairs the greedy pass missed because of arrival order.
+    """
+
+    # matched candidates looked at per leftover interest when augmenting
+    AUGMENT_WINDOW = 25
+
+    def __init__(self, entries, partners=None):
+        """
+        ``partners``, if given, maps a user id to the ids of the people they
+        must not be paired with again, such as PairHistoryCache.partners.
+        """
+        self.entries = list(entries)
+        self.by_id = dict((entry.interest_id, entry) for entry in self.entries)
+        self.partners = partners or (lambda user_id: ())
+        self.mates = {}
+
+    def run(self):
+        """
+        Compute the matching.  Returns a list of ``(older_id, newer_id)``
+        pairs.
+        """
+        free = MatchingIndex.from_entries(self.entries)
+        # never shrinks, so that matched interests can still be found
+        everyone = MatchingIndex.from_entries(self.entries)
+        free.COMPACT_THRESHOLD = len(self.entries) // 2 + 1
+
+        for entry in self.entries:
+            if entry.interest_id in self.mates:
+                continue
+            candidates = free.candidate_ids(
+                entry, limit=1, exclude_owners=self.partners(entry.owner_id))
+            if candidates:
+                self._pair(entry.interest_id, candidates[0], free)
+
+        for entry in self.entries:
+            if entry.interest_id not in self.mates:
+                self._augment(entry, free, everyone)
+
+        return self.pairs()
+
+    def pairs(self):
+        order = dict((entry.interest_id, position)
+                     for position, entry in enumerate(self.entries))
+        pairs = set()
+        for a, b in self.mates.items():
+            if order[a] < order[b]:
+                pairs.add((a, b))
+        return sorted(pairs, key=lambda pair: order[pair[0]])
+
+    def _pair(self, a, b, free):
+        self.mates[a] = b
+        self.mates[b] = a
+        free.discard(a)
+        free.discard(b)
+
+    def _augment(self, entry, free, everyone):
+        u = entry.interest_id
+        for v in everyone.candidate_ids(
+                entry, limit=self.AUGMENT_WINDOW,
+                exclude_owners=self.partners(entry.owner_id)):
+            if v not in self.mates:
+                continue
+            w = self.mates[v]
+            w_owner = self.by_id[w].owner_id
+            for x in free.candidate_ids(
+                    self.by_id[w], limit=2,
+                    exclude_owners=self.partners(w_owner)):
+                if x == u:
+                    continue
+                del self.mates[v]
+                del self.mates[w]
+                self._pair(u, v, free)
+                self._pair(w, x, free)
+                return True
+        return False
+
+
+class _PairingLost(Exception):
+    pass
+
+
+def _pair_update(pairs):
+    """
+    Set both sides of every pair in ``pairs`` with one ``UPDATE``, touching
+    only interests that are still open.  Returns the number of rows changed.
+    """
+    from mystery.models import Interest
+
+    qn = connection.ops.quote_name
+    opts = Interest._meta
+    pk_column = qn(opts.pk.column)
+
+    whens = []
+    params = []
+    for a, b in pairs:
+        whens.append('WHEN %s THEN %s WHEN %s THEN %s')
+        params.extend([a, b, b, a])
+    ids = [interest_id for pair in pairs for interest_id in pair]
+    params.append(timezone.now())
+    params.extend(ids)
+    params.append(True)
+
+    sql = 'UPDATE %s SET %s = CASE %s %s END, %s = %%s ' \
+          'WHERE %s IN (%s) AND %s = %%s AND %s IS NULL' % (
+              qn(opts.db_table),
+              qn(opts.get_field('match').column), pk_column, ' '.join(whens),
+              qn(opts.get_field('updated').column),
+              pk_column, ', '.join(['%s'] * len(ids)),
+              qn(opts.get_field('is_active').column),
+              qn(opts.get_field('match').column))
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.rowcount
+
+
+def _record_pair_history(owner_pairs):
+    """
+    Insert a PairHistory row for each pair of owner ids.  Raises
+    IntegrityError if one was already there.
+    """
+    from mystery.models import PairHistory
+
+    PairHistory.objects.bulk_create([
+        PairHistory(user_a_id=key[0], user_b_id=key[1])
+        for key in set(PairHistory.key(a, b) for a, b in owner_pairs)
+        if key is not None])
+
+
+def _already_met(owner_pairs):
+    """
+    The canonical keys of those ``owner_pairs`` already in PairHistory,
+    found with one query.
+    """
+    from mystery.models import PairHistory
+
+    keys = set(PairHistory.key(a, b) for a, b in owner_pairs)
+    keys.discard(None)
+    if not keys:
+        return set()
+    found = PairHistory.objects.filter(
+        user_a__in=set(a for a, b in keys), user_b__in=set(b for a, b in keys)
+    ).values_list('user_a_id', 'user_b_id')
+    return set(found) & keys
+
+
+def _is_deadlock(error):
+    """
+    True if ``error`` is the database giving up on a lock cycle, which two
+    concurrent claims of the same pair in opposite order can cause.
+    """
+    cause = getattr(error, '__cause__', None) or error
+    if getattr(cause, 'pgcode', None) == '40P01':  # PostgreSQL
+        return True
+    args = getattr(cause, 'args', None) or (None,)
+    return args[0] == 1213  # MySQL, ER_LOCK_DEADLOCK
+
+
+def pair_interests(a_id, b_id, owner_ids=None):
+    """
+    Record two open interests as each other's match with a single
+    ``UPDATE``, and their owners as having met.  Returns False, changing
+    nothing, unless both were still open and the owners had not been
+    matched before.  ``owner_ids`` saves looking the owners up.
+    """
+    from mystery.models import Interest
+
+    if owner_ids is None:
+        owners = dict(Interest.objects.filter(id__in=[a_id, b_id])
+                      .values_list('id', 'owner_id'))
+        owner_ids = (owners.get(a_id), owners.get(b_id))
+    try:
+        with transaction.atomic():
+            if _pair_update([(a_id, b_id)]) != 2:
+                raise _PairingLost()
+            _record_pair_history([owner_ids])
+    except (_PairingLost, IntegrityError):
+        return False
+    except OperationalError as e:
+        # the UPDATE locks both rows in whatever order it finds them; the
+        # loser of a deadlock has simply lost the claim
+        if not _is_deadlock(e):
+            raise
+        logger.info('Deadlock pairing %s and %s', a_id, b_id)
+        return False
+
+    matching_index.discard(a_id)
+    matching_index.discard(b_id)
+    match_status.invalidate([a_id, b_id])
+    match_made.send(sender=Interest,
+                    interests=[(a_id, owner_ids[0]), (b_id, owner_ids[1])])
+    return True
+
+
+def write_pairs(pairs, chunk_size=500):
+    """
+    Record ``pairs`` of interest ids as matches.
+
+    Each chunk takes a row lock on the interests involved, drops any pair
+    that is no longer open on both sides or whose owners have met, and then
+    sets both sides of every remaining pair with a single ``UPDATE``.
+    Returns the pairs written.
+    """
+    from mystery.models import Interest, PairHistory
+
+    written = []
+    owner_of = {}
+    with transaction.atomic():
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start:start + chunk_size]
+            ids = [interest_id for pair in chunk for interest_id in pair]
+            owners = dict(Interest.objects.select_for_update().filter(
+                pk__in=ids, is_active=True, match=None
+            ).values_list('id', 'owner_id'))
+            chunk = [(a, b) for a, b in chunk if a in owners and b in owners]
+            met = _already_met([(owners[a], owners[b]) for a, b in chunk])
+            chunk = [(a, b) for a, b in chunk
+                     if PairHistory.key(owners[a], owners[b]) not in met]
+            if chunk:
+                _pair_update(chunk)
+                _record_pair_history(
+                    [(owners[a], owners[b]) for a, b in chunk])
+                written.extend(chunk)
+                owner_of.update(owners)
+
+    for a, b in written:
+        matching_index.discard(a)
+        matching_index.discard(b)
+    match_status.invalidate(
+        interest_id for pair in written for interest_id in pair)
+    if written:
+        match_made.send(sender=Interest, interests=[
+            (interest_id, owner_of[interest_id])
+            for pair in written for interest_id in pair])
+    return written
+
+
+def match_pending(dry_run=False):
+    """
+    Pair up the whole pending pool.  Returns ``(pending, pairs)``.
+    """
+    entries = load_open_entries()
+    # a fresh copy, since pairs made by other processes matter here
+    history = PairHistoryCache()
+    history.reload()
+    pairs = BatchMatcher(entries, partners=history.partners).run()
+    if not dry_run:
+        pairs = write_pairs(pairs)
+    return len(entries), pairs
+
+
+def requeue_stalled_jobs(timeout):
+    """
+    Put jobs claimed more than ``timeout`` seconds ago, whose worker
+    presumably died, back in the queue.  Returns how many were requeued.
+    """
+    from mystery.models import MatchJob
+    cutoff = timezone.now() - datetime.timedelta(seconds=timeout)
+    return MatchJob.objects.filter(
+        status=MatchJob.RUNNING, claimed__lt=cutoff
+    ).update(status=MatchJob.PENDING)
+
+
+def run_match_jobs(limit=100, max_attempts=3):
+    """
+    Claim and run up to ``limit`` queued match jobs, oldest first.
+
+    Several workers can run at once: a job only runs in the worker whose
+    conditional UPDATE moved it from pending to running.  A job that raises
+    goes back in the queue until it has failed ``max_attempts`` times.
+    Returns the number of jobs run.
+    """
+    from mystery.models import MatchJob
+
+    job_ids = list(MatchJob.objects.filter(status=MatchJob.PENDING)
+                   .order_by('created').values_list('id', flat=True)[:limit])
+    ran = 0
+    for job_id in job_ids:
+        claimed = MatchJob.objects.filter(
+            pk=job_id, status=MatchJob.PENDING
+        ).update(status=MatchJob.RUNNING, claimed=timezone.now(),
+                 attempts=F('attempts') + 1)
+        if not claimed:
+            continue
+
+        job = MatchJob.objects.select_related('interest').get(pk=job_id)
+        interest = job.interest
+        try:
+            if interest.is_active and interest.match_id is None:
+                interest.add_match_if_exists()
+        except Exception:
+            logger.exception('Match job %s failed', job_id)
+            if job.attempts >= max_attempts:
+                status = MatchJob.FAILED
+            else:
+                status = MatchJob.PENDING
+        else:
+            status = MatchJob.DONE
+        MatchJob.objects.filter(pk=job_id).update(
+            status=status, finished=timezone.now())
+        ran += 1
+    return ran
@@ -0,0 +1,215 @@
+"""
+Timings, counts and query counts from the matching path and the views.
+
+Measurements go to every sink named in ``MYSTERY_METRICS_SINKS``, a list
+of dotted paths to sink classes, by default just ``StatsSink``.  A sink
+has one method, ``record(kind, name, value)``, where ``kind`` is one of
+
+* ``timing``: a duration in milliseconds
+* ``count``: an increment of a counter
+* ``value``: an observed quantity, such as a number of candidates
+
+``StatsSink`` aggregates into the process-wide ``stats``, which the
+``/mystery/metrics`` view renders as text for a scraper.
+
+Counting a view's queries turns on Django's debug cursor, which keeps the
+SQL of every statement, so it is only done with ``MYSTERY_METRICS_QUERIES``
+on (by default, when ``DEBUG`` is).
+"""
+from functools import wraps
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_by_path
+
+TIMING = 'timing'
+COUNT = 'count'
+VALUE = 'value'
+
+
+class Stats(object):
+    """
+    Running count, sum, min and max of every name recorded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def add(self, kind, name, value):
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                self._series[(kind, name)] = [1, value, value, value]
+            else:
+                series[0] += 1
+                series[1] += value
+                series[2] = min(series[2], value)
+                series[3] = max(series[3], value)
+
+    def get(self, kind, name):
+        """
+        ``{'count', 'sum', 'min', 'max'}`` for a name, or None if nothing
+        has been recorded under it.
+        """
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                return None
+            return dict(zip(('count', 'sum', 'min', 'max'), series))
+
+    def render(self):
+        """
+        One ``mystery_<name>_<statistic> <value>`` line per statistic.
+        Counters have a single ``_total`` line.
+        """
+        with self._lock:
+            series = sorted(self._series.items())
+        lines = []
+        for (kind, name), (count, total, low, high) in series:
+            metric = 'mystery_%s' % name.replace('.', '_')
+            if kind == TIMING:
+                metric += '_ms'
+            if kind == COUNT:
+                lines.append('%s_total %s' % (metric, total))
+                continue
+            lines.append('%s_count %d' % (metric, count))
+            lines.append('%s_sum %s' % (metric, total))
+            lines.append('%s_min %s' % (metric, low))
+            lines.append('%s_max %s' % (metric, high))
+        return '\n'.join(lines) + '\n'
+
+
+stats = Stats()
+
+
+class StatsSink(object):
+
+    def record(self, kind, name, value):
+        stats.add(kind, name, value)
+
+
+class LoggingSink(object):
+
+    logger = logging.getLogger('mystery.metrics')
+
+    def record(self, kind, name, value):
+        self.logger.info('%s %s %s', kind, name, value)
+
+
+_sinks = {}
+
+
+def sinks():
+    paths = tuple(getattr(settings, 'MYSTERY_METRICS_SINKS',
+                          ['mystery.metrics.StatsSink']))
+    if paths not in _sinks:
+        _sinks[paths] = [import_by_path(path)() for path in paths]
+    return _sinks[paths]
+
+
+def record(kind, name, value):
+    for sink in sinks():
+        sink.record(kind, name, value)
+
+
+def incr(name, count=1):
+    record(COUNT, name, count)
+
+
+def observe(name, value):
+    record(VALUE, name, value)
+
+
+class timer(object):
+    """
+    Record how long the body takes as a timing called ``name``.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._started = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(TIMING, self.name, (time.time() - self._started) * 1000)
+
+
+def _counted_connections():
+    """
+    The default connection, and the read replica's if one is configured,
+    since replica_reads sends a view's reads there.
+    """
+    from mystery.routers import replica_alias
+
+    aliases = [DEFAULT_DB_ALIAS]
+    replica = replica_alias()
+    if replica and replica in connections.databases:
+        aliases.append(replica)
+    counted = []
+    for alias in aliases:
+        if all(connections[alias] is not other for other in counted):
+            counted.append(connections[alias])
+    return counted
+
+
+class query_counter(object):
+    """
+    Count the queries run in the body, on the default database and any
+    read replica, available as ``count`` afterwards.  Like
+    django.test.utils.CaptureQueriesContext, this switches on the debug
+    cursor for the duration.
+    """
+
+    def __enter__(self):
+        self._connections = _counted_connections()
+        self._debug_cursors = [conn.use_debug_cursor
+                               for conn in self._connections]
+        self._starts = []
+        for conn in self._connections:
+            conn.use_debug_cursor = True
+            self._starts.append(len(conn.queries))
+        self.count = 0
+        return self
+
+    def __exit__(self, *exc_info):
+        for conn, debug_cursor, start in zip(
+                self._connections, self._debug_cursors, self._starts):
+            conn.use_debug_cursor = debug_cursor
+            self.count += len(conn.queries) - start
+
+
+def counts_queries():
+    return getattr(settings, 'MYSTERY_METRICS_QUERIES', settings.DEBUG)
+
+
+def instrumented(name):
+    """
+    View decorator recording the view's time, response status and, with
+    query counting on, query count under ``view.<name>``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            prefix = 'view.%s' % name
+            if counts_queries():
+                with query_counter() as queries:
+                    with timer(prefix):
+                        response = view(request, *args, **kwargs)
+                observe('%s.queries' % prefix, queries.count)
+            else:
+                with timer(prefix):
+                    response = view(request, *args, **kwargs)
+            incr('%s.status_%d' % (prefix, response.status_code))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import DataMigration
+from django.db import models
+
+
+class Migration(DataMigration):
+
+    # SignatureBit.OVERFLOW_BIT, frozen here as of this migration
+    OVERFLOW_BIT = 62
+
+    def forwards(self, orm):
+        "Allocate signature bits and fill in the Interest signatures."
+        Interest = orm['mystery.Interest']
+        SignatureBit = orm['mystery.SignatureBit']
+        sides = [
+            ('location', 'location_signature',
+             Interest.locations.through, 'officelocation'),
+            ('department', 'department_signature',
+             Interest.departments.through, 'orggroup'),
+        ]
+        for kind, field, through, related in sides:
+            bits = {}
+            signatures = {}
+            for interest_id, key in through.objects.order_by(related) \
+                    .values_list('interest', related):
+                key = unicode(key)
+                if key not in bits:
+                    bits[key] = SignatureBit.objects.create(
+                        kind=kind, key=key, bit=len(bits)).bit
+                signatures[interest_id] = signatures.get(interest_id, 0) | \
+                    (1 << min(bits[key], self.OVERFLOW_BIT))
+
+            # one UPDATE per distinct signature rather than per interest
+            by_signature = {}
+            for interest_id, signature in signatures.items():
+                by_signature.setdefault(signature, []).append(interest_id)
+            for signature, ids in by_signature.items():
+                for start in range(0, len(ids), 500):
+                    Interest.objects.filter(id__in=ids[start:start + 500]) \
+                        .update(**{field: signature})
+
+    def backwards(self, orm):
+        "Forget every signature."
+        orm['mystery.Interest'].objects.update(location_signature=0,
+                                               department_signature=0)
+        orm['mystery.SignatureBit'].objects.all().delete()
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'core.collabuser': {
+            'Meta': {'object_name': 'CollabUser'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '254', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '75', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Group']", 'symmetrical': 'False', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '75', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '75'})
+        },
+        u'core.officelocation': {
+            'Meta': {'object_name': 'OfficeLocation'},
+            'city': ('django.db.models.fields.CharField', [], {'max_length': '56'}),
+            'id': ('django.db.models.fields.CharField', [], {'max_length': '12', 'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '56'}),
+            'state': ('django.db.models.fields.CharField', [], {'max_length': '2'}),
+            'street': ('django.db.models.fields.CharField', [], {'max_length': '56'}),
+            'suite': ('django.db.models.fields.CharField', [], {'max_length': '56', 'null': 'True', 'blank': 'True'}),
+            'zip': ('django.db.models.fields.CharField', [], {'max_length': '10'})
+        },
+        u'core.orggroup': {
+            'Meta': {'object_name': 'OrgGroup'},
+            'description': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'parent': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['core.OrgGroup']", 'null': 'True', 'blank': 'True'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '128'})
+        },
+        u'mystery.interest': {
+            'Meta': {'index_together': "[('is_active', 'match', 'created'), ('is_active', 'match', 'meet_types', 'created'), ('owner', 'is_active', 'created')]", 'object_name': 'Interest'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'department_signature': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'departments': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['core.OrgGroup']", 'symmetrical': 'False'}),
+            'for_coffee': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'for_lunch': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'location_signature': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'locations': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['core.OfficeLocation']", 'symmetrical': 'False'}),
+            'match': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['mystery.Interest']", 'null': 'True'}),
+            'meet_types': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0'}),
+            'owner': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['core.CollabUser']"}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'video_chat': ('django.db.models.fields.BooleanField', [], {'default': 'False'})
+        },
+        u'mystery.signaturebit': {
+            'Meta': {'unique_together': "[('kind', 'key'), ('kind', 'bit')]", 'object_name': 'SignatureBit'},
+            'bit': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'key': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'kind': ('django.db.models.fields.CharField', [], {'max_length': '16'})
+        }
+    }
+
+    complete_apps = ['mystery']
+    symmetrical = True
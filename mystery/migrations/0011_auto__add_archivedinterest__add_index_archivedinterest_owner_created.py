@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'ArchivedInterest'
+        db.create_table(u'mystery_archivedinterest', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('original_id', self.gf('django.db.models.fields.PositiveIntegerField')(unique=True)),
+            ('owner', self.gf('django.db.models.fields.related.ForeignKey')(related_name='archived_interests', to=orm['core.CollabUser'])),
+            ('match_original_id', self.gf('django.db.models.fields.PositiveIntegerField')(null=True, blank=True)),
+            ('match_owner', self.gf('django.db.models.fields.related.ForeignKey')(blank=True, related_name='+', null=True, to=orm['core.CollabUser'])),
+            ('for_lunch', self.gf('django.db.models.fields.BooleanField')(default=False)),
+            ('for_coffee', self.gf('django.db.models.fields.BooleanField')(default=False)),
+            ('video_chat', self.gf('django.db.models.fields.BooleanField')(default=False)),
+            ('meet_types', self.gf('django.db.models.fields.PositiveSmallIntegerField')(default=0)),
+            ('carried_over', self.gf('django.db.models.fields.PositiveSmallIntegerField')(default=0)),
+            ('created', self.gf('django.db.models.fields.DateTimeField')()),
+            ('updated', self.gf('django.db.models.fields.DateTimeField')()),
+            ('archived', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, blank=True)),
+        ))
+        db.send_create_signal(u'mystery', ['ArchivedInterest'])
+
+        # Adding M2M table for field locations on 'ArchivedInterest'
+        db.create_table(u'mystery_archivedinterest_locations', (
+            ('id', models.AutoField(verbose_name='ID', primary_key=True, auto_created=True)),
+            ('archivedinterest', models.ForeignKey(orm[u'mystery.archivedinterest'], null=False)),
+            ('officelocation', models.ForeignKey(orm[u'core.officelocation'], null=False))
+        ))
+        db.create_unique(u'mystery_archivedinterest_locations', ['archivedinterest_id', 'officelocation_id'])
+
+        # Adding M2M table for field departments on 'ArchivedInterest'
+        db.create_table(u'mystery_archivedinterest_departments', (
+            ('id', models.AutoField(verbose_name='ID', primary_key=True, auto_created=True)),
+            ('archivedinterest', models.ForeignKey(orm[u'mystery.archivedinterest'], null=False)),
+            ('orggroup', models.ForeignKey(orm[u'core.orggroup'], null=False))
+        ))
+        db.create_unique(u'mystery_archivedinterest_departments', ['archivedinterest_id', 'orggroup_id'])
+
+        # Adding index on 'ArchivedInterest', fields ['owner', 'created']
+        db.create_index(u'mystery_archivedinterest', ['owner_id', 'created'])
+
+    def backwards(self, orm):
+        # Removing index on 'ArchivedInterest', fields ['owner', 'created']
+        db.delete_index(u'mystery_archivedinterest', ['owner_id', 'created'])
+
+        # Deleting model 'ArchivedInterest'
+        db.delete_table(u'mystery_archivedinterest')
+
+        # Removing M2M table for field locations on 'ArchivedInterest'
+        db.delete_table('mystery_archivedinterest_locations')
+
+        # Removing M2M table for field departments on 'ArchivedInterest'
+        db.delete_table('mystery_archivedinterest_departments')
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'core.collabuser': {
+            'Meta': {'object_name': 'CollabUser'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '254', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '75', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Group']", 'symmetrical': 'False', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '75', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '75'})
+        },
+        u'core.officelocation': {
+            'Meta': {'object_name': 'OfficeLocation'},
+            'city': ('django.db.models.fields.CharField', [], {'max_length': '56'}),
+            'id': ('django.db.models.fields.CharField', [], {'max_length': '12', 'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '56'}),
+            'state': ('django.db.models.fields.CharField', [], {'max_length': '2'}),
+            'street': ('django.db.models.fields.CharField', [], {'max_length': '56'}),
+            'suite': ('django.db.models.fields.CharField', [], {'max_length': '56', 'null': 'True', 'blank': 'True'}),
+            'zip': ('django.db.models.fields.CharField', [], {'max_length': '10'})
+        },
+        u'core.orggroup': {
+            'Meta': {'object_name': 'OrgGroup'},
+            'description': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'parent': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['core.OrgGroup']", 'null': 'True', 'blank': 'True'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '128'})
+        },
+        u'mystery.archivedinterest': {
+            'Meta': {'object_name': 'ArchivedInterest', 'index_together': "[('owner', 'created')]"},
+            'archived': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'carried_over': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {}),
+            'departments': ('django.db.models.fields.related.ManyToManyField', [], {'related_name': "'archived_interests'", 'symmetrical': 'False', 'to': u"orm['core.OrgGroup']"}),
+            'for_coffee': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'for_lunch': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'locations': ('django.db.models.fields.related.ManyToManyField', [], {'related_name': "'archived_interests'", 'symmetrical': 'False', 'to': u"orm['core.OfficeLocation']"}),
+            'match_original_id': ('django.db.models.fields.PositiveIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'match_owner': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'+'", 'null': 'True', 'to': u"orm['core.CollabUser']"}),
+            'meet_types': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0'}),
+            'original_id': ('django.db.models.fields.PositiveIntegerField', [], {'unique': 'True'}),
+            'owner': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'archived_interests'", 'to': u"orm['core.CollabUser']"}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {}),
+            'video_chat': ('django.db.models.fields.BooleanField', [], {'default': 'False'})
+        },
+        u'mystery.interest': {
+            'Meta': {'index_together': "[('is_active', 'match', 'created'), ('is_active', 'match', 'meet_types', 'created'), ('owner', 'is_active', 'created')]", 'object_name': 'Interest'},
+            'carried_over': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'department_signature': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'departments': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['core.OrgGroup']", 'symmetrical': 'False'}),
+            'for_coffee': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'for_lunch': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'location_signature': ('django.db.models.fields.BigIntegerField', [], {'default': '0'}),
+            'locations': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['core.OfficeLocation']", 'symmetrical': 'False'}),
+            'match': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['mystery.Interest']", 'null': 'True'}),
+            'meet_types': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0'}),
+            'owner': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['core.CollabUser']"}),
+            'updated': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'video_chat': ('django.db.models.fields.BooleanField', [], {'default': 'False'})
+        },
+        u'mystery.matchjob': {
+            'Meta': {'object_name': 'MatchJob', 'index_together': "[('status', 'created')]"},
+            'attempts': ('django.db.models.fields.PositiveSmallIntegerField', [], {'default': '0'}),
+            'claimed': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'interest': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'match_jobs'", 'to': u"orm['mystery.Interest']"}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'pending'", 'max_length': '8'})
+        },
+        u'mystery.round': {
+            'Meta': {'ordering': "['-number']", 'object_name': 'Round'},
+            'carried_over': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'closed': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            'expired': ('django.db.models.fields.PositiveIntegerField', [], {'default': '0'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'number': ('django.db.models.fields.PositiveIntegerField', [], {'unique': 'True'}),
+            'started': ('django.db.models.fields.DateTimeField', [], {})
+        },
+        u'mystery.signaturebit': {
+            'Meta': {'unique_together': "[('kind', 'key'), ('kind', 'bit')]", 'object_name': 'SignatureBit'},
+            'bit': ('django.db.models.fields.PositiveIntegerField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'key': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'kind': ('django.db.models.fields.CharField', [], {'max_length': '16'})
+        }
+    }
+
+    complete_apps = ['mystery']
\ No newline at end of file
@@ -1,57 +1,93 @@
-from django.db import models
+from django.db import models, connection, transaction, IntegrityError
 from collab.settings import AUTH_USER_MODEL
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from core.models import OfficeLocation, OrgGroup
-from django.db.models import Q
+from django.utils import timezone
+from core.models import OfficeLocation, OrgGroup, Person
+from django.db.models import F, Max
+from django.db.models.signals import m2m_changed, post_save
+from mystery.catalogue import catalogue
+from mystery.index import matching_index
+from mystery import metrics
+from mystery.matching import pair_interests
+from mystery.pairs import pair_history
+from mystery import scoring
+from mystery.status import match_status
 
 
-class Interest(models.Model):
-    CHOICE_LUNCH = "lunch"
-    CHOICE_COFFEE = "coffee"
-    CHOICE_VIDEO = "video"
+class SignatureBit(models.Model):
+    """
+    The bit each office location or root department occupies in
+    Interest.location_signature / Interest.department_signature.
 
-    owner = models.ForeignKey(AUTH_USER_MODEL)
-    is_active = models.BooleanField(default=True)
-    match = models.ForeignKey('self', null=True)
-    for_lunch = models.BooleanField(default=False)
-    for_coffee = models.BooleanField(default=False)
-    video_chat = models.BooleanField(default=False)
-    locations = models.ManyToManyField(OfficeLocation)
-    departments = models.ManyToManyField(OrgGroup)
+    Bits are handed out in the order entries are first used.  Signatures
+    are stored in a signed 64-bit column, so once bits 0-61 are taken every
+    further entry shares OVERFLOW_BIT, and an interest with that bit set is
+    matched through the M2M tables instead.
+    """
+    LOCATION = 'location'
+    DEPARTMENT = 'department'
+    OVERFLOW_BIT = 62
+    OVERFLOW_MASK = 1 << OVERFLOW_BIT
 
-    created = models.DateTimeField(auto_now_add=True)
-    updated = models.DateTimeField(auto_now=True)
+    kind = models.CharField(max_length=16)
+    key = models.CharField(max_length=32)
+    bit = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [('kind', 'key'), ('kind', 'bit')]
 
     def __unicode__(self):
-        return self.owner.username
+        return u'%s %s: %d' % (self.kind, self.key, self.bit)
 
-    def initial_save(self, locations=None, departments=None):
-        super(Interest, self).save()
-        if locations:
-            self.locations.add(*locations)
-        if departments:
-            self.departments.add(*departments)
-        if self.is_active and not self.match:
-            self.add_match_if_exists()
+    @classmethod
+    def bits_for(cls, kind, keys):
+        """
+        Return a dict mapping each of ``keys`` to its bit, allocating bits
+        for keys seen for the first time.
+        """
+        keys = set(unicode(key) for key in keys)
+        if not keys:
+            return {}
+        bits = dict(cls.objects.filter(kind=kind, key__in=keys)
+                    .values_list('key', 'bit'))
+        for key in keys - set(bits):
+            bits[key] = cls._allocate(kind, key)
+        return bits
 
-    def save(self, *args, **kwargs):
-        super(Interest, self).save(*args, **kwargs)
-        if self.is_active and not self.match:
-            self.add_match_if_exists()
+    @classmethod
+    def _allocate(cls, kind, key):
+        while True:
+            top = cls.objects.filter(kind=kind).aggregate(top=Max('bit'))['top']
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(
+                        kind=kind, key=key,
+                        bit=0 if top is None else top + 1).bit
+            except IntegrityError:
+                # somebody else took the key or the bit; look again
+                existing = cls.objects.filter(kind=kind, key=key) \
+                    .values_list('bit', flat=True)
+                if existing:
+                    return existing[0]
 
-    def add_match_if_exists(self):
-        interests = self.find_matching_interests()
-        if interests.count() > 0:
-            # TODO investigate locking
-            existing_interest = interests[0]
-            existing_interest.match = self
-            existing_interest.save()
-            self.match = existing_interest
-            self.save()
+    @classmethod
+    def mask(cls, bits):
+        signature = 0
+        for bit in bits:
+            signature |= 1 << min(bit, cls.OVERFLOW_BIT)
+        return signature
+
+    @classmethod
+    def signature(cls, kind, keys):
+        return cls.mask(cls.bits_for(kind, keys).values())
 
-    def set_inactive(self):
-        self.is_active = False
-        self.save()
+
+class InterestDisplayMixin(object):
+    """
+    Descriptions of an interest for templates, shared by live and archived
+    interests.
+    """
 
     def for_what(self):
         what_list = []
@@ -89,46 +125,656 @@ class Interest(models.Model):
 
     def departments_text(self):
         selected_depts = self.departments.all()
-        if selected_depts.count() == OrgGroup.objects.filter(parent__isnull=True).count():
+        if len(selected_depts) == len(catalogue.departments()):
             return "any department"
         else:
             return self._pretty_print_list(
                 [loc.title for loc in selected_depts])
 
+
+class Interest(InterestDisplayMixin, models.Model):
+    CHOICE_LUNCH = "lunch"
+    CHOICE_COFFEE = "coffee"
+    CHOICE_VIDEO = "video"
+
+    # meet_types bits, one per meet type.  A new meet type only needs a new
+    # bit here; the column and the matching query stay the same.
+    MEET_LUNCH = 1
+    MEET_COFFEE = 2
+    MEET_VIDEO = 4
+    ALL_MEET_TYPES = MEET_LUNCH | MEET_COFFEE | MEET_VIDEO
+
+    # how many index candidates are confirmed against the database at once
+    MATCHING_INDEX_WINDOW = 50
+    # how many candidates add_match_if_exists tries to claim before giving up
+    MATCH_CLAIM_ATTEMPTS = 5
+    # only ever written by initial_save and refresh_signatures
+    SIGNATURE_FIELDS = ('location_signature', 'department_signature')
+
+    owner = models.ForeignKey(AUTH_USER_MODEL)
+    is_active = models.BooleanField(default=True)
+    match = models.ForeignKey('self', null=True)
+    for_lunch = models.BooleanField(default=False)
+    for_coffee = models.BooleanField(default=False)
+    video_chat = models.BooleanField(default=False)
+    # bitmask of MEET_* values, kept in sync with the booleans above on save
+    meet_types = models.PositiveSmallIntegerField(default=0)
+    locations = models.ManyToManyField(OfficeLocation)
+    departments = models.ManyToManyField(OrgGroup)
+    # SignatureBit masks of the locations and departments above, so that
+    # matching can filter on them without joining the M2M tables
+    location_signature = models.BigIntegerField(default=0)
+    department_signature = models.BigIntegerField(default=0)
+    # rounds this interest has been carried into unmatched; see Round
+    carried_over = models.PositiveSmallIntegerField(default=0)
+    # meet in a small group rather than one on one; such interests are never
+    # paired, but grouped by the match_groups command (see mystery.groups)
+    for_group = models.BooleanField(default=False)
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        index_together = [
+            # the pool of open interests, oldest first (matching)
+            ('is_active', 'match', 'created'),
+            # the same pool narrowed down by meet type
+            ('is_active', 'match', 'meet_types', 'created'),
+            # a user's latest active interest (views.index)
+            ('owner', 'is_active', 'created'),
+        ]
+
+    def __unicode__(self):
+        return self.owner.username
+
+    def initial_save(self, locations=None, departments=None):
+        self.meet_types = self.meet_types_mask()
+        self._set_signatures(locations or [], departments or [])
+        super(Interest, self).save()
+        # the signatures are already right; skip the m2m_changed refresh
+        self._skip_signature_refresh = True
+        try:
+            if locations:
+                self.locations.add(*locations)
+            if departments:
+                self.departments.add(*departments)
+        finally:
+            self._skip_signature_refresh = False
+        if self.is_active and self.match_id is None:
+            self._match_or_enqueue()
+        self._update_matching_index(locations, departments)
+
+    def save(self, *args, **kwargs):
+        self.meet_types = self.meet_types_mask()
+        # the signatures are written by refresh_signatures as the M2M rows
+        # change; an instance loaded before a change made elsewhere must
+        # not put its old ones back
+        if not self._state.adding and not args and \
+                not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.name not in self.SIGNATURE_FIELDS]
+        super(Interest, self).save(*args, **kwargs)
+        if self.is_active and self.match_id is None:
+            self._match_or_enqueue()
+        self._update_matching_index()
+
+    def _match_or_enqueue(self):
+        """
+        Look for a match now, or with MYSTERY_ASYNC_MATCHING on, leave it to
+        the match_worker command so the request does not wait on it.  Group
+        interests wait for match_groups instead.
+        """
+        if self.for_group:
+            return
+        if getattr(settings, 'MYSTERY_ASYNC_MATCHING', False):
+            MatchJob.enqueue(self)
+        else:
+            self.add_match_if_exists()
+
+    def matching_pending(self):
+        """
+        True while a queued match job for this interest has yet to run.
+        """
+        return self.match_id is None and self.match_jobs.filter(
+            status__in=[MatchJob.PENDING, MatchJob.RUNNING]).exists()
+
+    def _update_matching_index(self, locations=None, departments=None):
+        if not matching_index.enabled():
+            return
+        if self.is_active and not self.match_id and not self.for_group:
+            matching_index.add(
+                matching_index.entry_for(self, locations, departments))
+        else:
+            matching_index.discard(self.pk)
+
+    def _set_signatures(self, locations, departments):
+        self.location_signature = SignatureBit.signature(
+            SignatureBit.LOCATION,
+            [getattr(location, 'pk', location) for location in locations])
+        self.department_signature = SignatureBit.signature(
+            SignatureBit.DEPARTMENT,
+            [getattr(dept, 'pk', dept) for dept in departments])
+
+    def refresh_signatures(self):
+        """
+        Recompute both signatures from the M2M tables and store them.
+        """
+        self._set_signatures(self.locations.values_list('id', flat=True),
+                             self.departments.values_list('id', flat=True))
+        Interest.objects.filter(pk=self.pk).update(
+            location_signature=self.location_signature,
+            department_signature=self.department_signature)
+
+    @staticmethod
+    def _signature_overlaps(field, signature):
+        """
+        An extra() where clause matching rows whose ``field`` shares a bit
+        with ``signature``.
+        """
+        qn = connection.ops.quote_name
+        return {'where': ['(%s.%s & %%s) != 0' % (
+                    qn(Interest._meta.db_table),
+                    qn(Interest._meta.get_field(field).column))],
+                'params': [signature]}
+
+    def meet_types_mask(self):
+        mask = 0
+        if self.for_lunch:
+            mask |= self.MEET_LUNCH
+        if self.for_coffee:
+            mask |= self.MEET_COFFEE
+        if self.video_chat:
+            mask |= self.MEET_VIDEO
+        return mask
+
+    @classmethod
+    def overlapping_meet_types(cls, mask):
+        """
+        Every meet_types value that shares at least one meet type with
+        ``mask``.  Filtering on meet_types__in with this list is the
+        bitwise test "meet_types & mask" in a form the database can answer
+        from an index.
+        """
+        return [value for value in range(1, cls.ALL_MEET_TYPES + 1)
+                if value & mask]
+
+    def add_match_if_exists(self):
+        """
+        Pair this interest up with the best matching interest.
+
+        Concurrent sign-ups race for the same candidates, so each candidate
+        is claimed with _claim_match; one lost to another request is skipped
+        in favour of the next.
+        """
+        with metrics.timer('matching.add_match'):
+            with metrics.timer('matching.find'):
+                candidates = self.best_candidates(self.MATCH_CLAIM_ATTEMPTS)
+            metrics.observe('matching.candidates', len(candidates))
+            claims = 0
+            for candidate in candidates:
+                claims += 1
+                if self._claim_match(candidate) or self.match_id:
+                    break
+        metrics.observe('matching.claims', claims)
+        metrics.incr('matching.matched' if self.match_id
+                     else 'matching.unmatched')
+
+    def _claim_match(self, candidate):
+        """
+        Record this interest and ``candidate`` as each other's match.
+
+        Both rows are written by one conditional UPDATE, so there is no
+        save() and no re-entry into matching.  Returns False if either was
+        taken first; if it was this interest, self.match is refreshed from
+        the database.
+        """
+        if pair_interests(self.pk, candidate.pk,
+                          owner_ids=(self.owner_id, candidate.owner_id)):
+            self.match = candidate
+            return True
+
+        refreshed = Interest.objects.select_related('match').get(pk=self.pk)
+        if refreshed.match_id is not None:
+            self.match = refreshed.match
+        return False
+
+    def best_candidates(self, limit):
+        """
+        Up to ``limit`` matching interests, best first: the oldest, or with
+        MYSTERY_MATCH_WEIGHTS set, the highest scoring of a window of the
+        oldest (see mystery.scoring).
+        """
+        interests = self.find_matching_interests()
+        weights = scoring.weights()
+        if weights is None:
+            return list(interests[:limit])
+
+        rows = list(interests.values_list(
+            'id', 'created', 'location_signature', 'owner__person__org_group'
+        )[:scoring.window()])
+        if not rows:
+            return []
+        org_group_id = Person.objects.filter(user=self.owner_id) \
+            .values_list('org_group', flat=True).first()
+        # compare departments, not the teams within them
+        roots = catalogue.department_roots()
+        org_group_id = roots.get(org_group_id, org_group_id)
+        rows = [row[:3] + (roots.get(row[3], row[3]),) for row in rows]
+        location_signature = 0 if self.video_chat else \
+            self.location_signature & ~SignatureBit.OVERFLOW_MASK
+        with metrics.timer('matching.score'):
+            ids = scoring.rank(rows, location_signature, org_group_id,
+                               timezone.now(), weights)[:limit]
+        by_id = Interest.objects.in_bulk(ids)
+        return [by_id[interest_id] for interest_id in ids]
+
+    def group_meet(self):
+        """
+        The group meet this interest was put in, or None.
+        """
+        try:
+            return self.membership.meet
+        except MeetMembership.DoesNotExist:
+            return None
+
+    def set_inactive(self):
+        self.is_active = False
+        self.save()
+
+    def close(self, include_match=True):
+        """
+        Close this interest, and with ``include_match`` its match if it has
+        one, with a single conditional UPDATE.  Unlike set_inactive there is
+        no save(), so no look for a new match.  Returns the number of
+        interests closed.
+        """
+        ids = [self.pk]
+        if include_match and self.match_id is not None:
+            ids.append(self.match_id)
+        closed = Interest.objects.filter(pk__in=ids, is_active=True) \
+            .update(is_active=False, updated=timezone.now())
+        self.is_active = False
+        for interest_id in ids:
+            matching_index.discard(interest_id)
+        match_status.invalidate(ids)
+        return closed
+
     def find_matching_interests(self):
         """
         Given an interest obj, it will try to match
         against other interest objects that are relevant
         """
+        if matching_index.enabled():
+            return self._find_indexed_matching_interests()
+        return self._query_matching_interests()
 
+    def _query_matching_interests(self, through_m2m=False):
+        """
+        find_matching_interests done entirely in SQL.  ``through_m2m``
+        matches locations and departments through the M2M tables even when
+        the signatures would do (used for benchmarking).
+        """
         # so far we have the active interests
-        interests = Interest.objects.filter(is_active=True, match=None)
+        interests = Interest.objects.filter(is_active=True, match=None,
+                                            for_group=False)
 
-        # you cannot match against yourself
-        interests = interests.exclude(owner=self.owner)
+        # you cannot match against yourself, or anyone you have met before
+        interests = interests.exclude(owner=self.owner_id)
+        interests = self._exclude_past_partners(interests)
 
-        meet_type_q = Q(id=None)  # always false -> non-factor in the OR query
-        if self.for_lunch:
-            meet_type_q = meet_type_q | Q(for_lunch=True)
-        if self.for_coffee:
-            meet_type_q = meet_type_q | Q(for_coffee=True)
-        if self.video_chat:
-            meet_type_q = meet_type_q | Q(video_chat=True)
-        interests = interests.filter(meet_type_q)
+        meet_types = self.overlapping_meet_types(self.meet_types_mask())
+        interests = interests.filter(meet_types__in=meet_types)
 
+        # The signatures are exact unless an interest uses a location or
+        # department past the last SignatureBit, in which case that side is
+        # matched through the M2M table.
         if not self.video_chat:
-            # always false -> non-factor in the OR query
-            location_type_q = Q(id=None)
-            for location in self.locations.all():
-                location_type_q = location_type_q | Q(locations__in=[location])
-            interests = interests.filter(location_type_q)
+            if through_m2m or \
+                    self.location_signature & SignatureBit.OVERFLOW_MASK:
+                interests = interests.filter(pk__in=self._interests_sharing(
+                    Interest.locations.through, 'officelocation'))
+            else:
+                interests = interests.extra(**self._signature_overlaps(
+                    'location_signature', self.location_signature))
 
-        dept_type_q = Q(id=None)  # always false -> non-factor in the OR query
-        for dept in self.departments.all():
-            dept_type_q = dept_type_q | Q(departments__in=[dept])
-        interests = interests.filter(dept_type_q)
+        if through_m2m or \
+                self.department_signature & SignatureBit.OVERFLOW_MASK:
+            interests = interests.filter(pk__in=self._interests_sharing(
+                Interest.departments.through, 'orggroup'))
+        else:
+            interests = interests.extra(**self._signature_overlaps(
+                'department_signature', self.department_signature))
 
         # order by oldest first
         interests = interests.order_by('created')
 
         return interests
+
+    def _exclude_past_partners(self, interests):
+        """
+        Leave out of ``interests`` those owned by anyone this interest's
+        owner has been matched with, by two NOT IN subqueries on
+        PairHistory.
+        """
+        return interests.exclude(
+            owner__in=PairHistory.objects.filter(user_a=self.owner_id)
+            .values('user_b')
+        ).exclude(
+            owner__in=PairHistory.objects.filter(user_b=self.owner_id)
+            .values('user_a'))
+
+    def _interests_sharing(self, through, related):
+        """
+        A subquery of the ids of interests sharing at least one ``related``
+        row with this one in the M2M table ``through``.  Being an IN
+        (semi-join) rather than a join, it yields each interest once however
+        many rows they share.
+        """
+        mine = through.objects.filter(interest=self.pk).values(related)
+        return through.objects.filter(**{'%s__in' % related: mine}) \
+            .values('interest')
+
+    def _find_indexed_matching_interests(self):
+        """
+        Same rules as find_matching_interests, but the candidates come from
+        the in-memory matching index, less the owner's past partners.  The
+        database only confirms that the oldest few candidates are still open
+        and not past partners; any no longer open are dropped from the
+        index.
+        """
+        matching_index.ensure_built()
+        entry = matching_index.entry_for(self)
+        met = pair_history.partners(self.owner_id)
+        while True:
+            candidate_ids = matching_index.candidate_ids(
+                entry, limit=self.MATCHING_INDEX_WINDOW, exclude_owners=met)
+            open_ids = set(Interest.objects.filter(
+                pk__in=candidate_ids, is_active=True, match=None
+            ).values_list('id', flat=True))
+            for stale_id in set(candidate_ids) - open_ids:
+                matching_index.discard(stale_id)
+            if open_ids or len(candidate_ids) < self.MATCHING_INDEX_WINDOW:
+                break
+
+        # the cache may be missing the newest pairs
+        return self._exclude_past_partners(
+            Interest.objects.filter(pk__in=open_ids)).order_by('created')
+
+
+class MatchJob(models.Model):
+    """
+    A queued request to look for a match for an interest, used when
+    MYSTERY_ASYNC_MATCHING is on.  See matching.run_match_jobs.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((PENDING, 'Pending'),
+                      (RUNNING, 'Running'),
+                      (DONE, 'Done'),
+                      (FAILED, 'Failed'))
+
+    interest = models.ForeignKey(Interest, related_name='match_jobs')
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    claimed = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        index_together = [('status', 'created')]
+
+    def __unicode__(self):
+        return u'%s (%s)' % (self.interest_id, self.status)
+
+    @classmethod
+    def enqueue(cls, interest):
+        job, created = cls.objects.get_or_create(interest=interest,
+                                                 status=cls.PENDING)
+        return job
+
+
+def _close(interests, now):
+    """
+    Close ``interests`` and return their ids, which the status cache needs
+    to forget.
+    """
+    ids = list(interests.values_list('id', flat=True))
+    for start in range(0, len(ids), 500):
+        Interest.objects.filter(id__in=ids[start:start + 500]) \
+            .update(is_active=False, updated=now)
+    return ids
+
+
+class Round(models.Model):
+    """
+    A week of matching.  Advancing to a new round closes out the pool in
+    a few set-based UPDATEs:
+
+    * interests matched, or put in a group meet, before the previous round
+      began have had a full round to meet, and are closed;
+    * unmatched interests that have been carried over
+      MYSTERY_ROUND_CARRY_OVER times already expire;
+    * the remaining unmatched interests are carried into the new round.
+      They keep their created time, so they stay ahead of everyone who
+      signs up this round.
+    """
+    number = models.PositiveIntegerField(unique=True)
+    started = models.DateTimeField()
+    # what advancing to this round did to the pool
+    closed = models.PositiveIntegerField(default=0)
+    expired = models.PositiveIntegerField(default=0)
+    carried_over = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-number']
+
+    def __unicode__(self):
+        return u'Round %d' % self.number
+
+    @classmethod
+    def current(cls):
+        return cls.objects.order_by('-number').first()
+
+    @classmethod
+    def advance(cls, now=None):
+        """
+        Start the next round and close out the pool.  Returns the new round.
+        """
+        now = now or timezone.now()
+        max_carry_over = getattr(settings, 'MYSTERY_ROUND_CARRY_OVER', 1)
+        with transaction.atomic():
+            previous = cls.objects.select_for_update() \
+                .order_by('-number').first()
+            new_round = cls(number=previous.number + 1 if previous else 1,
+                            started=now)
+
+            closed_ids = []
+            if previous is not None:
+                # both sides of a pair were stamped by the same UPDATE, so
+                # they are closed together; a group goes by when it formed
+                closed_ids = _close(Interest.objects.filter(
+                    is_active=True, match__isnull=False,
+                    updated__lt=previous.started), now)
+                closed_ids += _close(Interest.objects.filter(
+                    is_active=True,
+                    membership__meet__created__lt=previous.started), now)
+                new_round.closed = len(closed_ids)
+
+            unmatched = Interest.objects.filter(is_active=True, match=None,
+                                                membership=None)
+            expired_ids = _close(
+                unmatched.filter(carried_over__gte=max_carry_over), now)
+            new_round.expired = len(expired_ids)
+            new_round.carried_over = unmatched.update(
+                carried_over=F('carried_over') + 1)
+            new_round.save()
+
+        # the index and the status cache heard about none of this
+        matching_index.clear()
+        match_status.invalidate(closed_ids + expired_ids)
+        return new_round
+
+
+class Meet(models.Model):
+    """
+    A group of people meeting together, formed out of interests with
+    for_group set by mystery.groups.  Everyone in it picked ``meet_types``
+    (a single MEET_* bit) and, unless it is a video chat, ``location``.
+    """
+    meet_types = models.PositiveSmallIntegerField()
+    location = models.ForeignKey(OfficeLocation, null=True, blank=True,
+                                 related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __unicode__(self):
+        return u'Meet %s' % self.pk
+
+    def for_what(self):
+        return {
+            Interest.MEET_LUNCH: 'Lunch',
+            Interest.MEET_COFFEE: 'Coffee',
+            Interest.MEET_VIDEO: 'Video Chat',
+        }.get(self.meet_types, '')
+
+
+class MeetMembership(models.Model):
+    """
+    One person in a group meet.  The user is kept alongside the interest so
+    the group survives its interests being archived.
+    """
+    meet = models.ForeignKey(Meet, related_name='memberships')
+    user = models.ForeignKey(AUTH_USER_MODEL, related_name='meet_memberships')
+    interest = models.OneToOneField(Interest, null=True, blank=True,
+                                    on_delete=models.SET_NULL,
+                                    related_name='membership')
+
+    class Meta:
+        unique_together = [('meet', 'user')]
+
+    def __unicode__(self):
+        return u'%s in %s' % (self.user_id, self.meet)
+
+
+class ArchivedInterest(InterestDisplayMixin, models.Model):
+    """
+    A closed interest moved out of the live table by archive_interests.
+    ``original_id`` is its id as an Interest, and the match is kept as the
+    partner's original id and owner, since the partner is archived too.
+    """
+    original_id = models.PositiveIntegerField(unique=True)
+    owner = models.ForeignKey(AUTH_USER_MODEL,
+                              related_name='archived_interests')
+    match_original_id = models.PositiveIntegerField(null=True, blank=True)
+    match_owner = models.ForeignKey(AUTH_USER_MODEL, null=True, blank=True,
+                                    related_name='+')
+    for_lunch = models.BooleanField(default=False)
+    for_coffee = models.BooleanField(default=False)
+    video_chat = models.BooleanField(default=False)
+    meet_types = models.PositiveSmallIntegerField(default=0)
+    locations = models.ManyToManyField(OfficeLocation,
+                                       related_name='archived_interests')
+    departments = models.ManyToManyField(OrgGroup,
+                                         related_name='archived_interests')
+    carried_over = models.PositiveSmallIntegerField(default=0)
+
+    # copied from the interest
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    archived = models.DateTimeField(auto_now_add=True)
+
+    # archived interests are closed by definition
+    is_active = False
+
+    class Meta:
+        index_together = [('owner', 'created')]
+
+    def __unicode__(self):
+        return self.owner.username
+
+
+class PairHistory(models.Model):
+    """
+    Two people who have been matched, stored once with the lower user id
+    as ``user_a``.  See mystery.pairs.
+    """
+    user_a = models.ForeignKey(AUTH_USER_MODEL, related_name='+')
+    user_b = models.ForeignKey(AUTH_USER_MODEL, related_name='+')
+    first_met = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('user_a', 'user_b')]
+        # the partners of a user who is user_b in the pair
+        index_together = [('user_b', 'user_a')]
+
+    def __unicode__(self):
+        return u'%s and %s' % (self.user_a_id, self.user_b_id)
+
+    @staticmethod
+    def key(user_a, user_b):
+        """
+        The canonical ``(user_a, user_b)`` for two user ids, or None if they
+        are the same person.
+        """
+        if user_a == user_b:
+            return None
+        return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+
+class Notification(models.Model):
+    """
+    A match someone is yet to be emailed about; see mystery.notifications.
+    """
+    user = models.ForeignKey(AUTH_USER_MODEL,
+                             related_name='mystery_notifications')
+    interest = models.ForeignKey(Interest, null=True, blank=True,
+                                 on_delete=models.SET_NULL, related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __unicode__(self):
+        return u'%s about %s' % (self.user_id, self.interest_id)
+
+
+def _refresh_interest_signatures(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """
+    Keep Interest signatures in step with changes to its M2M tables.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear') and \
+                not getattr(instance, '_skip_signature_refresh', False):
+            instance.refresh_signatures()
+        return
+
+    # changed from the other side, e.g. office.interest_set.add(...)
+    if action == 'pre_clear':
+        if sender is Interest.locations.through:
+            links = sender.objects.filter(officelocation=instance)
+        else:
+            links = sender.objects.filter(orggroup=instance)
+        instance._cleared_interest_ids = list(
+            links.values_list('interest_id', flat=True))
+    elif action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_interest_ids', [])
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        for interest in Interest.objects.filter(pk__in=pk_set):
+            interest.refresh_signatures()
+
+
+m2m_changed.connect(_refresh_interest_signatures,
+                    sender=Interest.locations.through)
+m2m_changed.connect(_refresh_interest_signatures,
+                    sender=Interest.departments.through)
+
+
+def _invalidate_match_status(sender, instance, **kwargs):
+    match_status.invalidate([instance.pk])
+
+
+post_save.connect(_invalidate_match_status, sender=Interest)
@@ -0,0 +1,166 @@
+"""
+Telling people they have been matched.
+
+Whatever makes a pair or a group (add_match_if_exists, the batch matcher,
+match_groups) sends ``match_made`` with the ``(interest id, owner id)`` of
+everyone involved, after the match is written.  Two receivers listen:
+
+* ``waiters``, an in-process registry of long-poll requests, wakes any
+  request waiting on those interests.  Long polling is only offered with
+  ``MYSTERY_LONG_POLL`` on, as each waiting request ties up a worker; it
+  wants a server with green-thread workers, such as gunicorn's gevent.  Waiting costs one Event per
+  interest being watched, however many requests watch it; matches made in
+  other processes are picked up by each waiter checking the status cache
+  every ``MYSTERY_LONG_POLL_CHECK`` seconds.
+* With ``MYSTERY_EMAIL_DIGEST`` on, a Notification row is queued for each
+  owner.  The send_match_digests command coalesces the queue into one
+  email per person and sends the lot over a single SMTP connection.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core import mail
+from django.core.urlresolvers import reverse
+from django.dispatch import Signal
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+match_made = Signal(providing_args=['interests'])
+
+
+class WaitRegistry(object):
+    """
+    Requests blocked until an interest is matched, keyed by interest id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # interest id -> [event, number of waiters]
+        self._events = {}
+
+    def __len__(self):
+        return len(self._events)
+
+    def wait(self, interest_id, timeout):
+        """
+        Block until notify() is called for ``interest_id`` or ``timeout``
+        seconds pass.  Returns True if notified.
+        """
+        with self._lock:
+            waiting = self._events.setdefault(
+                interest_id, [threading.Event(), 0])
+            waiting[1] += 1
+        try:
+            return waiting[0].wait(timeout)
+        finally:
+            with self._lock:
+                waiting[1] -= 1
+                if not waiting[1] and \
+                        self._events.get(interest_id) is waiting:
+                    del self._events[interest_id]
+
+    def notify(self, interest_ids):
+        with self._lock:
+            woken = [self._events.pop(interest_id, None)
+                     for interest_id in interest_ids]
+        for waiting in woken:
+            if waiting is not None:
+                waiting[0].set()
+
+
+waiters = WaitRegistry()
+
+
+def _wake_waiters(sender, interests, **kwargs):
+    waiters.notify(interest_id for interest_id, _ in interests)
+
+
+def _queue_notifications(sender, interests, **kwargs):
+    from mystery.models import Notification
+
+    if not getattr(settings, 'MYSTERY_EMAIL_DIGEST', False):
+        return
+    Notification.objects.bulk_create([
+        Notification(interest_id=interest_id, user_id=owner_id)
+        for interest_id, owner_id in interests])
+
+
+match_made.connect(_wake_waiters, dispatch_uid='mystery.wake_waiters')
+match_made.connect(_queue_notifications,
+                   dispatch_uid='mystery.queue_notifications')
+
+
+def long_poll_enabled():
+    return getattr(settings, 'MYSTERY_LONG_POLL', False)
+
+
+def wait_for_change(interest_id, version, timeout):
+    """
+    The status entry of ``interest_id`` once its version differs from
+    ``version``, or its current entry after ``timeout`` seconds.
+    """
+    from mystery.status import match_status
+
+    check = getattr(settings, 'MYSTERY_LONG_POLL_CHECK', 5)
+    deadline = time.time() + timeout
+    entry = match_status.get(interest_id)
+    while entry is not None and entry['version'] == version:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        waiters.wait(interest_id, min(check, remaining))
+        entry = match_status.get(interest_id)
+    return entry
+
+
+def _digest_message(user, notifications, connection):
+    base_url = getattr(settings, 'MYSTERY_BASE_URL', '')
+    context = {
+        'user': user,
+        'notifications': notifications,
+        'results_url': base_url + reverse('mystery:mystery'),
+    }
+    return mail.EmailMessage(
+        subject=render_to_string('mystery-meet/match_digest_subject.txt',
+                                 context).strip(),
+        body=render_to_string('mystery-meet/match_digest.txt', context),
+        from_email=getattr(settings, 'MYSTERY_EMAIL_FROM', None),
+        to=[user.email],
+        connection=connection)
+
+
+def send_digests(limit=None):
+    """
+    Email everyone with queued notifications, one message per person
+    however many matches they have had, all over one SMTP connection.
+    Returns ``(messages sent, notifications sent)``.
+    """
+    from mystery.models import Notification
+
+    queued = Notification.objects.filter(sent=None) \
+        .select_related('user').order_by('user', 'created')
+    by_user = {}
+    order = []
+    for notification in queued:
+        if notification.user_id not in by_user:
+            if limit is not None and len(order) == limit:
+                break
+            by_user[notification.user_id] = []
+            order.append(notification.user)
+        by_user[notification.user_id].append(notification)
+
+    recipients = [user for user in order if user.email]
+    connection = mail.get_connection()
+    sent = connection.send_messages([
+        _digest_message(user, by_user[user.pk], connection)
+        for user in recipients]) or 0
+
+    # people without an address are marked too, so they do not pile up
+    ids = [notification.pk for notifications in by_user.values()
+           for notification in notifications]
+    now = timezone.now()
+    for start in range(0, len(ids), 500):
+        Notification.objects.filter(pk__in=ids[start:start + 500]) \
+            .update(sent=now)
+    return sent, len(ids)
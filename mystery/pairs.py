@@ -0,0 +1,104 @@
+"""
+Who has already been matched with whom.
+
+``PairHistory`` holds one row per pair of people ever matched, and is
+written in the same transaction as the match itself.  The SQL matching
+query excludes past partners with a subquery on it.  The in-memory
+matchers (the matching index and the batch matcher) instead consult a
+``PairHistoryCache``, a dict from user id to the set of people they have
+met, so the check is a set lookup per candidate.
+
+The process-wide ``pair_history`` cache is reloaded every
+``MYSTERY_PAIR_HISTORY_TTL`` seconds; pairs made since are caught when
+the index's candidates are confirmed against the database, and by the
+table's unique constraint.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+
+class PairHistoryCache(object):
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._partners = {}
+            self.loaded_at = None
+
+    def is_stale(self):
+        if self.loaded_at is None:
+            return True
+        ttl = getattr(settings, 'MYSTERY_PAIR_HISTORY_TTL', 300)
+        return ttl is not None and time.time() - self.loaded_at > ttl
+
+    def ensure_loaded(self):
+        if self.is_stale():
+            self.reload()
+
+    def reload(self):
+        """
+        Load every recorded pair with one query.
+        """
+        from mystery.models import PairHistory
+
+        partners = {}
+        for user_a, user_b in PairHistory.objects.values_list('user_a_id',
+                                                              'user_b_id'):
+            partners.setdefault(user_a, set()).add(user_b)
+            partners.setdefault(user_b, set()).add(user_a)
+        with self._lock:
+            self._partners = partners
+            self.loaded_at = time.time()
+
+    def partners(self, user_id):
+        """ The ids of everyone ``user_id`` has been matched with """
+        self.ensure_loaded()
+        return self._partners.get(user_id, frozenset())
+
+    def have_met(self, user_a, user_b):
+        return user_b in self.partners(user_a)
+
+
+pair_history = PairHistoryCache()
+
+
+def past_pairs():
+    """
+    The ``(lower user id, higher user id)`` of every pair of people matched
+    in the live or archived interests.
+    """
+    from mystery.models import ArchivedInterest, Interest, PairHistory
+
+    pairs = set()
+    for owner_id, match_owner_id in Interest.objects.filter(
+            match__isnull=False).values_list('owner_id', 'match__owner_id'):
+        pairs.add(PairHistory.key(owner_id, match_owner_id))
+    for owner_id, match_owner_id in ArchivedInterest.objects.filter(
+            match_owner__isnull=False).values_list('owner_id',
+                                                   'match_owner_id'):
+        pairs.add(PairHistory.key(owner_id, match_owner_id))
+    pairs.discard(None)
+    return pairs
+
+
+def rebuild_pair_history(chunk_size=500):
+    """
+    Record every pair found in the interest history that is not already
+    in ``PairHistory``.  Returns the number of pairs added.
+    """
+    from mystery.models import PairHistory
+
+    missing = past_pairs() - set(
+        PairHistory.objects.values_list('user_a_id', 'user_b_id'))
+    missing = sorted(missing)
+    for start in range(0, len(missing), chunk_size):
+        PairHistory.objects.bulk_create([
+            PairHistory(user_a_id=user_a, user_b_id=user_b)
+            for user_a, user_b in missing[start:start + chunk_size]])
+    pair_history.clear()
+    return len(missing)
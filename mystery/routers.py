@@ -0,0 +1,114 @@
+"""
+Sending the read-heavy mystery views to a read replica.
+
+With ``MYSTERY_REPLICA_DB`` naming a database alias and
+``mystery.routers.ReplicaRouter`` in ``DATABASE_ROUTERS``, reads of the
+apps in ``MYSTERY_REPLICA_APPS`` go to the replica while a view decorated
+with ``replica_reads`` handles a GET or HEAD request, or inside
+``reading_from_replica()``.  Everything else, and every write, goes to the
+primary.
+
+A replica lags behind, so someone who has just signed up or closed a meet
+must not be shown the state from before.  Any other request through
+``replica_reads``, and any request through ``pins_primary``, sets a
+cookie that keeps that browser's reads on the primary for the next
+``MYSTERY_REPLICA_STICKY_SECONDS``.
+"""
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'mystery_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+def replica_alias():
+    return getattr(settings, 'MYSTERY_REPLICA_DB', None)
+
+
+@contextmanager
+def reading_from_replica():
+    """ Route reads in the body to the replica, if there is one """
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+class ReplicaRouter(object):
+
+    def _routed(self, model):
+        return model._meta.app_label in getattr(
+            settings, 'MYSTERY_REPLICA_APPS', ['mystery', 'core'])
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'replica', False) and self._routed(model):
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # rows read from the replica are still written to the primary
+        if replica_alias() and self._routed(model):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = (DEFAULT_DB_ALIAS, replica_alias())
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_syncdb(self, db, model):
+        if replica_alias() and db == replica_alias():
+            return False
+        return None
+
+
+def _sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _pin(response):
+    seconds = getattr(settings, 'MYSTERY_REPLICA_STICKY_SECONDS', 30)
+    response.set_cookie(STICKY_COOKIE, '%d' % (time.time() + seconds),
+                        max_age=seconds, httponly=True)
+    return response
+
+
+def pins_primary(view):
+    """
+    View decorator for views that write even on a GET, such as the close
+    links: the browser reads from the primary for a while afterwards.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return _pin(view(request, *args, **kwargs))
+    return wrapper
+
+
+def replica_reads(view):
+    """
+    View decorator sending the reads of GET and HEAD requests to the
+    replica, unless the browser has written recently.  Other requests are
+    left on the primary and start the sticky window.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return _pin(view(request, *args, **kwargs))
+        if _sticky(request) or not replica_alias():
+            return view(request, *args, **kwargs)
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
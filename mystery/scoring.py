@@ -0,0 +1,77 @@
+"""
+Ranking match candidates on more than their age.
+
+By default an interest is paired with the oldest compatible one.  With
+``MYSTERY_MATCH_WEIGHTS`` set, the oldest ``MYSTERY_MATCH_SCORING_WINDOW``
+candidates are scored instead, and the best is claimed first.  A score is
+the weighted sum of
+
+* ``wait``: how long the candidate has waited, relative to the longest
+  wait in the window
+* ``locations``: the share of this interest's offices the candidate also
+  picked, counted from the location signatures
+* ``cross_department``: 1 if the two owners work in different
+  departments, that is under different root org groups
+
+each between 0 and 1.  The window is read with one query of plain values,
+and each term is worked out a column at a time over the whole window.
+"""
+from django.conf import settings
+
+DEFAULT_WEIGHTS = {
+    'wait': 1.0,
+    'locations': 0.5,
+    'cross_department': 0.5,
+}
+
+
+def weights():
+    """
+    The configured weights, with any left out taken from DEFAULT_WEIGHTS,
+    or None if scoring is off.
+    """
+    configured = getattr(settings, 'MYSTERY_MATCH_WEIGHTS', None)
+    if configured is None:
+        return None
+    return dict(DEFAULT_WEIGHTS, **configured)
+
+
+def window():
+    return getattr(settings, 'MYSTERY_MATCH_SCORING_WINDOW', 50)
+
+
+def _popcount(value):
+    return bin(value).count('1')
+
+
+def rank(candidates, location_signature, org_group_id, now, weights):
+    """
+    Order ``candidates``, ``(id, created, location signature, department
+    id)`` rows oldest first, best first for an interest with the given
+    ``location_signature`` (0 to ignore locations) and owner's department,
+    ``org_group_id``.  Both are root org group ids.  Equal scores keep their
+    order.  Returns the ids.
+    """
+    if not candidates:
+        return []
+    ids, created, signatures, org_groups = zip(*candidates)
+
+    waits = [(now - when).total_seconds() for when in created]
+    longest = max(waits)
+    wait = [seconds / longest if longest > 0 else 0.0 for seconds in waits]
+
+    wanted = _popcount(location_signature)
+    if wanted:
+        locations = [_popcount(signature & location_signature) / float(wanted)
+                     for signature in signatures]
+    else:
+        locations = [0.0] * len(ids)
+
+    cross = [1.0 if org_group_id is not None and group is not None and
+             group != org_group_id else 0.0 for group in org_groups]
+
+    scores = [weights['wait'] * w + weights['locations'] * l +
+              weights['cross_department'] * c
+              for w, l, c in zip(wait, locations, cross)]
+    order = sorted(range(len(ids)), key=lambda i: (-scores[i], i))
+    return [ids[i] for i in order]
@@ -11,7 +11,73 @@ function video_style() {
     }
 }
 
+// seconds between checks of a pending interest's status
+var STATUS_POLL_INTERVAL = 15;
+
+function show_results(results_url) {
+    $.get(results_url, function(html) {
+        var content = $('<div>').append($.parseHTML(html)).find('#content');
+        $('#content').replaceWith(content);
+    });
+}
+
+function poll_status(pending, version) {
+    var headers = {};
+    if (version) {
+        headers['If-None-Match'] = '"' + version + '"';
+    }
+    $.ajax({
+        url: pending.data('status-url'),
+        dataType: 'json',
+        headers: headers,
+        cache: false
+    }).done(function(data, text_status, xhr) {
+        if (xhr.status === 304 || !data) {
+            schedule_poll(pending, version);
+        } else {
+            show_status(pending, data, schedule_poll);
+        }
+    });
+}
+
+function show_status(pending, data, next) {
+    if (data.status === 'pending') {
+        next(pending, data.version);
+    } else if (data.status === 'closed') {
+        window.location.reload();
+    } else {
+        show_results(pending.data('results-url'));
+    }
+}
+
+// holds a request open until the status changes; falls back to polling
+function wait_for_status(pending, version) {
+    $.ajax({
+        url: pending.data('wait-url'),
+        data: version ? {version: version} : {},
+        dataType: 'json',
+        cache: false
+    }).done(function(data) {
+        show_status(pending, data, wait_for_status);
+    }).fail(function() {
+        schedule_poll(pending, version);
+    });
+}
+
+function schedule_poll(pending, version) {
+    window.setTimeout(function() {
+        poll_status(pending, version);
+    }, STATUS_POLL_INTERVAL * 1000);
+}
+
 $(document).ready( function() {
     video_style();
     $('.mystery-form').on('click', 'input:radio[name="meet_choice"]', video_style);
+
+    var pending = $('.submitted-instructions[data-status-url]');
+    if (pending.length && pending.data('wait-url')) {
+        wait_for_status(pending, null);
+    } else if (pending.length) {
+        schedule_poll(pending, null);
+    }
 });
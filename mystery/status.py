@@ -0,0 +1,142 @@
+"""
+The match status of each interest, kept in the cache for the status
+polling endpoint.
+
+An entry holds the interest's owner id, its status (``pending``,
+``matched``, ``grouped`` or ``closed``) and a version token derived from
+it.  The poller sends the token back as ``If-None-Match``, so an
+unchanged status is answered with a 304 from one cache read, without
+touching the interest or person tables.
+
+Entries are invalidated whenever an interest's status may have changed:
+on save, when a pair or group is written, and when a round closes
+interests.  A missing or invalidated entry is rebuilt from the database
+with one query.
+
+Invalidating writes a fresh token under a second key, and an entry is only
+used while it carries the current token.  So an entry rebuilt from a row
+read just before a match was written, and stored just after, is not kept.
+Matching runs in other processes (match_worker, match_pending,
+match_groups, other web workers), so this only works with a cache shared
+by all of them, such as memcached; with a per-process cache a poller only
+sees a match once its entry times out.  Entries are kept for
+``MYSTERY_STATUS_TIMEOUT`` seconds, 30 by default, which also bounds how
+long a status can lag behind a change made inside a transaction that had
+not yet committed when it was invalidated.
+"""
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+
+logger = logging.getLogger(__name__)
+
+# cache backends that are not shared between processes
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',
+                'django.core.cache.backends.dummy.DummyCache')
+
+PENDING = 'pending'
+MATCHED = 'matched'
+GROUPED = 'grouped'
+CLOSED = 'closed'
+
+
+class MatchStatusCache(object):
+
+    KEY = 'mystery:status:%s'
+    TOKEN_KEY = 'mystery:status:%s:token'
+
+    def __init__(self):
+        self._checked = False
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'MYSTERY_STATUS_TIMEOUT', 30)
+
+    def check_backend(self):
+        """
+        Warn, once per process, if the default cache is not shared between
+        processes.
+        """
+        if self._checked:
+            return
+        self._checked = True
+        backend = getattr(settings, 'CACHES', {}).get('default', {}) \
+            .get('BACKEND')
+        if backend in LOCAL_CACHES:
+            logger.warning('The match status cache needs a cache shared '
+                           'between processes; with %s, matches made '
+                           'elsewhere show up after up to %s seconds',
+                           backend, self.timeout())
+
+    @staticmethod
+    def version(status, match_id, meet_id):
+        """
+        A token that changes whenever what the results page would show
+        does.  It is derived from the status alone, so rebuilding an evicted
+        entry gives the same token.
+        """
+        return hashlib.md5('%s:%s:%s' % (status, match_id, meet_id)) \
+            .hexdigest()[:16]
+
+    def load(self, interest_id):
+        """
+        The entry for ``interest_id`` read from the database, or None if
+        there is no such interest.
+        """
+        from mystery.models import Interest
+
+        # never from a read replica: a stale entry would be kept until the
+        # interest next changes
+        row = Interest.objects.using(router.db_for_write(Interest)) \
+            .filter(pk=interest_id).values_list(
+            'owner_id', 'is_active', 'match_id', 'membership__meet_id'
+        ).first()
+        if row is None:
+            return None
+        owner_id, is_active, match_id, meet_id = row
+        if not is_active:
+            status = CLOSED
+        elif match_id is not None:
+            status = MATCHED
+        elif meet_id is not None:
+            status = GROUPED
+        else:
+            status = PENDING
+        return {'owner': owner_id, 'status': status,
+                'version': self.version(status, match_id, meet_id)}
+
+    def get(self, interest_id):
+        """
+        The cached entry for ``interest_id``, loading it on a miss.
+        """
+        self.check_backend()
+        key = self.KEY % interest_id
+        token_key = self.TOKEN_KEY % interest_id
+        # the token is read before the row, so an invalidation in between
+        # leaves the entry stored below already out of date
+        found = cache.get_many([key, token_key])
+        token = found.get(token_key)
+        entry = found.get(key)
+        if entry is not None and entry.get('token') == token:
+            return entry
+        entry = self.load(interest_id)
+        if entry is not None:
+            entry['token'] = token
+            cache.set(key, entry, self.timeout())
+        return entry
+
+    def invalidate(self, interest_ids):
+        interest_ids = list(interest_ids)
+        if interest_ids:
+            token = uuid.uuid4().hex[:12]
+            # outlives any entry stored under the previous token
+            cache.set_many(dict((self.TOKEN_KEY % interest_id, token)
+                                for interest_id in interest_ids),
+                           2 * self.timeout())
+
+
+match_status = MatchStatusCache()
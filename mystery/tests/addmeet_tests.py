@@ -1,6 +1,9 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.test import TestCase
 from django.core.urlresolvers import reverse
 from core.models import OrgGroup, OfficeLocation
+from mystery.catalogue import catalogue
 from mystery.models import Interest
 
 class AddMeetTest(TestCase):
@@ -78,3 +81,20 @@ class AddMeetTest(TestCase):
         resp = self.client.get(reverse('mystery:mystery'))
         self.assertEqual(resp.status_code, 302)
         self.assertIn('login', resp['Location'])
+
+    def test_form_fragment_is_cached(self):
+        """ The unbound form's choices are rendered once per catalogue """
+        key = make_template_fragment_key('mystery_interest_form',
+                                         [catalogue.version])
+        cache.delete(key)
+        self.client.login(username='test1@example.com', password='1')
+        self.client.get(reverse('mystery:mystery'))
+        fragment = cache.get(key)
+        self.assertIn("I'd like to meet for", fragment)
+        self.assertNotIn('csrfmiddlewaretoken', fragment)
+
+        cache.set(key, 'cached fragment')
+        resp = self.client.get(reverse('mystery:mystery'))
+        self.assertContains(resp, 'cached fragment')
+        self.assertContains(resp, 'csrfmiddlewaretoken')
+        cache.delete(key)
@@ -0,0 +1,52 @@
+from django.contrib.admin.sites import AdminSite
+from django.db import connection
+from django.test import TestCase
+from core.models import OrgGroup, OfficeLocation
+from mystery.admin import InterestAdmin, STRING_AGG
+from mystery.models import Interest
+from mystery.tests.utils import mock_req, random_user
+
+
+class InterestAdminTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.admin = InterestAdmin(Interest, AdminSite())
+        self.offices = list(OfficeLocation.objects.all()[:2])
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        for i in range(5):
+            interest = Interest(owner=random_user(), for_coffee=True)
+            interest.initial_save(locations=self.offices,
+                                  departments=[self.org])
+
+    def test_changelist_columns_query_count(self):
+        """ The changelist columns cost no queries per row """
+        request = mock_req()
+        expected = 1 if connection.vendor in STRING_AGG else 3
+        with self.assertNumQueries(expected):
+            rows = list(self.admin.get_queryset(request))
+            for obj in rows:
+                self.admin.match_name(obj)
+                self.admin.location_list(obj)
+                self.admin.dept_list(obj)
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(
+            sorted(self.admin.location_list(rows[0]).split(', ')),
+            sorted(office.name for office in self.offices))
+        self.assertEqual(self.admin.dept_list(rows[0]), self.org.title)
+        matched = [obj for obj in rows if obj.match_id][0]
+        self.assertEqual(self.admin.match_name(matched),
+                         Interest.objects.get(id=matched.match_id).owner)
+
+    def test_search_does_not_repeat_interests(self):
+        request = mock_req()
+        queryset, use_distinct = self.admin.get_search_results(
+            request, self.admin.get_queryset(request), self.org.title)
+        self.assertFalse(use_distinct)
+        self.assertEqual(queryset.count(), 5)
+
+        queryset, use_distinct = self.admin.get_search_results(
+            request, self.admin.get_queryset(request), 'no such office')
+        self.assertEqual(queryset.count(), 0)
@@ -0,0 +1,67 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from core.models import OrgGroup, OfficeLocation
+from mystery.archive import archive_closed, history
+from mystery.models import ArchivedInterest, Interest
+from mystery.tests.utils import random_user
+
+
+class ArchiveTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _submit(self, owner=None):
+        interest = Interest(owner=owner or random_user(), for_coffee=True)
+        interest.initial_save(locations=[self.office], departments=[self.org])
+        return interest
+
+    def test_closed_pairs_are_archived_together(self):
+        first = self._submit()
+        second = self._submit()
+        open_interest = self._submit()
+        Interest.objects.filter(id__in=[first.id, second.id]) \
+            .update(is_active=False)
+
+        self.assertEqual(archive_closed(batch_size=1), 2)
+        self.assertEqual(list(Interest.objects.values_list('id', flat=True)),
+                         [open_interest.id])
+
+        archived = ArchivedInterest.objects.get(original_id=first.id)
+        self.assertEqual(archived.match_original_id, second.id)
+        self.assertEqual(archived.match_owner, second.owner)
+        self.assertEqual(archived.created, first.created)
+        self.assertEqual(list(archived.locations.all()), [self.office])
+        self.assertEqual(archived.where_text(), unicode(self.office))
+        self.assertEqual(archived.for_what(), 'Coffee')
+
+    def test_pairs_with_an_active_side_stay(self):
+        first = self._submit()
+        self._submit()
+        first.set_inactive()
+
+        self.assertEqual(archive_closed(), 0)
+        self.assertEqual(Interest.objects.count(), 2)
+
+    def test_history_reads_both_tables(self):
+        owner = random_user()
+        old = self._submit(owner=owner)
+        old.set_inactive()
+        archive_closed()
+        current = self._submit(owner=owner)
+
+        records = list(history(owner=owner))
+        self.assertEqual([record.is_active for record in records],
+                         [False, True])
+        self.assertEqual(records[0].original_id, old.id)
+        self.assertEqual(records[1].id, current.id)
+
+    def test_command(self):
+        self._submit().set_inactive()
+        out = StringIO()
+        call_command('archive_interests', stdout=out)
+        self.assertIn('Archived 1 interests', out.getvalue())
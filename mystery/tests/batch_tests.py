@@ -0,0 +1,88 @@
+import datetime
+from django.test import TestCase
+from django.core.management import call_command
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest
+from mystery.index import IndexEntry
+from mystery.matching import BatchMatcher, write_pairs
+from mystery.tests.utils import random_user
+
+LUNCH = Interest.MEET_LUNCH
+COFFEE = Interest.MEET_COFFEE
+
+
+def _entry(interest_id, meet_types, locations, departments):
+    return IndexEntry(interest_id, 100 + interest_id, meet_types,
+                      frozenset(locations), frozenset(departments),
+                      datetime.datetime(2014, 1, 1, 0, interest_id))
+
+
+class BatchMatcherTest(TestCase):
+
+    def test_oldest_first(self):
+        entries = [_entry(i, COFFEE, ['DC'], [1]) for i in range(1, 6)]
+        self.assertEqual(BatchMatcher(entries).run(), [(1, 2), (3, 4)])
+
+    def test_augmenting_recovers_unlucky_order(self):
+        """
+        Greedy pairs 1 with 2, leaving 3 and 4 without partners; 2 can take
+        3 instead so that 1 can take 4.
+        """
+        entries = [_entry(1, COFFEE, ['DC', 'NY'], [1]),
+                   _entry(2, COFFEE, ['DC'], [1]),
+                   _entry(3, COFFEE, ['DC'], [1]),
+                   _entry(4, COFFEE, ['NY'], [1])]
+        pairs = BatchMatcher(entries).run()
+        self.assertEqual(sorted(pairs), [(1, 4), (2, 3)])
+
+    def test_incompatible_left_alone(self):
+        entries = [_entry(1, COFFEE, ['DC'], [1]),
+                   _entry(2, LUNCH, ['DC'], [1]),
+                   _entry(3, COFFEE, ['NY'], [1])]
+        self.assertEqual(BatchMatcher(entries).run(), [])
+
+
+class MatchPendingTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def _pending(self, **kwargs):
+        office = OfficeLocation.objects.all()[0]
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        interest = Interest(owner=random_user(), is_active=False, **kwargs)
+        interest.save()
+        interest.locations.add(office)
+        interest.departments.add(org)
+        Interest.objects.filter(id=interest.id).update(is_active=True)
+        return interest
+
+    def test_match_pending_command(self):
+        """ The command pairs up everything it can in one go """
+        interests = [self._pending(for_coffee=True) for _ in range(4)]
+        lunch = self._pending(for_lunch=True)
+
+        call_command('match_pending')
+
+        matches = dict(Interest.objects.values_list('id', 'match'))
+        self.assertEqual(matches[interests[0].id], interests[1].id)
+        self.assertEqual(matches[interests[1].id], interests[0].id)
+        self.assertEqual(matches[interests[2].id], interests[3].id)
+        self.assertEqual(matches[interests[3].id], interests[2].id)
+        self.assertEqual(matches[lunch.id], None)
+
+    def test_dry_run(self):
+        for _ in range(2):
+            self._pending(for_coffee=True)
+        call_command('match_pending', dry_run=True)
+        self.assertEqual(Interest.objects.filter(match=None).count(), 2)
+
+    def test_write_pairs_skips_closed(self):
+        """ Pairs whose interests closed in the meantime are not written """
+        a, b, c, d = [self._pending(for_coffee=True) for _ in range(4)]
+        Interest.objects.filter(id=b.id).update(is_active=False)
+
+        written = write_pairs([(a.id, b.id), (c.id, d.id)])
+
+        self.assertEqual(written, [(c.id, d.id)])
+        self.assertEqual(Interest.objects.get(id=a.id).match, None)
+        self.assertEqual(Interest.objects.get(id=c.id).match_id, d.id)
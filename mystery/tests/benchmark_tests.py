@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from mystery import benchmarks
+from mystery.models import Interest
+
+
+class ExplainMatchingTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def test_explain_matching(self):
+        """ The benchmark runs end to end and leaves no rows behind """
+        out = StringIO()
+        call_command('explain_matching', rows=300, open_fraction=0.5,
+                     repeat=1, breadths='1,3', stdout=out)
+        self.assertIn('matching: fastest', out.getvalue())
+        self.assertIn('index page: fastest', out.getvalue())
+        self.assertIn('chained join', out.getvalue())
+        self.assertIn('m2m subquery', out.getvalue())
+        self.assertEqual(Interest.objects.count(), 0)
+
+
+class BenchmarkMatchingTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def test_benchmark_matching(self):
+        """ The suite writes JSON results and leaves no rows behind """
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        out = StringIO()
+        try:
+            call_command('benchmark_matching', sizes='50,100', repeat=1,
+                         label='test', output=path, stdout=out)
+            with open(path) as stream:
+                report = json.load(stream)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(report['label'], 'test')
+        self.assertEqual([r['rows'] for r in report['results']], [50, 100])
+        for name in ('find_matching_interests', 'best_candidates', 'sign_up',
+                     'results_page', 'admin_changelist'):
+            self.assertIn('queries', report['results'][0][name])
+        self.assertEqual(report['results'][1]['pending'], 100)
+        # the probe is matched, so the page shows its partner
+        for result in report['results']:
+            self.assertTrue(result['results_page']['matched'])
+        self.assertIn('pairs_per_second', report['results'][1]['match_pending'])
+        self.assertIn('sign_up', out.getvalue())
+        self.assertEqual(Interest.objects.count(), 0)
+
+
+class SeedInterestsTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def test_created_is_spread_out(self):
+        """ Every seeded row is a minute older than the next """
+        with benchmarks.rolled_back():
+            benchmarks.seed_interests(25, users=5, chunk_size=10)
+            created = list(Interest.objects.order_by('id')
+                           .values_list('created', flat=True))
+            self.assertEqual(len(set(created)), 25)
+            self.assertEqual(created, sorted(created))
+            self.assertEqual((created[1] - created[0]).total_seconds(), 60)
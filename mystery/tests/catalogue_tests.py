@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+from core.models import OrgGroup, OfficeLocation
+from mystery.catalogue import catalogue
+from mystery.forms import InterestForm
+
+
+class CatalogueTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        catalogue.invalidate()
+
+    def test_hits_and_misses(self):
+        misses, hits = catalogue.misses, catalogue.hits
+        with self.assertNumQueries(2):
+            catalogue.locations()
+        with self.assertNumQueries(0):
+            catalogue.departments()
+            catalogue.version
+        self.assertEqual(catalogue.misses, misses + 1)
+        self.assertEqual(catalogue.hits, hits + 2)
+
+    def test_contents(self):
+        self.assertEqual(
+            set(loc.pk for loc in catalogue.locations()),
+            set(OfficeLocation.objects.exclude(id='Remote')
+                .values_list('pk', flat=True)))
+        self.assertEqual(
+            set(dept.pk for dept in catalogue.departments()),
+            set(OrgGroup.objects.filter(parent__isnull=True)
+                .values_list('pk', flat=True)))
+
+    def test_department_roots(self):
+        dept = OrgGroup.objects.create(title='Dept')
+        team = OrgGroup.objects.create(title='Team', parent=dept)
+        squad = OrgGroup.objects.create(title='Squad', parent=team)
+        roots = catalogue.department_roots()
+        self.assertEqual(roots[dept.pk], dept.pk)
+        self.assertEqual(roots[squad.pk], dept.pk)
+        with self.assertNumQueries(0):
+            catalogue.department_roots()
+
+    def test_saving_invalidates(self):
+        version = catalogue.version
+        OfficeLocation.objects.create(
+            id='test_id', name='Test office', street='test office',
+            city='test office', state='DC', zip='20000')
+        self.assertIn('test_id', [loc.pk for loc in catalogue.locations()])
+        self.assertNotEqual(catalogue.version, version)
+
+    @override_settings(MYSTERY_CATALOGUE_TTL=0)
+    def test_ttl(self):
+        catalogue.locations()
+        with self.assertNumQueries(2):
+            catalogue.locations()
+
+    def test_form_choices_are_cached(self):
+        """ Rendering an unbound form reads the catalogue, not the DB """
+        catalogue.locations()
+        with self.assertNumQueries(0):
+            form = InterestForm()
+            form.as_p()
@@ -0,0 +1,58 @@
+import threading
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest
+from mystery.tests.utils import random_user
+
+
+class ConcurrentMatchTest(TransactionTestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    THREADS = 16
+    SIGNUPS_PER_THREAD = 10
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_no_double_matches(self):
+        """
+        Many parallel sign-ups competing for the same candidates never leave
+        anyone pointing at a partner who points elsewhere.
+        """
+        office = OfficeLocation.objects.all()[0]
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        users = [[random_user() for _ in range(self.SIGNUPS_PER_THREAD)]
+                 for _ in range(self.THREADS)]
+        start = threading.Event()
+        errors = []
+
+        def sign_up(thread_users):
+            start.wait()
+            try:
+                for user in thread_users:
+                    interest = Interest(owner=user, for_coffee=True)
+                    interest.initial_save(locations=[office],
+                                          departments=[org])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sign_up, args=(thread_users,))
+                   for thread_users in users]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        matches = dict(Interest.objects.values_list('id', 'match'))
+        self.assertEqual(len(matches), self.THREADS * self.SIGNUPS_PER_THREAD)
+        for interest_id, match_id in matches.items():
+            if match_id is not None:
+                self.assertEqual(matches[match_id], interest_id)
+
+        # everyone is compatible, so at most one interest can be left over
+        unmatched = [i for i, match_id in matches.items() if match_id is None]
+        self.assertTrue(len(unmatched) <= 1, unmatched)
@@ -0,0 +1,108 @@
+import datetime
+from django.test import TestCase
+from django.test.utils import override_settings
+from core.models import OrgGroup, OfficeLocation
+from mystery import views
+from mystery.groups import GroupBuilder, match_groups
+from mystery.index import IndexEntry
+from mystery.models import Interest, Meet, MeetMembership
+from mystery.tests.utils import random_user
+
+LUNCH = Interest.MEET_LUNCH
+COFFEE = Interest.MEET_COFFEE
+VIDEO = Interest.MEET_VIDEO
+
+
+def _entry(interest_id, meet_types, locations, departments, owner_id=None):
+    return IndexEntry(interest_id, owner_id or 100 + interest_id, meet_types,
+                      frozenset(locations), frozenset(departments),
+                      datetime.datetime(2014, 1, 1, 0, interest_id))
+
+
+class GroupBuilderTest(TestCase):
+
+    def test_fills_groups_oldest_first(self):
+        entries = [_entry(i, COFFEE, ['DC'], [1]) for i in range(1, 10)]
+        groups = GroupBuilder(entries, 3, 4).run()
+        self.assertEqual([group.interest_ids for group in groups],
+                         [[1, 2, 3, 4], [5, 6, 7, 8]])
+        self.assertEqual((groups[0].meet_types, groups[0].location_id),
+                         (COFFEE, 'DC'))
+
+    def test_leftovers_form_a_smaller_group(self):
+        entries = [_entry(i, VIDEO, [], [1]) for i in range(1, 8)]
+        groups = GroupBuilder(entries, 3, 4).run()
+        self.assertEqual([group.interest_ids for group in groups],
+                         [[1, 2, 3, 4], [5, 6, 7]])
+        self.assertEqual(groups[1].location_id, None)
+
+    def test_members_share_a_department_and_differ_in_owner(self):
+        entries = [_entry(1, LUNCH, ['DC'], [1, 2]),
+                   _entry(2, LUNCH, ['DC'], [2]),
+                   _entry(3, LUNCH, ['DC'], [1]),
+                   _entry(4, LUNCH, ['DC'], [2], owner_id=102),
+                   _entry(5, LUNCH, ['DC'], [2, 3]),
+                   _entry(6, LUNCH, ['DC'], [1])]
+        groups = GroupBuilder(entries, 3, 4).run()
+        self.assertEqual([group.interest_ids for group in groups],
+                         [[1, 2, 5]])
+
+    def test_released_entries_tried_elsewhere(self):
+        """
+        Two people at NY are too few for a group, so the one who also picked
+        DC is free to join the group there.
+        """
+        entries = [_entry(1, COFFEE, ['NY'], [1]),
+                   _entry(2, COFFEE, ['NY', 'DC'], [1]),
+                   _entry(3, COFFEE, ['DC'], [1]),
+                   _entry(4, COFFEE, ['DC'], [1])]
+        groups = GroupBuilder(entries, 3, 4).run()
+        self.assertEqual([(group.location_id, group.interest_ids)
+                          for group in groups], [('DC', [2, 3, 4])])
+
+
+class MatchGroupsTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _submit(self, **kwargs):
+        kwargs.setdefault('for_lunch', True)
+        interest = Interest(owner=random_user(), for_group=True, **kwargs)
+        interest.initial_save(locations=[self.office], departments=[self.org])
+        return interest
+
+    @override_settings(MYSTERY_GROUP_SIZE=3)
+    def test_group_written_and_shown(self):
+        interests = [self._submit() for _ in range(4)]
+        # group interests are never paired
+        self.assertEqual(
+            Interest.objects.filter(match__isnull=False).count(), 0)
+
+        pending, groups = match_groups()
+        self.assertEqual((pending, len(groups)), (4, 1))
+        meet = Meet.objects.get()
+        self.assertEqual((meet.meet_types, meet.location),
+                         (Interest.MEET_LUNCH, self.office))
+        members = set(MeetMembership.objects.filter(meet=meet)
+                      .values_list('interest_id', flat=True))
+        self.assertEqual(members, set(i.id for i in interests[:3]))
+
+        # grouped interests are not grouped again
+        self.assertEqual(match_groups(), (1, []))
+
+        # the interest with its meet, its locations, its departments, and
+        # the rest of the group
+        with self.assertNumQueries(4):
+            interest = views._results_queryset().get(id=interests[0].id)
+            params = views._results_params(interest)
+            for person in params['meet_people']:
+                person.user.email
+                person.org_group
+        self.assertEqual(params['meet'], meet)
+        self.assertEqual(set(person.user_id
+                             for person in params['meet_people']),
+                         set(i.owner_id for i in interests[1:3]))
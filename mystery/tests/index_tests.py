@@ -0,0 +1,137 @@
+import datetime
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth import get_user_model
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest
+from mystery.index import MatchingIndex, IndexEntry, matching_index
+from mystery.tests.utils import random_user
+
+LUNCH = Interest.MEET_LUNCH
+COFFEE = Interest.MEET_COFFEE
+VIDEO = Interest.MEET_VIDEO
+
+
+def _entry(interest_id, owner_id, meet_types, locations, departments,
+           minutes=0):
+    return IndexEntry(interest_id, owner_id, meet_types,
+                      frozenset(locations), frozenset(departments),
+                      datetime.datetime(2014, 1, 1) +
+                      datetime.timedelta(minutes=minutes))
+
+
+class MatchingIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = MatchingIndex()
+
+    def test_candidates_oldest_first(self):
+        """ Candidates come back in the order they were added """
+        self.index.add(_entry(1, 10, COFFEE, ['DC'], [1], minutes=0))
+        self.index.add(_entry(2, 11, COFFEE, ['DC'], [1], minutes=1))
+        self.index.add(_entry(3, 12, COFFEE, ['DC'], [1], minutes=2))
+
+        me = _entry(4, 13, COFFEE, ['DC'], [1], minutes=3)
+        self.assertEqual(self.index.candidate_ids(me), [1, 2, 3])
+        self.assertEqual(self.index.candidate_ids(me, limit=2), [1, 2])
+
+    def test_readding_keeps_place(self):
+        """ Updating an indexed interest does not make it the newest """
+        self.index.add(_entry(1, 10, COFFEE, ['DC'], [1], minutes=0))
+        self.index.add(_entry(2, 11, COFFEE, ['DC'], [1], minutes=1))
+        self.index.add(_entry(1, 10, COFFEE | LUNCH, ['DC'], [1], minutes=0))
+
+        me = _entry(3, 12, LUNCH, ['DC'], [1], minutes=2)
+        self.assertEqual(self.index.candidate_ids(me), [1])
+        me = _entry(3, 12, COFFEE, ['DC'], [1], minutes=2)
+        self.assertEqual(self.index.candidate_ids(me), [1, 2])
+        self.assertEqual(len(self.index), 2)
+
+    def test_candidate_rules(self):
+        """ Meet type, location, department and owner all filter """
+        self.index.add(_entry(1, 10, LUNCH, ['DC'], [1]))
+        self.index.add(_entry(2, 11, COFFEE, ['NY'], [1]))
+        self.index.add(_entry(3, 12, COFFEE, ['DC'], [2]))
+        self.index.add(_entry(4, 13, COFFEE, ['DC'], [1]))
+        self.index.add(_entry(5, 14, COFFEE, ['DC', 'NY'], [1, 2]))
+
+        me = _entry(6, 13, COFFEE, ['DC'], [1])
+        self.assertEqual(self.index.candidate_ids(me), [5])
+
+    def test_video_ignores_location(self):
+        self.index.add(_entry(1, 10, VIDEO, [], [1]))
+        self.index.add(_entry(2, 11, COFFEE, ['DC'], [1]))
+
+        me = _entry(3, 12, VIDEO, [], [1])
+        self.assertEqual(self.index.candidate_ids(me), [1])
+
+    def test_discard(self):
+        self.index.add(_entry(1, 10, COFFEE, ['DC'], [1]))
+        self.index.add(_entry(2, 11, COFFEE, ['DC'], [1]))
+        self.index.discard(1)
+        self.index.discard(1)  # no-op
+
+        me = _entry(3, 12, COFFEE, ['DC'], [1])
+        self.assertEqual(self.index.candidate_ids(me), [2])
+        self.assertEqual(len(self.index), 1)
+        self.assertNotIn(1, self.index)
+
+    def test_compaction_keeps_order(self):
+        """ Freed slots are reclaimed without losing oldest-first order """
+        self.index.COMPACT_THRESHOLD = 4
+        for i in range(10):
+            self.index.add(_entry(i, 100 + i, COFFEE, ['DC'], [1],
+                                  minutes=i))
+        for i in range(0, 10, 2):
+            self.index.discard(i)
+
+        me = _entry(99, 1, COFFEE, ['DC'], [1], minutes=99)
+        self.assertEqual(self.index.candidate_ids(me), [1, 3, 5, 7, 9])
+        self.assertTrue(self.index._next_slot < 10)
+
+
+@override_settings(MYSTERY_MATCHING_INDEX=True)
+class IndexedMatchTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        matching_index.clear()
+
+    def tearDown(self):
+        matching_index.clear()
+
+    def test_indexed_match(self):
+        """ Interests are matched through the index and then dropped from it """
+        user1 = get_user_model().objects.get(username='test1@example.com')
+        office = OfficeLocation.objects.all()[0]
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+        submission1 = Interest(owner=user1, for_coffee=True)
+        submission1.initial_save(locations=[office], departments=[org])
+        self.assertIn(submission1.id, matching_index)
+
+        submission2 = Interest(owner=random_user(), for_coffee=True)
+        submission2.initial_save(locations=[office], departments=[org])
+
+        self.assertEqual(submission2.match, submission1)
+        self.assertEqual(Interest.objects.get(id=submission1.id).match,
+                         submission2)
+        self.assertEqual(len(matching_index), 0)
+
+    def test_stale_entries_are_dropped(self):
+        """ Interests closed behind the index's back are never matched """
+        user1 = get_user_model().objects.get(username='test1@example.com')
+        office = OfficeLocation.objects.all()[0]
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+        submission1 = Interest(owner=user1, for_coffee=True)
+        submission1.initial_save(locations=[office], departments=[org])
+        Interest.objects.filter(id=submission1.id).update(is_active=False)
+
+        submission2 = Interest(owner=random_user(), for_coffee=True)
+        submission2.initial_save(locations=[office], departments=[org])
+
+        self.assertEqual(submission2.match, None)
+        self.assertNotIn(submission1.id, matching_index)
+        self.assertIn(submission2.id, matching_index)
@@ -2,6 +2,7 @@ from django.test import TestCase
 from mystery.models import Interest
 from mystery.tests.utils import mock_req, random_user
 from mystery import views
+from mystery.catalogue import catalogue
 from mock import patch
 from django.contrib.auth import get_user_model
 from core.models import OrgGroup, OfficeLocation
@@ -61,7 +62,25 @@ class MatchTest(TestCase):
         self.assertIn(reverse('mystery:mystery'), resp['Location'])
         self.assertEqual(Interest.objects.get(id=submission.id).is_active, False)
 
-    def test_assigned_match(self):
+    def test_cancel_leaves_partner_open(self):
+        """ Cancelling a sign-up matched meanwhile spares the partner """
+        user1 = get_user_model().objects.get(username='test1@example.com')
+        self.client.login(username='test1@example.com', password='1')
+        office = OfficeLocation.objects.all()[0]
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+        submission1 = Interest(owner=user1, for_coffee=True)
+        submission1.initial_save(locations=[office], departments=[org])
+        submission2 = Interest(owner=random_user(), for_coffee=True)
+        submission2.initial_save(locations=[office], departments=[org])
+        self.assertEqual(submission2.match_id, submission1.id)
+
+        resp = self.client.get(reverse('mystery:close_cancel', args=(submission1.id,)))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(Interest.objects.get(id=submission1.id).is_active, False)
+        self.assertEqual(Interest.objects.get(id=submission2.id).is_active, True)
+
+
         """ Test a valid match results in assigned match page """
         user1 = get_user_model().objects.get(username='test1@example.com')
         self.client.login(username='test1@example.com', password='1')
@@ -162,7 +181,8 @@ class MatchTest(TestCase):
         self.assertEqual(resp.status_code, 302)
         self.assertIn('forms', resp['Location'])
         self.assertEqual(Interest.objects.get(id=submission1.id).is_active, False)
-        self.assertEqual(Interest.objects.get(id=submission2.id).is_active, True)
+        # the partner's interest is closed along with it
+        self.assertEqual(Interest.objects.get(id=submission2.id).is_active, False)
 
     def test_complete_assigned_match(self):
         """ Test closure of assigned match """
@@ -194,7 +214,36 @@ class MatchTest(TestCase):
         self.assertEqual(resp.status_code, 302)
         self.assertIn('forms', resp['Location'])
         self.assertEqual(Interest.objects.get(id=submission1.id).is_active, False)
-        self.assertEqual(Interest.objects.get(id=submission2.id).is_active, True)
+        # the partner's interest is closed along with it
+        self.assertEqual(Interest.objects.get(id=submission2.id).is_active, False)
+
+    def test_close_query_count(self):
+        """
+        Closing a match takes a fixed number of queries and does not go
+        looking for a new match.
+        """
+        office_list = list(OfficeLocation.objects.all()[:2])
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        user1 = get_user_model().objects.get(username='test1@example.com')
+
+        submission1 = Interest(owner=user1, for_coffee=True)
+        submission1.initial_save(locations=office_list, departments=[org])
+        submission2 = Interest(owner=random_user(), for_coffee=True)
+        submission2.initial_save(locations=office_list[:1],
+                                 departments=[org])
+        # someone else who would be matched if either side looked again
+        Interest(owner=random_user(), for_coffee=True).initial_save(
+            locations=office_list, departments=[org])
+
+        # interest with match and owner, both sides' locations, the UPDATE
+        with self.assertNumQueries(4):
+            resp = views.close_complete(mock_req(user=user1),
+                                        str(submission1.id))
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(office_list[0].name, resp['Location'])
+        self.assertEqual(
+            Interest.objects.filter(id__in=[submission1.id, submission2.id],
+                                    is_active=True).count(), 0)
 
     def test_non_matching_type(self):
         """ Verify registrations with different meet type (lunch, etc) do not register as a match. """
@@ -368,3 +417,76 @@ class MatchTest(TestCase):
         self.assertEqual(submission2.match, submission1)
         submission1 = Interest.objects.get(id=submission1.id)  # refresh
         self.assertEqual(submission1.match, submission2)
+
+    def test_meet_types_kept_in_sync(self):
+        """ meet_types mirrors the meet type booleans on every save """
+        submission = Interest(owner=random_user(), for_coffee=True,
+                              is_active=False)
+        submission.save()
+        self.assertEqual(submission.meet_types, Interest.MEET_COFFEE)
+
+        submission.video_chat = True
+        submission.save()
+        self.assertEqual(Interest.objects.get(id=submission.id).meet_types,
+                         Interest.MEET_COFFEE | Interest.MEET_VIDEO)
+
+    def test_overlapping_meet_types(self):
+        """ Every mask sharing a bit with the given one, and nothing else """
+        overlapping = Interest.overlapping_meet_types(Interest.MEET_COFFEE)
+        self.assertEqual(overlapping, [
+            Interest.MEET_COFFEE,
+            Interest.MEET_COFFEE | Interest.MEET_LUNCH,
+            Interest.MEET_COFFEE | Interest.MEET_VIDEO,
+            Interest.ALL_MEET_TYPES])
+
+    def test_m2m_matching_returns_each_candidate_once(self):
+        """
+        Sharing several locations and departments with a candidate does not
+        repeat it in the matching queryset.
+        """
+        office_list = list(OfficeLocation.objects.all()[:3])
+        org_list = list(OrgGroup.objects.filter(parent__isnull=True)[:3])
+
+        candidate = Interest(owner=random_user(), for_coffee=True)
+        candidate.initial_save(locations=office_list, departments=org_list)
+        probe = Interest(owner=random_user(), for_coffee=True,
+                         is_active=False)
+        probe.initial_save(locations=office_list, departments=org_list)
+
+        for through_m2m in (False, True):
+            matches = probe._query_matching_interests(through_m2m=through_m2m)
+            self.assertEqual(list(matches), [candidate])
+            self.assertEqual(matches.count(), 1)
+
+    def test_results_page_query_count(self):
+        """
+        Loading a matched interest and everything its results page shows
+        takes a fixed number of queries.
+        """
+        office_list = list(OfficeLocation.objects.all()[:2])
+        org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        user1 = get_user_model().objects.get(username='test1@example.com')
+
+        submission1 = Interest(owner=random_user(), for_coffee=True)
+        submission1.initial_save(locations=office_list, departments=[org])
+        submission2 = Interest(owner=user1, for_coffee=True)
+        submission2.initial_save(locations=office_list[:1],
+                                 departments=[org])
+
+        catalogue.invalidate()
+        catalogue.departments()
+
+        # interest with match and owner, its locations, its departments,
+        # the match's person, shared locations
+        with self.assertNumQueries(5):
+            interest = views._results_queryset().filter(
+                owner=user1, is_active=True).first()
+            params = views._results_params(interest)
+            interest.where_text()
+            interest.departments_text()
+            interest.for_what()
+            params['match_person'].user.first_name
+            params['match_person'].org_group
+
+        self.assertEqual(interest.match, submission1)
+        self.assertEqual(params['match_locations'], office_list[:1])
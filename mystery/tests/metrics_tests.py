@@ -0,0 +1,96 @@
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from core.models import OrgGroup, OfficeLocation
+from mystery import metrics
+from mystery.models import Interest
+from mystery.tests.utils import random_user
+
+
+class ListSink(object):
+    records = []
+
+    def record(self, kind, name, value):
+        self.records.append((kind, name, value))
+
+
+class MetricsTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        metrics.stats.reset()
+        ListSink.records = []
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def test_matching_is_recorded(self):
+        for _ in range(2):
+            interest = Interest(owner=random_user(), for_coffee=True)
+            interest.initial_save(locations=[self.office],
+                                  departments=[self.org])
+
+        self.assertEqual(metrics.stats.get(metrics.COUNT, 'matching.matched')
+                         ['sum'], 1)
+        self.assertEqual(metrics.stats.get(metrics.COUNT,
+                                           'matching.unmatched')['sum'], 1)
+        candidates = metrics.stats.get(metrics.VALUE, 'matching.candidates')
+        self.assertEqual((candidates['count'], candidates['max']), (2, 1))
+        self.assertEqual(metrics.stats.get(
+            metrics.TIMING, 'matching.add_match')['count'], 2)
+
+    @override_settings(MYSTERY_METRICS_QUERIES=True)
+    def test_views_are_recorded(self):
+        self.client.login(username='test1@example.com', password='1')
+        self.client.post(reverse('mystery:mystery'),
+                         {'meet_choice': Interest.CHOICE_COFFEE,
+                          'departments': [self.org.pk],
+                          'locations': [self.office.pk]})
+
+        queries = metrics.stats.get(metrics.VALUE, 'view.index.queries')
+        self.assertEqual(queries['count'], 1)
+        self.assertTrue(queries['sum'] > 0)
+
+        resp = self.client.get(reverse('mystery:metrics'))
+        self.assertContains(resp, 'mystery_view_index_ms_count 1')
+        self.assertContains(resp, 'mystery_view_index_status_200_total 1')
+        self.assertContains(resp, 'mystery_matching_unmatched_total 1')
+
+    @override_settings(MYSTERY_METRICS_QUERIES=False)
+    def test_queries_not_counted_by_default(self):
+        self.client.login(username='test1@example.com', password='1')
+        self.client.get(reverse('mystery:mystery'))
+        self.assertEqual(
+            metrics.stats.get(metrics.VALUE, 'view.index.queries'), None)
+        self.assertEqual(metrics.stats.get(
+            metrics.TIMING, 'view.index')['count'], 1)
+
+    def test_metrics_view_can_be_restricted(self):
+        url = reverse('mystery:metrics')
+        with self.settings(MYSTERY_METRICS_VIEW=False):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        with self.settings(MYSTERY_METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(url).status_code, 403)
+            resp = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(resp.status_code, 200)
+
+    def test_query_counter_with_replica(self):
+        """ Each connection is counted once, and unknown aliases skipped """
+        for alias in ('default', 'no-such-db'):
+            with self.settings(MYSTERY_REPLICA_DB=alias):
+                with metrics.query_counter() as queries:
+                    list(Interest.objects.all()[:1])
+                self.assertEqual(queries.count, 1)
+
+    @override_settings(MYSTERY_METRICS_SINKS=[
+        'mystery.tests.metrics_tests.ListSink',
+        'mystery.metrics.LoggingSink'])
+    def test_pluggable_sinks(self):
+        metrics.incr('test.counter')
+        with metrics.timer('test.timer'):
+            pass
+        self.assertEqual([record[:2] for record in ListSink.records],
+                         [(metrics.COUNT, 'test.counter'),
+                          (metrics.TIMING, 'test.timer')])
+        self.assertEqual(metrics.stats.get(metrics.COUNT, 'test.counter'),
+                         None)
@@ -0,0 +1,133 @@
+import json
+import threading
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.urlresolvers import reverse
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+from django.test.utils import override_settings
+from core.models import OrgGroup, OfficeLocation
+from mystery import views
+from mystery.models import Interest, Notification
+from mystery.notifications import (WaitRegistry, match_made, send_digests,
+                                   wait_for_change, waiters)
+from mystery.status import MatchStatusCache, match_status
+from mystery.tests.utils import mock_req, random_user
+
+
+class WaitRegistryTest(TestCase):
+
+    def test_notify_wakes_every_waiter(self):
+        registry = WaitRegistry()
+        woken = []
+        threads = [threading.Thread(
+            target=lambda: woken.append(registry.wait(1, 10)))
+            for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while not len(registry) or registry._events[1][1] < 3:
+            pass
+        registry.notify([1, 2])
+        for thread in threads:
+            thread.join()
+        self.assertEqual(woken, [True, True, True])
+        self.assertEqual(len(registry), 0)
+
+    def test_timeout_cleans_up(self):
+        registry = WaitRegistry()
+        self.assertFalse(registry.wait(1, 0.01))
+        self.assertEqual(len(registry), 0)
+
+
+class MatchNotificationTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def tearDown(self):
+        cache.clear()
+
+    def _submit(self, owner=None):
+        interest = Interest(owner=owner or random_user(), for_coffee=True)
+        interest.initial_save(locations=[self.office], departments=[self.org])
+        return interest
+
+    def test_matching_sends_match_made(self):
+        sent = []
+
+        def receiver(sender, interests, **kwargs):
+            sent.extend(interests)
+        match_made.connect(receiver)
+        try:
+            first = self._submit()
+            second = self._submit()
+        finally:
+            match_made.disconnect(receiver)
+        self.assertEqual(sorted(sent), sorted([(first.id, first.owner_id),
+                                               (second.id, second.owner_id)]))
+
+    def test_long_poll_off_by_default(self):
+        """ Without MYSTERY_LONG_POLL the page polls and wait is a 404 """
+        self.client.login(username='test1@example.com', password='1')
+        waiting = self._submit(get_user_model().objects.get(
+            username='test1@example.com'))
+        self.assertRaises(Http404, views.wait,
+                          mock_req(user=waiting.owner), str(waiting.id))
+        url = reverse('mystery:mystery')
+        self.assertNotContains(self.client.get(url), 'data-wait-url')
+        with override_settings(MYSTERY_LONG_POLL=True):
+            self.assertContains(self.client.get(url), 'data-wait-url')
+
+    def test_wait_times_out_unchanged(self):
+        waiting = self._submit()
+        req = mock_req(user=waiting.owner)
+        version = json.loads(views.status(req, str(waiting.id)).content)[
+            'version']
+        req.GET = req.GET.copy()
+        req.GET['version'] = version
+        with override_settings(MYSTERY_LONG_POLL=True,
+                               MYSTERY_LONG_POLL_TIMEOUT=0.01):
+            resp = views.wait(req, str(waiting.id))
+        self.assertEqual(json.loads(resp.content),
+                         {'status': 'pending', 'version': version})
+
+    @override_settings(MYSTERY_LONG_POLL_CHECK=30)
+    def test_waiter_woken_by_notify(self):
+        waiting = self._submit()
+        entry = match_status.get(waiting.id)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            wait_for_change(waiting.id, entry['version'], 30)))
+        thread.start()
+        while waiting.id not in waiters._events:
+            pass
+        # what the match would have left in the status cache
+        cache.set(MatchStatusCache.KEY % waiting.id,
+                  dict(entry, status='matched', version='new'))
+        waiters.notify([waiting.id])
+        thread.join(10)
+        self.assertEqual(results[0]['status'], 'matched')
+
+    @override_settings(MYSTERY_EMAIL_DIGEST=True,
+                       EMAIL_BACKEND='django.core.mail.backends.locmem.'
+                                     'EmailBackend')
+    def test_digest_coalesces_per_person(self):
+        owner = random_user()
+        owner.email = 'owner@example.com'
+        owner.save()
+        for _ in range(2):
+            mine = self._submit(owner)
+            self._submit()
+            mine.set_inactive()
+        self.assertEqual(Notification.objects.filter(user=owner).count(), 2)
+
+        messages, notifications = send_digests()
+        self.assertEqual(notifications, 4)
+        to_owner = [m for m in mail.outbox if m.to == ['owner@example.com']]
+        self.assertEqual(len(to_owner), 1)
+        self.assertIn('2 new Mystery Meets', to_owner[0].subject)
+        self.assertEqual(send_digests(), (0, 0))
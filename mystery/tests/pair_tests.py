@@ -0,0 +1,102 @@
+import datetime
+from django.test import TestCase
+from django.test.utils import override_settings
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import ArchivedInterest, Interest, PairHistory
+from mystery.index import IndexEntry, matching_index
+from mystery.matching import BatchMatcher, match_pending
+from mystery.pairs import pair_history, rebuild_pair_history
+from mystery.tests.utils import random_user
+
+COFFEE = Interest.MEET_COFFEE
+
+
+class PairHistoryTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        self.alice = random_user()
+        self.bob = random_user()
+
+    def tearDown(self):
+        pair_history.clear()
+        matching_index.clear()
+
+    def _interest(self, owner, is_active=True):
+        interest = Interest(owner=owner, for_coffee=True, is_active=False)
+        interest.save()
+        interest.locations.add(self.office)
+        interest.departments.add(self.org)
+        if is_active:
+            interest.is_active = True
+            interest.save()
+        return interest
+
+    def _met(self, user_a, user_b):
+        return PairHistory.objects.filter(
+            user_a=min(user_a.id, user_b.id),
+            user_b=max(user_a.id, user_b.id)).exists()
+
+    def _second_meeting(self):
+        """
+        Match alice and bob, close the match, and sign both up again.
+        Returns the new interests.
+        """
+        first = self._interest(self.alice)
+        second = self._interest(self.bob)
+        self.assertEqual(second.match, first)
+        self.assertTrue(self._met(self.alice, self.bob))
+        Interest.objects.filter(id__in=[first.id, second.id]) \
+            .update(is_active=False)
+        return self._interest(self.alice), self._interest(self.bob)
+
+    def test_past_partners_not_rematched(self):
+        again_a, again_b = self._second_meeting()
+        self.assertEqual(again_b.match, None)
+
+        newcomer = self._interest(random_user())
+        self.assertEqual(newcomer.match, again_a)
+
+    @override_settings(MYSTERY_MATCHING_INDEX=True)
+    def test_past_partners_not_rematched_from_index(self):
+        matching_index.clear()
+        again_a, again_b = self._second_meeting()
+        self.assertEqual(again_b.match, None)
+
+    def test_batch_matcher_skips_past_partners(self):
+        entries = [
+            IndexEntry(i, owner, COFFEE, frozenset(['DC']), frozenset([1]),
+                       datetime.datetime(2014, 1, 1, 0, i))
+            for i, owner in [(1, 10), (2, 11), (3, 12), (4, 13)]]
+        partners = {10: set([11]), 11: set([10])}
+        pairs = BatchMatcher(entries,
+                             partners=lambda owner: partners.get(owner, ())).run()
+        self.assertEqual(sorted(pairs), [(1, 3), (2, 4)])
+
+    def test_match_pending_skips_past_partners(self):
+        PairHistory.objects.create(
+            user_a_id=min(self.alice.id, self.bob.id),
+            user_b_id=max(self.alice.id, self.bob.id))
+        for owner in (self.alice, self.bob):
+            interest = self._interest(owner, is_active=False)
+            Interest.objects.filter(id=interest.id).update(is_active=True)
+
+        pending, pairs = match_pending()
+        self.assertEqual((pending, pairs), (2, []))
+
+    def test_rebuild_from_interests(self):
+        self._second_meeting()
+        carol = random_user()
+        ArchivedInterest.objects.create(
+            original_id=1000, owner=carol, match_original_id=1001,
+            match_owner=self.bob, created=datetime.datetime(2014, 1, 1),
+            updated=datetime.datetime(2014, 1, 1))
+        PairHistory.objects.all().delete()
+
+        self.assertEqual(rebuild_pair_history(), 2)
+        self.assertTrue(self._met(self.alice, self.bob))
+        self.assertTrue(self._met(self.bob, carol))
+        self.assertEqual(rebuild_pair_history(), 0)
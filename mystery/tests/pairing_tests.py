@@ -0,0 +1,83 @@
+from mock import patch
+from django.db import OperationalError, connection
+from django.test import TestCase
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest
+from mystery.matching import pair_interests
+from mystery.tests.utils import random_user
+
+
+class PairingTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _inactive(self):
+        interest = Interest(owner=random_user(), for_coffee=True,
+                            is_active=False)
+        interest.save()
+        interest.locations.add(self.office)
+        interest.departments.add(self.org)
+        return interest
+
+    def _pending(self):
+        interest = self._inactive()
+        Interest.objects.filter(id=interest.id).update(is_active=True)
+        return interest
+
+    def test_match_query_count(self):
+        """
+        Saving an interest that finds a match costs its own UPDATE, the
+        candidate query, one UPDATE for both sides of the pair and the
+        insert recording that the owners have met.
+        """
+        existing = self._pending()
+        submission = self._inactive()
+        submission.is_active = True
+
+        # save, candidates, pair, pair history
+        expected = 4
+        if connection.features.uses_savepoints:
+            expected += 2  # the pair is written inside a savepoint here
+        with self.assertNumQueries(expected):
+            submission.save()
+
+        self.assertEqual(submission.match, existing)
+        self.assertEqual(Interest.objects.get(id=existing.id).match_id,
+                         submission.id)
+
+    def test_saving_matched_interest_does_not_rematch(self):
+        """ Saving an already matched interest is a single UPDATE """
+        existing = self._pending()
+        submission = self._inactive()
+        submission.is_active = True
+        submission.save()
+
+        with self.assertNumQueries(1):
+            submission.save()
+
+    def test_deadlock_is_a_lost_claim(self):
+        """ A deadlocked pairing gives up instead of erroring """
+        a, b = self._pending(), self._pending()
+        deadlock = OperationalError('deadlock detected')
+        deadlock.__cause__ = type('Cause', (Exception,), {'pgcode': '40P01'})()
+        with patch('mystery.matching._pair_update', side_effect=deadlock):
+            self.assertFalse(pair_interests(a.id, b.id))
+        self.assertEqual(Interest.objects.get(id=a.id).match_id, None)
+
+        with patch('mystery.matching._pair_update',
+                   side_effect=OperationalError('disk I/O error')):
+            self.assertRaises(OperationalError, pair_interests, a.id, b.id)
+
+    def test_pair_interests_all_or_nothing(self):
+        """ If either side is already taken, neither side is written """
+        a, b, c = self._pending(), self._pending(), self._pending()
+        self.assertTrue(pair_interests(a.id, b.id))
+        self.assertFalse(pair_interests(b.id, c.id))
+
+        self.assertEqual(Interest.objects.get(id=a.id).match_id, b.id)
+        self.assertEqual(Interest.objects.get(id=b.id).match_id, a.id)
+        self.assertEqual(Interest.objects.get(id=c.id).match_id, None)
@@ -0,0 +1,72 @@
+import datetime
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest, Round
+from mystery.tests.utils import random_user
+
+
+class RoundTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _submit(self, owner=None, **kwargs):
+        kwargs.setdefault('for_coffee', True)
+        interest = Interest(owner=owner or random_user(), **kwargs)
+        interest.initial_save(locations=[self.office], departments=[self.org])
+        return Interest.objects.get(id=interest.id)
+
+    def test_unmatched_are_carried_over_then_expire(self):
+        waiting = self._submit()
+        first = Round.advance()
+        self.assertEqual((first.number, first.carried_over, first.expired),
+                         (1, 1, 0))
+        carried = Interest.objects.get(id=waiting.id)
+        self.assertTrue(carried.is_active)
+        self.assertEqual(carried.carried_over, 1)
+        self.assertEqual(carried.created, waiting.created)
+
+        second = Round.advance()
+        self.assertEqual((second.number, second.expired), (2, 1))
+        self.assertFalse(Interest.objects.get(id=waiting.id).is_active)
+
+    def test_carried_over_interest_is_matched_first(self):
+        owner = random_user()
+        waiting = self._submit(owner=owner)
+        Round.advance()
+        # the same person again, so the two cannot match each other
+        self._submit(owner=owner)
+        submission = self._submit()
+        self.assertEqual(submission.match_id, waiting.id)
+
+    def test_matches_get_a_full_round(self):
+        now = timezone.now()
+        Round.advance(now=now - datetime.timedelta(days=7))
+        first = self._submit()
+        second = self._submit()
+        self.assertEqual(second.match_id, first.id)
+
+        # matched during the round that is ending: kept for another round
+        self.assertEqual(Round.advance(now=now).closed, 0)
+        self.assertTrue(Interest.objects.get(id=first.id).is_active)
+
+        later = Round.advance(now=now + datetime.timedelta(days=7))
+        self.assertEqual(later.closed, 2)
+        self.assertFalse(Interest.objects.get(id=first.id).is_active)
+        self.assertFalse(Interest.objects.get(id=second.id).is_active)
+
+    @override_settings(MYSTERY_ROUND_CARRY_OVER=0)
+    def test_command(self):
+        self._submit()
+        out = StringIO()
+        call_command('advance_round', stdout=out)
+        self.assertIn('Round 1', out.getvalue())
+        self.assertIn('expired 1', out.getvalue())
+        self.assertEqual(Interest.objects.filter(is_active=True).count(), 0)
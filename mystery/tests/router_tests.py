@@ -0,0 +1,99 @@
+import json
+import time
+from mock import patch
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mystery import views
+from mystery.models import Interest
+from mystery.routers import (ReplicaRouter, STICKY_COOKIE, pins_primary,
+                             reading_from_replica, replica_reads)
+from mystery.tests.utils import mock_req, random_user
+
+
+def _reads_from(request):
+    return HttpResponse(ReplicaRouter().db_for_read(Interest) or 'default')
+
+
+@override_settings(MYSTERY_REPLICA_DB='replica')
+class ReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_use_replica_only_when_asked(self):
+        self.assertIsNone(self.router.db_for_read(Interest))
+        with reading_from_replica():
+            self.assertEqual(self.router.db_for_read(Interest), 'replica')
+        self.assertIsNone(self.router.db_for_read(Interest))
+
+    def test_writes_use_primary(self):
+        with reading_from_replica():
+            self.assertEqual(self.router.db_for_write(Interest), 'default')
+
+    @override_settings(MYSTERY_REPLICA_APPS=['core'])
+    def test_other_apps_are_left_alone(self):
+        with reading_from_replica():
+            self.assertIsNone(self.router.db_for_read(Interest))
+
+    def test_get_reads_from_replica(self):
+        resp = replica_reads(_reads_from)(self.factory.get('/'))
+        self.assertEqual(resp.content, 'replica')
+        self.assertNotIn(STICKY_COOKIE, resp.cookies)
+
+    def test_post_pins_primary(self):
+        resp = replica_reads(_reads_from)(self.factory.post('/'))
+        self.assertEqual(resp.content, 'default')
+        self.assertIn(STICKY_COOKIE, resp.cookies)
+
+    def test_recent_writer_reads_from_primary(self):
+        req = self.factory.get('/')
+        req.COOKIES[STICKY_COOKIE] = '%d' % (time.time() + 30)
+        resp = replica_reads(_reads_from)(req)
+        self.assertEqual(resp.content, 'default')
+
+        req.COOKIES[STICKY_COOKIE] = '%d' % (time.time() - 1)
+        resp = replica_reads(_reads_from)(req)
+        self.assertEqual(resp.content, 'replica')
+
+    def test_pins_primary_sets_cookie(self):
+        resp = pins_primary(_reads_from)(self.factory.get('/'))
+        self.assertIn(STICKY_COOKIE, resp.cookies)
+
+    @override_settings(MYSTERY_REPLICA_DB=None)
+    def test_no_replica_configured(self):
+        resp = replica_reads(_reads_from)(self.factory.get('/'))
+        self.assertEqual(resp.content, 'default')
+        self.assertIsNone(self.router.db_for_write(Interest))
+
+
+@override_settings(MYSTERY_REPLICA_DB='replica', MYSTERY_LONG_POLL=True)
+class StatusRoutingTest(TestCase):
+
+    def setUp(self):
+        self.user = random_user()
+        self.reads = []
+
+    def _entry(self, interest_id):
+        # the status cache decides for itself where a miss is loaded from;
+        # record what the router would pick for anything else read
+        self.reads.append(ReplicaRouter().db_for_read(Interest))
+        return {'owner': self.user.pk, 'status': 'pending', 'version': 'v'}
+
+    def test_status_and_wait_read_from_replica(self):
+        with patch.object(views.match_status, 'get', self._entry):
+            resp = views.status(mock_req(user=self.user), '1')
+            self.assertEqual(json.loads(resp.content)['status'], 'pending')
+            resp = views.wait(
+                mock_req('/?version=old', user=self.user), '1')
+            self.assertEqual(json.loads(resp.content)['version'], 'v')
+        self.assertEqual(self.reads, ['replica', 'replica'])
+
+    def test_status_after_write_reads_from_primary(self):
+        req = mock_req(user=self.user)
+        req.COOKIES[STICKY_COOKIE] = '%d' % (time.time() + 30)
+        with patch.object(views.match_status, 'get', self._entry):
+            views.status(req, '1')
+        self.assertEqual(self.reads, [None])
@@ -0,0 +1,107 @@
+import datetime
+from django.test import TestCase
+from django.test.utils import override_settings
+from core.models import OrgGroup, OfficeLocation, Person
+from mystery.models import Interest
+from mystery.scoring import DEFAULT_WEIGHTS, rank
+from mystery.tests.utils import random_user
+
+NOW = datetime.datetime(2014, 1, 1, 12, 0)
+
+
+def _row(interest_id, hours_waiting, location_signature=0, org_group=None):
+    return (interest_id, NOW - datetime.timedelta(hours=hours_waiting),
+            location_signature, org_group)
+
+
+class RankTest(TestCase):
+
+    def test_wait_only_is_oldest_first(self):
+        weights = dict(DEFAULT_WEIGHTS, locations=0, cross_department=0)
+        rows = [_row(1, 3), _row(2, 2), _row(3, 1)]
+        self.assertEqual(rank(rows, 0b11, 7, NOW, weights), [1, 2, 3])
+
+    def test_location_overlap(self):
+        """ Sharing both offices beats sharing one """
+        weights = dict(DEFAULT_WEIGHTS, wait=0, cross_department=0)
+        rows = [_row(1, 3, 0b001), _row(2, 2, 0b011), _row(3, 1, 0b100)]
+        self.assertEqual(rank(rows, 0b011, 7, NOW, weights), [2, 1, 3])
+
+    def test_cross_department(self):
+        weights = dict(DEFAULT_WEIGHTS, wait=0, locations=0)
+        rows = [_row(1, 3, org_group=7), _row(2, 2, org_group=None),
+                _row(3, 1, org_group=8)]
+        self.assertEqual(rank(rows, 0, 7, NOW, weights), [3, 1, 2])
+
+    def test_empty(self):
+        self.assertEqual(rank([], 0, None, NOW, DEFAULT_WEIGHTS), [])
+
+
+class ScoredMatchingTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.offices = list(OfficeLocation.objects.all()[:2])
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _pending(self, offices):
+        interest = Interest(owner=random_user(), for_coffee=True,
+                            is_active=False)
+        interest.initial_save(locations=offices, departments=[self.org])
+        Interest.objects.filter(id=interest.id).update(is_active=True)
+        return interest
+
+    def _submit(self, offices, owner=None):
+        interest = Interest(owner=owner or random_user(), for_coffee=True)
+        interest.initial_save(locations=offices, departments=[self.org])
+        return interest
+
+    def test_oldest_without_weights(self):
+        oldest = self._pending(self.offices[:1])
+        self._pending(self.offices)
+        self.assertEqual(self._submit(self.offices).match, oldest)
+
+    @override_settings(MYSTERY_MATCH_WEIGHTS={'wait': 0.1,
+                                              'cross_department': 0})
+    def test_prefers_more_shared_offices(self):
+        self._pending(self.offices[:1])
+        closer = self._pending(self.offices)
+        self.assertEqual(self._submit(self.offices).match, closer)
+
+    def _cross_department_pool(self, home=None, near=None):
+        """
+        An oldest candidate in ``near`` (by default the submitter's own
+        ``home`` org group) and a newer one in another department.  Returns
+        the two and the submitter.
+        """
+        home = home or OrgGroup.objects.create(title='Home dept')
+        away = OrgGroup.objects.create(title='Away dept')
+        oldest = self._pending(self.offices)
+        other = self._pending(self.offices)
+        submitter = random_user()
+        Person.objects.filter(user=submitter).update(org_group=home)
+        Person.objects.filter(user=oldest.owner).update(org_group=near or home)
+        Person.objects.filter(user=other.owner).update(org_group=away)
+        return oldest, other, submitter
+
+    @override_settings(MYSTERY_MATCH_WEIGHTS={'wait': 0.1, 'locations': 0})
+    def test_prefers_other_departments(self):
+        oldest, other, submitter = self._cross_department_pool()
+        self.assertEqual(self._submit(self.offices, submitter).match, other)
+
+    @override_settings(MYSTERY_MATCH_WEIGHTS={'wait': 0.1, 'locations': 0})
+    def test_sub_teams_share_a_department(self):
+        """ Two teams under the same department are not cross-department """
+        dept = OrgGroup.objects.create(title='Dept')
+        team = OrgGroup.objects.create(title='Team', parent=dept)
+        other_team = OrgGroup.objects.create(title='Other team', parent=dept)
+        oldest, other, submitter = self._cross_department_pool(
+            home=team, near=other_team)
+        self.assertEqual(self._submit(self.offices, submitter).match, other)
+
+    @override_settings(MYSTERY_MATCH_WEIGHTS={'wait': 0.1, 'locations': 0},
+                       MYSTERY_MATCH_SCORING_WINDOW=1)
+    def test_window_bounds_the_candidates(self):
+        oldest, other, submitter = self._cross_department_pool()
+        self.assertEqual(self._submit(self.offices, submitter).match, oldest)
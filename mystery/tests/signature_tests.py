@@ -0,0 +1,109 @@
+from django.test import TestCase
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest, SignatureBit
+from mystery.tests.utils import random_user
+
+
+class SignatureTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _office(self, office_id):
+        return OfficeLocation.objects.create(
+            id=office_id, name=office_id, street='test office',
+            city='test office', state='DC', zip='20000')
+
+    def test_bits_are_distinct_and_stable(self):
+        office2 = self._office('test_id')
+        bits = SignatureBit.bits_for(SignatureBit.LOCATION,
+                                     [self.office.pk, office2.pk])
+        self.assertEqual(sorted(bits.values()), [0, 1])
+        self.assertEqual(
+            SignatureBit.bits_for(SignatureBit.LOCATION, [office2.pk]),
+            {office2.pk: bits[office2.pk]})
+
+    def test_initial_save_sets_signatures(self):
+        interest = Interest(owner=random_user(), for_coffee=True)
+        interest.initial_save(locations=[self.office],
+                              departments=[self.org])
+
+        stored = Interest.objects.get(id=interest.id)
+        self.assertEqual(stored.location_signature, SignatureBit.signature(
+            SignatureBit.LOCATION, [self.office.pk]))
+        self.assertEqual(stored.department_signature, SignatureBit.signature(
+            SignatureBit.DEPARTMENT, [self.org.pk]))
+
+    def test_m2m_changes_refresh_signatures(self):
+        office2 = self._office('test_id')
+        interest = Interest(owner=random_user(), for_coffee=True,
+                            is_active=False)
+        interest.save()
+        self.assertEqual(interest.location_signature, 0)
+
+        interest.locations.add(self.office, office2)
+        both = SignatureBit.signature(SignatureBit.LOCATION,
+                                      [self.office.pk, office2.pk])
+        self.assertEqual(
+            Interest.objects.get(id=interest.id).location_signature, both)
+
+        interest.locations.remove(self.office)
+        self.assertEqual(
+            Interest.objects.get(id=interest.id).location_signature,
+            SignatureBit.signature(SignatureBit.LOCATION, [office2.pk]))
+
+        office2.interest_set.clear()
+        self.assertEqual(
+            Interest.objects.get(id=interest.id).location_signature, 0)
+
+    def test_saving_stale_instance_keeps_signatures(self):
+        """
+        Saving an instance loaded before its locations changed elsewhere
+        does not write its old signature back.
+        """
+        office2 = self._office('test_id')
+        interest = Interest(owner=random_user(), for_coffee=True,
+                            is_active=False)
+        interest.initial_save(locations=[self.office],
+                              departments=[self.org])
+        stale = Interest.objects.get(id=interest.id)
+
+        office2.interest_set.add(interest)
+        stale.is_active = True
+        stale.save()
+
+        stored = Interest.objects.get(id=interest.id)
+        self.assertTrue(stored.is_active)
+        self.assertEqual(stored.location_signature, SignatureBit.signature(
+            SignatureBit.LOCATION, [self.office.pk, office2.pk]))
+
+        # found by the signature filter at its new office
+        other = Interest(owner=random_user(), for_coffee=True)
+        other.initial_save(locations=[office2], departments=[self.org])
+        self.assertEqual(other.match_id, interest.id)
+
+    def test_overflowing_locations_still_match_exactly(self):
+        """
+        Locations past the last signature bit share the overflow bit, and
+        are told apart through the M2M table.
+        """
+        SignatureBit.objects.bulk_create([
+            SignatureBit(kind=SignatureBit.LOCATION, key='filler%d' % bit,
+                         bit=bit)
+            for bit in range(SignatureBit.OVERFLOW_BIT)])
+        office2 = self._office('test_id')
+
+        first = Interest(owner=random_user(), for_coffee=True)
+        first.initial_save(locations=[self.office], departments=[self.org])
+        other = Interest(owner=random_user(), for_coffee=True)
+        other.initial_save(locations=[office2], departments=[self.org])
+        self.assertEqual(first.location_signature, SignatureBit.OVERFLOW_MASK)
+        self.assertEqual(other.location_signature, SignatureBit.OVERFLOW_MASK)
+        self.assertEqual(other.match, None)
+
+        same = Interest(owner=random_user(), for_coffee=True)
+        same.initial_save(locations=[self.office], departments=[self.org])
+        self.assertEqual(same.match, first)
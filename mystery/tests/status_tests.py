@@ -0,0 +1,93 @@
+import json
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+from core.models import OrgGroup, OfficeLocation
+from mystery import views
+from mystery.models import Interest
+from mystery.status import match_status
+from mystery.tests.utils import mock_req, random_user
+
+
+class StatusTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def tearDown(self):
+        cache.clear()
+
+    def _submit(self):
+        interest = Interest(owner=random_user(), for_coffee=True)
+        interest.initial_save(locations=[self.office], departments=[self.org])
+        return interest
+
+    def _poll(self, interest, version=None):
+        req = mock_req(user=interest.owner)
+        if version:
+            req.META['HTTP_IF_NONE_MATCH'] = '"%s"' % version
+        return views.status(req, str(interest.id))
+
+    def test_unchanged_status_is_not_modified(self):
+        waiting = self._submit()
+        resp = self._poll(waiting)
+        data = json.loads(resp.content)
+        self.assertEqual(data['status'], 'pending')
+        self.assertEqual(resp['ETag'], '"%s"' % data['version'])
+
+        with self.assertNumQueries(0):
+            resp = self._poll(waiting, data['version'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_match_changes_the_version(self):
+        waiting = self._submit()
+        version = json.loads(self._poll(waiting).content)['version']
+
+        self._submit()
+        resp = self._poll(waiting, version)
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+        self.assertEqual(data['status'], 'matched')
+        self.assertNotEqual(data['version'], version)
+
+        waiting.set_inactive()
+        self.assertEqual(json.loads(self._poll(waiting).content)['status'],
+                         'closed')
+
+    def test_version_survives_eviction(self):
+        waiting = self._submit()
+        version = json.loads(self._poll(waiting).content)['version']
+        match_status.invalidate([waiting.id])
+        self.assertEqual(self._poll(waiting, version).status_code, 304)
+
+    def test_invalidated_during_load_is_not_kept(self):
+        """
+        An entry read before an invalidation and stored after it is
+        reloaded on the next poll.
+        """
+        waiting = self._submit()
+        load = match_status.load
+
+        def load_then_match(interest_id):
+            entry = load(interest_id)
+            match_status.invalidate([interest_id])
+            return entry
+        match_status.load = load_then_match
+        try:
+            match_status.get(waiting.id)
+        finally:
+            del match_status.load
+
+        with self.assertNumQueries(1):
+            match_status.get(waiting.id)
+        with self.assertNumQueries(0):
+            match_status.get(waiting.id)
+
+    def test_only_the_owner_can_poll(self):
+        waiting = self._submit()
+        req = mock_req()
+        self.assertRaises(Http404, views.status, req, str(waiting.id))
+        self.assertRaises(Http404, views.status, req, '0')
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+from mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from core.models import OrgGroup, OfficeLocation
+from mystery import transfer
+from mystery.models import Interest, SignatureBit
+from mystery.tests.utils import random_user
+
+
+class TransferTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.exclude(id='Remote')[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+        self.users = [random_user() for _ in range(3)]
+
+    def _row(self, user, **kwargs):
+        row = {'owner': user.username, 'meet': 'coffee',
+               'locations': [self.office.pk], 'departments': [self.org.pk]}
+        row.update(kwargs)
+        return row
+
+    def test_import(self):
+        rows = [
+            self._row(self.users[0], created='2014-01-01T09:00:00'),
+            self._row(self.users[1], meet='video', locations=[]),
+            self._row(self.users[2], meet='brunch'),
+            {'owner': 'nobody', 'meet': 'lunch'},
+        ]
+        count, errors = transfer.import_interests(rows, chunk_size=3)
+        self.assertEqual(count, 2)
+        self.assertEqual([e.line for e in errors], [3, 4])
+
+        first = Interest.objects.get(owner=self.users[0])
+        self.assertEqual(first.match, None)
+        self.assertEqual(first.created.year, 2014)
+        self.assertEqual(list(first.locations.all()), [self.office])
+        self.assertEqual(first.location_signature, SignatureBit.signature(
+            SignatureBit.LOCATION, [self.office.pk]))
+        video = Interest.objects.get(owner=self.users[1])
+        self.assertTrue(video.video_chat)
+        self.assertEqual(video.meet_types, Interest.MEET_VIDEO)
+
+    def test_import_skips_rows_saved_meanwhile(self):
+        """ A sign-up saved during the bulk INSERT is not taken for ours """
+        bulk_create = Interest.objects.bulk_create
+
+        def sign_up_first(interests):
+            other = Interest(owner=random_user(), for_coffee=True,
+                             is_active=False)
+            other.save()
+            return bulk_create(interests)
+        with patch.object(Interest.objects, 'bulk_create', sign_up_first):
+            count, errors = transfer.import_interests(
+                [self._row(user) for user in self.users])
+        self.assertEqual((count, errors), (3, []))
+        for user in self.users:
+            interest = Interest.objects.get(owner=user)
+            self.assertEqual(list(interest.locations.all()), [self.office])
+
+    def test_strict_import(self):
+        rows = [self._row(self.users[0]), self._row(self.users[1], meet='')]
+        self.assertRaises(transfer.RowError, transfer.import_interests,
+                          rows, strict=True)
+
+    def test_export_round_trip(self):
+        transfer.import_interests([self._row(user) for user in self.users])
+        out = StringIO()
+        transfer.write_rows(out, transfer.export_rows(chunk_size=2), 'jsonl')
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['owner'] for row in rows],
+                         [user.username for user in self.users])
+        self.assertEqual(rows[0]['locations'], [unicode(self.office.pk)])
+        self.assertEqual(rows[0]['departments'], [unicode(self.org.pk)])
+
+    def test_import_command_matches_once(self):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(fd, 'w') as stream:
+            for user in self.users[:2]:
+                stream.write(json.dumps(self._row(user)) + '\n')
+        try:
+            call_command('import_interests', path, stdout=StringIO())
+        finally:
+            os.remove(path)
+
+        first, second = Interest.objects.order_by('id')
+        self.assertEqual(first.match, second)
+        self.assertEqual(second.match, first)
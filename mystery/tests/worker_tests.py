@@ -0,0 +1,69 @@
+import datetime
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from core.models import OrgGroup, OfficeLocation
+from mystery.models import Interest, MatchJob
+from mystery.matching import requeue_stalled_jobs, run_match_jobs
+from mystery.tests.utils import random_user
+
+
+@override_settings(MYSTERY_ASYNC_MATCHING=True)
+class MatchWorkerTest(TestCase):
+
+    fixtures = ['core-test-fixtures', ]
+
+    def setUp(self):
+        self.office = OfficeLocation.objects.all()[0]
+        self.org = OrgGroup.objects.filter(parent__isnull=True)[0]
+
+    def _submit(self):
+        interest = Interest(owner=random_user(), for_coffee=True)
+        interest.initial_save(locations=[self.office], departments=[self.org])
+        return interest
+
+    def test_submission_is_queued(self):
+        """ Submitting queues a job instead of matching in the request """
+        self.client.login(username='test1@example.com', password='1')
+        first = self._submit()
+        resp = self.client.post(reverse('mystery:mystery'),
+                                {'meet_choice': Interest.CHOICE_COFFEE,
+                                 'departments': [self.org.pk],
+                                 'locations': [self.office.pk]})
+        self.assertContains(resp, 'looking for someone', status_code=200)
+
+        second = Interest.objects.get(owner__username='test1@example.com')
+        self.assertEqual(second.match, None)
+        self.assertTrue(second.matching_pending())
+        self.assertEqual(MatchJob.objects.filter(
+            status=MatchJob.PENDING).count(), 2)
+
+        call_command('match_worker', once=True)
+
+        self.assertEqual(Interest.objects.get(id=first.id).match_id,
+                         second.id)
+        self.assertFalse(Interest.objects.get(id=second.id).matching_pending())
+        self.assertEqual(MatchJob.objects.filter(
+            status=MatchJob.DONE).count(), 2)
+
+    def test_resave_does_not_queue_twice(self):
+        interest = self._submit()
+        interest.save()
+        self.assertEqual(interest.match_jobs.count(), 1)
+
+    def test_claimed_job_is_not_run_again(self):
+        interest = self._submit()
+        MatchJob.objects.filter(interest=interest).update(
+            status=MatchJob.RUNNING, claimed=timezone.now())
+        self.assertEqual(run_match_jobs(), 0)
+
+    def test_stalled_jobs_are_requeued(self):
+        interest = self._submit()
+        MatchJob.objects.filter(interest=interest).update(
+            status=MatchJob.RUNNING,
+            claimed=timezone.now() - datetime.timedelta(minutes=10))
+        self.assertEqual(requeue_stalled_jobs(60), 1)
+        self.assertEqual(run_match_jobs(), 1)
+        self.assertEqual(interest.match_jobs.get().status, MatchJob.DONE)
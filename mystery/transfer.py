@@ -0,0 +1,389 @@
+"""
+Bulk import and export of interests, for seeding a cohort or moving
+history between environments.
+
+Rows are dicts with these keys, read from and written to CSV or JSON
+lines:
+
+* ``owner``: the owner's username
+* ``meet``: ``lunch``, ``coffee`` or ``video``
+* ``locations``, ``departments``: lists of office and org group ids,
+  ``;``-separated in CSV
+* ``is_active``: optional, defaults to true
+* ``created``: optional ISO 8601 timestamp, defaults to now
+
+Exported rows also carry the interest's ``id`` and its ``match`` id, which
+imports ignore.
+"""
+import csv
+import itertools
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mystery.catalogue import catalogue
+from mystery.models import Interest, SignatureBit
+
+FIELDS = ['id', 'owner', 'meet', 'locations', 'departments', 'is_active',
+          'match', 'created']
+
+MEET_FLAGS = {
+    Interest.CHOICE_LUNCH: 'for_lunch',
+    Interest.CHOICE_COFFEE: 'for_coffee',
+    Interest.CHOICE_VIDEO: 'video_chat',
+}
+MEET_NAMES = {'lunch': Interest.CHOICE_LUNCH,
+              'coffee': Interest.CHOICE_COFFEE,
+              'video': Interest.CHOICE_VIDEO}
+
+
+class RowError(ValueError):
+
+    def __init__(self, line, message):
+        super(RowError, self).__init__('line %d: %s' % (line, message))
+        self.line = line
+
+
+def read_rows(stream, format):
+    """
+    Yield the rows of ``stream`` as dicts, one at a time.
+    """
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            row = dict((key, value.decode('utf-8'))
+                       for key, value in row.items() if value is not None)
+            for key in ('locations', 'departments'):
+                row[key] = [value for value in row.get(key, '').split(';')
+                            if value]
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_rows(stream, rows, format):
+    """
+    Write ``rows`` to ``stream`` one at a time.  Returns the row count.
+    """
+    count = 0
+    if format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(FIELDS)
+        for row in rows:
+            row = dict(row, locations=';'.join(row['locations']),
+                       departments=';'.join(row['departments']))
+            writer.writerow([unicode(row[key]).encode('utf-8')
+                             if row[key] is not None else ''
+                             for key in FIELDS])
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(row) + '\n')
+            count += 1
+    return count
+
+
+def _flag(value):
+    if isinstance(value, basestring):
+        return value.strip().lower() in ('1', 'true', 'yes', 't')
+    return bool(value)
+
+
+def _insert_returning_ids(interests):
+    """
+    Insert ``interests`` with one multi-row ``INSERT ... RETURNING`` and
+    return their ids in order.  PostgreSQL only.
+    """
+    opts = Interest._meta
+    qn = connection.ops.quote_name
+    fields = [field for field in opts.local_concrete_fields
+              if field is not opts.pk]
+    values = []
+    params = []
+    for interest in interests:
+        values.append('(%s)' % ', '.join(['%s'] * len(fields)))
+        params.extend(field.get_db_prep_save(field.pre_save(interest, True),
+                                             connection=connection)
+                      for field in fields)
+    cursor = connection.cursor()
+    cursor.execute('INSERT INTO %s (%s) VALUES %s RETURNING %s' % (
+        qn(opts.db_table), ', '.join(qn(field.column) for field in fields),
+        ', '.join(values), qn(opts.pk.column)), params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _bulk_insert_ids(interests):
+    """
+    Insert ``interests`` with bulk_create and find their ids, which it does
+    not hand back.  One INSERT gets consecutive ids on SQLite and MySQL, so
+    they are the run of new rows that lines up with ``interests``; rows
+    other requests saved meanwhile are skipped over.
+    """
+    last_id = Interest.objects.order_by('-id') \
+        .values_list('id', flat=True).first() or 0
+    Interest.objects.bulk_create(interests)
+
+    rows = list(Interest.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'owner_id', 'meet_types',
+                             'location_signature', 'department_signature'))
+    wanted = [(interest.owner_id, interest.meet_types,
+               interest.location_signature, interest.department_signature)
+              for interest in interests]
+    keys = [tuple(row[1:]) for row in rows]
+    for start in range(len(rows) - len(wanted) + 1):
+        if keys[start:start + len(wanted)] == wanted:
+            return [row[0] for row in rows[start:start + len(wanted)]]
+    raise RuntimeError('Could not find the rows of a bulk insert')
+
+
+def bulk_create_interests(interests, links):
+    """
+    Insert ``interests`` with one bulk INSERT and link each one to the
+    ``(location ids, department ids)`` at the same position in ``links``.
+    ``save()`` does not run, so ``meet_types`` and the signatures must
+    already be set.  Returns the new ids, in order.
+    """
+    if not interests:
+        return []
+    if connection.vendor == 'postgresql':
+        # sequence values are handed out to concurrent inserts as they
+        # ask, so only RETURNING says which ids are ours
+        ids = _insert_returning_ids(interests)
+    else:
+        ids = _bulk_insert_ids(interests)
+
+    LocationLink = Interest.locations.through
+    DepartmentLink = Interest.departments.through
+    location_links = []
+    department_links = []
+    for interest_id, (locations, departments) in zip(ids, links):
+        for location_id in locations:
+            location_links.append(LocationLink(
+                interest_id=interest_id, officelocation_id=location_id))
+        for dept_id in departments:
+            department_links.append(DepartmentLink(
+                interest_id=interest_id, orggroup_id=dept_id))
+    LocationLink.objects.bulk_create(location_links)
+    DepartmentLink.objects.bulk_create(department_links)
+    return ids
+
+
+class _Importer(object):
+
+    def __init__(self):
+        self.locations = set(unicode(loc.pk) for loc in catalogue.locations())
+        self.departments = dict((unicode(dept.pk), dept.pk)
+                                for dept in catalogue.departments())
+        self.location_bits = SignatureBit.bits_for(SignatureBit.LOCATION,
+                                                   self.locations)
+        self.dept_bits = SignatureBit.bits_for(SignatureBit.DEPARTMENT,
+                                               self.departments)
+
+    def build(self, line, row, owners):
+        """
+        Return an unsaved interest and its links for ``row``, or raise
+        RowError.
+        """
+        owner_id = owners.get(row.get('owner'))
+        if owner_id is None:
+            raise RowError(line, 'unknown owner %r' % row.get('owner'))
+        meet_choice = MEET_NAMES.get(row.get('meet'))
+        if meet_choice is None:
+            raise RowError(line, 'meet must be one of %s' %
+                           ', '.join(sorted(MEET_NAMES)))
+
+        locations = [unicode(key) for key in row.get('locations') or []]
+        departments = [unicode(key) for key in row.get('departments') or []]
+        unknown = [key for key in locations if key not in self.locations] + \
+            [key for key in departments if key not in self.departments]
+        if unknown:
+            raise RowError(line, 'unknown locations or departments: %s' %
+                           ', '.join(unknown))
+        if not departments:
+            raise RowError(line, 'no departments')
+        if not locations and meet_choice != Interest.CHOICE_VIDEO:
+            raise RowError(line, 'no locations')
+
+        created = None
+        if row.get('created'):
+            created = parse_datetime(row['created'])
+            if created is None:
+                raise RowError(line, 'bad created timestamp %r' %
+                               row['created'])
+            if timezone.is_naive(created):
+                created = timezone.make_aware(
+                    created, timezone.get_default_timezone())
+
+        interest = Interest(owner_id=owner_id,
+                            is_active=_flag(row.get('is_active', True)))
+        setattr(interest, MEET_FLAGS[meet_choice], True)
+        interest.meet_types = interest.meet_types_mask()
+        interest.location_signature = SignatureBit.mask(
+            self.location_bits[key] for key in locations)
+        interest.department_signature = SignatureBit.mask(
+            self.dept_bits[key] for key in departments)
+        departments = [self.departments[key] for key in departments]
+        return interest, (locations, departments), created
+
+    def write(self, chunk):
+        User = get_user_model()
+        owners = dict(User.objects.filter(
+            username__in=set(row.get('owner') for _, row in chunk))
+            .values_list('username', 'id'))
+        interests, links, created = [], [], []
+        errors = []
+        for line, row in chunk:
+            try:
+                interest, link, when = self.build(line, row, owners)
+            except RowError as e:
+                errors.append(e)
+                continue
+            interests.append(interest)
+            links.append(link)
+            created.append(when)
+        if interests:
+            ids = bulk_create_interests(interests, links)
+            set_created(zip(ids, created))
+        return len(interests), errors
+
+
+def set_created(ids_and_times):
+    """
+    Backdate the given interests with one UPDATE; ``created`` is
+    auto_now_add, so bulk_create always stamps it with the current time.
+    """
+    rows = [(interest_id, when) for interest_id, when in ids_and_times
+            if when is not None]
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    opts = Interest._meta
+    pk_column = qn(opts.pk.column)
+    sql = ['UPDATE %s SET %s = CASE %s' % (
+        qn(opts.db_table), qn(opts.get_field('created').column), pk_column)]
+    params = []
+    for interest_id, when in rows:
+        sql.append('WHEN %s THEN %s')
+        params.extend([interest_id, when])
+    sql.append('END WHERE %s IN (%s)' % (
+        pk_column, ', '.join(['%s'] * len(rows))))
+    params.extend(interest_id for interest_id, _ in rows)
+    connection.cursor().execute(' '.join(sql), params)
+
+
+def import_interests(rows, chunk_size=500, strict=False):
+    """
+    Bulk-create interests from ``rows``, ``chunk_size`` rows at a time.
+    Matching is left to the caller, so it can run once over the lot.
+
+    Invalid rows are skipped and returned as RowErrors, or with ``strict``
+    the first one is raised.  Returns ``(created count, errors)``.
+    """
+    importer = _Importer()
+    count = 0
+    errors = []
+    numbered = enumerate(rows, 1)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            break
+        created, chunk_errors = importer.write(chunk)
+        if strict and chunk_errors:
+            raise chunk_errors[0]
+        count += created
+        errors.extend(chunk_errors)
+    return count, errors
+
+
+def _stream(queryset, chunk_size):
+    """
+    Yield the rows of a values_list queryset without holding them all in
+    memory: through a server-side cursor on PostgreSQL, which must run
+    inside a transaction, and fetchmany() elsewhere.
+    """
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(
+            name='mystery_export_%s' % queryset.model._meta.model_name)
+        cursor.itersize = chunk_size
+    else:
+        cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        cursor.close()
+
+
+class _Links(object):
+    """
+    Reads ``(interest id, value)`` rows sorted by interest id alongside
+    interests sorted the same way.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._next = next(self._rows, None)
+
+    def pop(self, interest_id):
+        values = []
+        while self._next is not None and self._next[0] <= interest_id:
+            if self._next[0] == interest_id:
+                values.append(unicode(self._next[1]))
+            self._next = next(self._rows, None)
+        return values
+
+
+def export_rows(queryset=None, chunk_size=1000):
+    """
+    Yield a row for each interest in ``queryset`` (all of them by default)
+    in id order.  The interests and both M2M tables are each read with one
+    streaming query and merged on interest id, so memory use does not grow
+    with the table.
+    """
+    if queryset is None:
+        queryset = Interest.objects.all()
+    queryset = queryset.order_by('id')
+    interests = _stream(queryset.values_list(
+        'id', 'owner__username', 'for_lunch', 'for_coffee', 'video_chat',
+        'is_active', 'match_id', 'created'), chunk_size)
+    locations = _Links(_stream(
+        Interest.locations.through.objects
+        .filter(interest__in=queryset.values('id'))
+        .order_by('interest').values_list('interest_id', 'officelocation_id'),
+        chunk_size))
+    departments = _Links(_stream(
+        Interest.departments.through.objects
+        .filter(interest__in=queryset.values('id'))
+        .order_by('interest').values_list('interest_id', 'orggroup_id'),
+        chunk_size))
+
+    for (interest_id, owner, for_lunch, for_coffee, video_chat, is_active,
+            match_id, created) in interests:
+        if video_chat:
+            meet = 'video'
+        elif for_lunch:
+            meet = 'lunch'
+        else:
+            meet = 'coffee'
+        yield {
+            'id': interest_id,
+            'owner': owner,
+            'meet': meet,
+            'locations': locations.pop(interest_id),
+            'departments': departments.pop(interest_id),
+            'is_active': bool(is_active),
+            'match': match_id,
+            'created': created.isoformat() if hasattr(created, 'isoformat')
+            else created,
+        }
@@ -5,5 +5,8 @@ urlpatterns = patterns('mystery.views',
     url(r'^close/(?P<interest_id>.+)/cancel/$', 'close_cancel', name='close_cancel'),
     url(r'^close/(?P<interest_id>.+)/complete/$', 'close_complete', name='close_complete'),
     url(r'^close/(?P<interest_id>.+)/incomplete/$', 'close_incomplete', name='close_incomplete'),
+    url(r'^status/(?P<interest_id>\d+)/$', 'status', name='status'),
+    url(r'^status/(?P<interest_id>\d+)/wait/$', 'wait', name='wait'),
+    url(r'^metrics$', 'metrics', name='metrics'),
 )
 
@@ -1,14 +1,24 @@
 from django.contrib.auth.decorators import login_required
 from dynamicresponse.response import render_to_response, RequestContext
 from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (Http404, HttpResponse, HttpResponseForbidden,
+                         HttpResponseNotModified, HttpResponseRedirect)
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.core.urlresolvers import reverse, NoReverseMatch
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags
 from core.models import OfficeLocation, OrgGroup, Person
+from mystery.catalogue import catalogue
 from mystery.models import Interest
 from mystery.forms import InterestForm
+from mystery.metrics import instrumented, stats
+from mystery.notifications import long_poll_enabled, wait_for_change
+from mystery.routers import pins_primary, replica_reads
+from mystery.status import match_status
 import datetime
+import json
 
 
 def _create_params(req):
@@ -16,13 +26,26 @@ def _create_params(req):
     return p
 
 
+def _results_queryset():
+    """
+    Interests with everything match_result.html reads from them loaded up
+    front: the match and its owner, any group meet, and the interest's
+    locations and departments.
+    """
+    return Interest.objects.select_related(
+        'match__owner', 'membership__meet__location').prefetch_related(
+        'locations', 'departments')
+
+
+@instrumented('index')
+@replica_reads
 @login_required
 def index(request):
-    active_interests = Interest.objects.filter(
+    interest_obj = _results_queryset().filter(
         owner=request.user,
-        is_active=True)
-    if active_interests.count() > 0:
-        return _get_results_page(request, active_interests.latest('created'))
+        is_active=True).order_by('-created').first()
+    if interest_obj is not None:
+        return _get_results_page(request, interest_obj)
     else:
         return _get_form_page(request)
 
@@ -34,38 +57,73 @@ def _get_form_page(request):
 
         if form.is_valid():
             interest = form.save()
-            return _get_results_page(request, interest)
+            return _get_results_page(
+                request, _results_queryset().get(pk=interest.pk))
     else:
         form = InterestForm()
 
     params = _create_params(request)
     params['form'] = form
+    # the unbound form's fields are cached as a fragment per catalogue
+    params['catalogue_version'] = catalogue.version
+    params['form_cache_timeout'] = getattr(
+        settings, 'MYSTERY_FORM_CACHE_TIMEOUT', 3600)
     return render_to_response('mystery-meet/index.html',
                               params,
                               context_instance=RequestContext(request))
 
 
-def _get_results_page(request, interest_obj):
-    params = _create_params(request)
-
-    # find your last entered interest
-    params['interest_obj'] = interest_obj
+def _results_params(interest_obj):
+    """
+    The template parameters for the results page of an interest loaded
+    with _results_queryset().
+    """
+    params = {'interest_obj': interest_obj}
 
     if interest_obj.match:
-        match_person = Person.objects.get(user=interest_obj.match.owner)
-        params['match_person'] = match_person
-        params['match_locations'] = list(set(interest_obj.locations.all())
-                                         .intersection(set(interest_obj.match.locations.all())))
+        params['match_person'] = Person.objects.select_related(
+            'user', 'org_group').get(user=interest_obj.match.owner_id)
+        # the offices both sides picked
+        params['match_locations'] = list(
+            OfficeLocation.objects.filter(interest=interest_obj.id)
+            .filter(interest=interest_obj.match_id))
+    elif interest_obj.for_group and interest_obj.group_meet():
+        params['meet'] = interest_obj.group_meet()
+        # everyone else in the group, in one query
+        params['meet_people'] = list(
+            Person.objects.select_related('user', 'org_group')
+            .filter(user__meet_memberships__meet=params['meet'].id)
+            .exclude(user=interest_obj.owner_id)
+            .order_by('user__first_name', 'user__last_name'))
+    else:
+        params['long_poll'] = long_poll_enabled()
+        if getattr(settings, 'MYSTERY_ASYNC_MATCHING', False):
+            params['matching_pending'] = interest_obj.matching_pending()
+    return params
+
+
+def _get_results_page(request, interest_obj):
+    params = _create_params(request)
+    params.update(_results_params(interest_obj))
     return render_to_response('mystery-meet/match_result.html',
                               params,
                               context_instance=RequestContext(request))
 
 
-def _deactivate(user, interest_id, url=None, kwargs=None):
+def _close_queryset():
+    """
+    Interests with everything the close views read from them: the match
+    and its owner, and the locations of both sides.
+    """
+    return Interest.objects.select_related('match__owner').prefetch_related(
+        'locations', 'match__locations')
+
+
+def _deactivate(user, interest_obj, url=None, kwargs=None,
+                include_match=True):
     default_redirect = reverse('mystery:mystery')
-    interest_obj = Interest.objects.get(id=interest_id)
-    if interest_obj.owner == user:
-        interest_obj.set_inactive()
+    if interest_obj.owner_id == user.pk:
+        interest_obj.close(include_match)
         if url is not None:
             if kwargs is not None:
                 url = url + "?"
@@ -75,45 +133,135 @@ def _deactivate(user, interest_id, url=None, kwargs=None):
     return HttpResponseRedirect(default_redirect)
 
 
+@instrumented('status')
+@replica_reads
+@login_required
+def status(request, interest_id):
+    """
+    The match status of one of the user's interests, as JSON, for the
+    results page to poll.  A poll that sends the last ``version`` back as
+    If-None-Match gets a 304 if nothing has changed; either way the answer
+    comes from the status cache, not the interest or person tables.
+    """
+    entry = match_status.get(int(interest_id))
+    if entry is None or entry['owner'] != request.user.pk:
+        raise Http404
+
+    if entry['version'] in parse_etags(
+            request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            json.dumps({'status': entry['status'],
+                        'version': entry['version']}),
+            content_type='application/json')
+    response['ETag'] = '"%s"' % entry['version']
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@instrumented('wait')
+@replica_reads
+@login_required
+def wait(request, interest_id):
+    """
+    Long-poll version of status: answers as soon as the status moves on
+    from the ``version`` given, or after MYSTERY_LONG_POLL_TIMEOUT seconds
+    with the status unchanged.  Only served with MYSTERY_LONG_POLL on,
+    since each waiting request holds a worker.
+    """
+    if not long_poll_enabled():
+        raise Http404
+    entry = match_status.get(int(interest_id))
+    if entry is None or entry['owner'] != request.user.pk:
+        raise Http404
+
+    version = request.GET.get('version')
+    if version == entry['version']:
+        entry = wait_for_change(
+            int(interest_id), version,
+            getattr(settings, 'MYSTERY_LONG_POLL_TIMEOUT', 25))
+        if entry is None:
+            raise Http404
+    response = HttpResponse(
+        json.dumps({'status': entry['status'], 'version': entry['version']}),
+        content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@instrumented('close_cancel')
+@pins_primary
 @login_required
 def close_cancel(request, interest_id):
-    return _deactivate(request.user, interest_id)
+    # a cancelled sign-up may have been matched meanwhile; the partner's
+    # interest is left for them to close
+    return _deactivate(request.user,
+                       get_object_or_404(Interest, id=interest_id),
+                       include_match=False)
 
 
+@instrumented('close_complete')
+@pins_primary
 @login_required
 def close_complete(request, interest_id):
+    interest_obj = get_object_or_404(_close_queryset(), id=interest_id)
     try:
         redirect_link = reverse('form_builder:respond', args=('we-met-up',))
-        interest_obj = get_object_or_404(Interest, id=interest_id)
-
-        kwargs = {'Who did you meet?': interest_obj.match.owner.get_full_name(),
-                  'Meet type': interest_obj.for_what()}
-        if interest_obj.video_chat:
-            kwargs['Location'] = "Other"
-        if interest_obj.locations.count() == 1:
-            kwargs['Location'] = interest_obj.locations.all()[0].name
-        elif interest_obj.match.locations.count() == 1:
-            kwargs['Location'] = interest_obj.match.locations.all()[0].name
+    except NoReverseMatch:
+        redirect_link = None
+    if redirect_link is None or interest_obj.match is None:
+        return _deactivate(request.user, interest_obj)
 
-        return _deactivate(
-            request.user, interest_id, redirect_link, kwargs=kwargs)
+    match = interest_obj.match
+    kwargs = {'Who did you meet?': match.owner.get_full_name(),
+              'Meet type': interest_obj.for_what()}
+    # prefetched, so len() rather than count()
+    locations = interest_obj.locations.all()
+    match_locations = match.locations.all()
+    if interest_obj.video_chat:
+        kwargs['Location'] = "Other"
+    if len(locations) == 1:
+        kwargs['Location'] = locations[0].name
+    elif len(match_locations) == 1:
+        kwargs['Location'] = match_locations[0].name
 
-    except NoReverseMatch:
-        return _deactivate(request.user, interest_id)
+    return _deactivate(
+        request.user, interest_obj, redirect_link, kwargs=kwargs)
 
 
+@instrumented('close_incomplete')
+@pins_primary
 @login_required
 def close_incomplete(request, interest_id):
+    interest_obj = get_object_or_404(_close_queryset(), id=interest_id)
     try:
         redirect_link = reverse(
             'form_builder:respond',
             args=(
                 'it-didnt-work-out',
             ))
-        interest_obj = get_object_or_404(Interest, id=interest_id)
-        kwargs = {
-            'Who was your match?': interest_obj.match.owner.get_full_name()}
-        return _deactivate(
-            request.user, interest_id, redirect_link, kwargs=kwargs)
     except NoReverseMatch:
-        return _deactivate(request.user, interest_id)
+        redirect_link = None
+    if redirect_link is None or interest_obj.match is None:
+        return _deactivate(request.user, interest_obj)
+
+    kwargs = {
+        'Who was your match?': interest_obj.match.owner.get_full_name()}
+    return _deactivate(
+        request.user, interest_obj, redirect_link, kwargs=kwargs)
+
+
+def metrics(request):
+    """
+    Plain-text matching and view statistics for the metrics scraper.  Off
+    with MYSTERY_METRICS_VIEW set to False; with MYSTERY_METRICS_TOKEN set,
+    only answered for requests bearing that token.
+    """
+    if not getattr(settings, 'MYSTERY_METRICS_VIEW', True):
+        raise Http404
+    token = getattr(settings, 'MYSTERY_METRICS_TOKEN', None)
+    if token and not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer %s' % token):
+        return HttpResponseForbidden()
+    return HttpResponse(stats.render(), content_type='text/plain')